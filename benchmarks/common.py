@@ -0,0 +1,91 @@
+# Shared pieces of the benchmarks: timing loop, latency percentiles, json reports and
+# comparison against a stored baseline. Baselines are json reports saved by the benchmarks
+# themselves (--save-baseline) on the machine they are compared on, none is made up
+from collections import OrderedDict
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+
+def time_call(fn, repeats:int, warmup:int=1):
+    """ Wall time (seconds) of repeats calls of fn, after warmup untimed calls """
+    for _ in range(warmup):
+        fn()
+    samples =   np.empty(repeats, dtype=np.float64)
+    for idx in range(repeats):
+        t_start         =   time.perf_counter()
+        fn()
+        samples[idx]    =   time.perf_counter() - t_start
+    return samples
+
+
+def latency_stats(samples, evals:int=1):
+    """
+    Percentiles of samples (seconds) in milliseconds, evals: work items of one call
+    (e.g. candidates * horizon model evaluations), evals_per_sec is taken at the median
+    """
+    p50, p95, p99   =   np.percentile(samples, (50, 95, 99))
+    return OrderedDict(p50_ms=p50 * 1e3, p95_ms=p95 * 1e3, p99_ms=p99 * 1e3, mean_ms=float(np.mean(samples)) * 1e3,
+                        evals_per_sec=evals / p50 if p50 > 0.0 else float('inf'), repeats=int(samples.shape[0]))
+
+
+def machine_info():
+    """ Where a report was measured, a baseline is only comparable on the same machine """
+    info    =   OrderedDict(date=datetime.datetime.now().isoformat(timespec='seconds'), python=platform.python_version(),
+                            platform=platform.platform(), processor=platform.processor(), cpu_count=os.cpu_count(), numpy=np.__version__)
+    if 'torch' in sys.modules:
+        torch               =   sys.modules['torch']
+        info['torch']       =   torch.__version__
+        info['torch_threads']   =   torch.get_num_threads()
+    return info
+
+
+def result_key(result):
+    """ Identity of a measurement: benchmark name and its parameters """
+    return '{}({})'.format(result['bench'], ', '.join('{}={}'.format(name, value) for name, value in sorted(result['params'].items())))
+
+
+def write_report(path:str, results:list, meta:dict=None):
+    """ json report {machine, meta, results}, written to a temporary file first """
+    directory   =   os.path.dirname(path)
+    if directory != '': os.makedirs(directory, exist_ok=True)
+    report      =   OrderedDict(machine=machine_info(), meta=dict() if meta is None else meta, results=results)
+    with open(path + '.tmp', 'w') as fp:
+        json.dump(report, fp, indent=2)
+    os.replace(path + '.tmp', path)
+    return report
+
+
+def load_report(path:str):
+    with open(path, 'r') as fp:
+        return json.load(fp)
+
+
+def compare_to_baseline(results:list, baseline_path:str, metric:str='p50_ms', tolerance:float=0.10, higher_is_better:bool=False):
+    """
+    Compare metric of results with the same measurements of the baseline report.
+    A measurement regresses when it is worse than the baseline by more than tolerance (relative).
+    Returns the list of rows (key, baseline, current, ratio current/baseline, regressed), [] without baseline
+    """
+    if baseline_path is None or not os.path.exists(baseline_path):
+        print('No baseline at {}, save one with --save-baseline'.format(baseline_path))
+        return []
+    baseline    =   {result_key(result): result for result in load_report(baseline_path)['results']}
+    rows        =   []
+    for result in results:
+        key =   result_key(result)
+        if key not in baseline or metric not in baseline[key] or metric not in result: continue
+        base, current   =   baseline[key][metric], result[metric]
+        ratio           =   current / base if base != 0.0 else float('inf')
+        regressed       =   ratio < 1.0 - tolerance if higher_is_better else ratio > 1.0 + tolerance
+        rows.append((key, base, current, ratio, regressed))
+    print('-------- {} against {} (tolerance {:.0%}) --------'.format(metric, baseline_path, tolerance))
+    for key, base, current, ratio, regressed in rows:
+        print('{:<96}{:12.4f}{:12.4f}{:8.2f}x {}'.format(key, base, current, ratio, 'REGRESSION' if regressed else ''))
+    print('{} of {} measurements regressed'.format(sum(row[4] for row in rows), len(rows)))
+    return rows
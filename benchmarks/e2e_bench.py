@@ -0,0 +1,153 @@
+"""
+    End-to-end benchmark of the MBRL loop without VREP: N iterations of collection
+    (random the first one, RandomShooter.get_action_torch the others), dataset build and
+    Trainer.fit, on NumpyVecEnv with QuadrotorNumpyEnvAugment (the spaces and rewards of
+    QuadrotorEnvAugment). Reports env-steps/sec (random and MPC collection), train samples/sec
+    (dataset rows x epochs per second of fit), peak RSS and the time of each stage (mbrl/profiler.py),
+    and compares the throughputs against benchmarks/baselines/e2e.json
+
+    python -m benchmarks.e2e_bench                      (compare, exit code 1 on regression)
+    python -m benchmarks.e2e_bench --save-baseline      (record the baseline of this machine)
+"""
+from benchmarks.common import write_report, compare_to_baseline
+from collections import OrderedDict
+import argparse
+import resource
+import time
+import sys
+
+import numpy as np
+import torch
+import torch.optim as optim
+
+from mbrl.network import Dynamics
+from mbrl.mpc import RandomShooter
+from mbrl.runner import Runner
+from mbrl.train_mb import Trainer
+from mbrl.profiler import StageProfiler
+from mbrl.wrapped_numpy_env import QuadrotorNumpyEnvAugment
+from wrapper_quad.numpy_sim import NumpyVecEnv
+
+""" Throughputs checked against the baseline (higher is better) """
+THROUGHPUTS =   ('env_steps_per_sec_random', 'env_steps_per_sec_mpc', 'train_samples_per_sec')
+
+
+def peak_rss_mb():
+    """ Peak resident set size of this process (ru_maxrss is in KB on Linux, bytes on macOS) """
+    peak    =   resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+
+def run_benchmark(args):
+    np.random.seed(args.seed)
+    torch.manual_seed(args.seed)
+    torch.set_num_threads(args.threads)
+    device      =   torch.device('cpu')
+    profiler    =   StageProfiler(enabled=True)
+
+    env_        =   QuadrotorNumpyEnvAugment(port=None, reward_type=args.reward_type, fault_rotor=args.crippled_rotor, time_step_size=args.time_step_size)
+    vecenv      =   NumpyVecEnv(max_path_length=args.max_path_length, n_envs=args.n_envs, envClass=QuadrotorNumpyEnvAugment, reward_type=args.reward_type,
+                                    cripple_rotor=args.crippled_rotor, time_step_size=args.time_step_size)
+    dyn         =   Dynamics(env_.observation_space.shape, env_.action_space.shape, stack_n=args.nstack, sthocastic=False, actfn=torch.tanh, hlayers=args.hidden).to(device)
+    optimizer   =   optim.Adam(lr=1e-3, params=dyn.parameters())
+    trainer     =   Trainer(dyn, args.batch_size, args.epochs, 0.2, 1e-3, device, optimizer, profiler=profiler)
+    mpc         =   RandomShooter(args.horizon, args.candidates, env_, dyn, device, 0.99)
+    runner      =   Runner(vecenv, env_, dyn, mpc, args.max_path_length, args.steps_per_iteration, profiler=profiler)
+
+    collected   =   dict(random=[0, 0.0], mpc=[0, 0.0])
+    trained     =   [0, 0.0]
+    stages      =   OrderedDict()
+    iterations  =   []
+    data_features, data_targets =   None, None
+    profiler.reset()
+    for n_it in range(1, args.iterations + 1):
+        mode    =   'random' if n_it == 1 else 'mpc'
+        paths   =   runner.run(random=(mode == 'random'))
+        collected[mode][0]  +=  paths['observations'].shape[0]
+        collected[mode][1]  +=  runner.stats['collect_time']
+
+        with profiler.stage('dataset'):
+            data_x  =   np.concatenate((paths['observations'], paths['actions']), axis=1)
+            if data_features is not None:
+                data_features   =   np.concatenate((data_features, data_x), axis=0)
+                data_targets    =   np.concatenate((data_targets, paths['delta_obs']), axis=0)
+            else:
+                data_features   =   data_x
+                data_targets    =   paths['delta_obs']
+
+        t_fit   =   time.perf_counter()
+        trainer.fit(data_features, data_targets)
+        trained[0]  +=  data_features.shape[0] * args.epochs
+        trained[1]  +=  time.perf_counter() - t_fit
+
+        summary =   profiler.end_iteration(n_it)
+        iterations.append(dict(iteration=n_it, mode=mode, samples=int(paths['observations'].shape[0]), dataset=int(data_features.shape[0]),
+                                stages={name: stats['total'] for name, stats in summary.items()}))
+        for name, stats in summary.items():
+            stages[name]    =   stages.get(name, 0.0) + stats['total']
+    vecenv.close()
+    env_.close()
+
+    metrics =   OrderedDict(
+                    env_steps_per_sec_random=collected['random'][0] / max(collected['random'][1], 1e-9),
+                    env_steps_per_sec_mpc=collected['mpc'][0] / max(collected['mpc'][1], 1e-9) if collected['mpc'][0] > 0 else 0.0,
+                    train_samples_per_sec=trained[0] / max(trained[1], 1e-9),
+                    peak_rss_mb=peak_rss_mb(),
+                    stages=stages,
+                    iterations=iterations)
+    return metrics
+
+
+def parse_args(argv=None):
+    parser  =   argparse.ArgumentParser(description='End-to-end MBRL benchmark on the NumPy simulator')
+    parser.add_argument('--iterations', type=int, default=3, help='iterations, the first one collects randomly')
+    parser.add_argument('--n-envs', type=int, default=8)
+    parser.add_argument('--steps-per-iteration', type=int, default=2000)
+    parser.add_argument('--max-path-length', type=int, default=250)
+    parser.add_argument('--time-step-size', type=float, default=0.05)
+    parser.add_argument('--reward-type', default='type8')
+    parser.add_argument('--crippled-rotor', type=int, default=None)
+    parser.add_argument('--candidates', type=int, default=500)
+    parser.add_argument('--horizon', type=int, default=10)
+    parser.add_argument('--nstack', type=int, default=2)
+    parser.add_argument('--hidden', type=lambda text: tuple(int(size) for size in text.split(',')), default=(250, 250, 250))
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=torch.get_num_threads())
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='benchmarks/results/e2e.json')
+    parser.add_argument('--baseline', default='benchmarks/baselines/e2e.json')
+    parser.add_argument('--save-baseline', action='store_true', help='write the results as the baseline instead of comparing')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='relative throughput drop counted as a regression')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args    =   parse_args(argv)
+    metrics =   run_benchmark(args)
+    params  =   OrderedDict((name, value) for name, value in vars(args).items() if name not in ('out', 'baseline', 'save_baseline', 'tolerance'))
+    params['hidden']    =   list(params['hidden'])
+    result  =   OrderedDict(bench='e2e', params=params)
+    result.update(metrics)
+
+    print('--------- End-to-end, {} iterations --------'.format(args.iterations))
+    for name in THROUGHPUTS:
+        print('{:<28}{:12.1f}'.format(name, result[name]))
+    print('{:<28}{:12.1f}'.format('peak_rss_mb', result['peak_rss_mb']))
+    for name, total in result['stages'].items():
+        print('  {:<26}{:11.3f}s'.format(name, total))
+
+    write_report(args.out, [result])
+    print('Results written to {}'.format(args.out))
+    if args.save_baseline:
+        write_report(args.baseline, [result])
+        print('Baseline written to {}'.format(args.baseline))
+        return 0
+    rows    =   []
+    for name in THROUGHPUTS:
+        rows    +=  compare_to_baseline([result], args.baseline, metric=name, tolerance=args.tolerance, higher_is_better=True)
+    return 1 if any(row[4] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""
+    Micro-benchmarks of the planner with randomly initialized dynamics, no simulator:
+        get_action_torch        RandomShooter, BatchStacksTorch, torch reward (type8)
+        get_action_CEM          RandomShooter with BatchStacks, numpy reward (type2)
+        get_action_PDDM         RandomShooter with BatchStacks, numpy reward (type2)
+        BatchStacks.slide       slide_action_stack + slide_state_stack + get, one horizon step
+        BatchStacksTorch.slide  same on torch tensors
+        predict_next_obs        Dynamics.predict_next_obs of a batch of candidates
+    over the grid candidates x horizon x nstack x hidden layers x torch threads.
+    Each measurement reports p50/p95/p99 latency (ms) and evals/sec (model evaluations of one
+    candidate at one step, at the median), as json.
+
+    python -m benchmarks.planner_bench --candidates 500 1000 --horizon 15 --threads 1 4
+    python -m benchmarks.planner_bench --save-baseline      (stores the baseline of this machine)
+"""
+from benchmarks.common import time_call, latency_stats, result_key, write_report, compare_to_baseline
+import argparse
+import itertools
+import sys
+
+import numpy as np
+import torch
+
+from mbrl.network import Dynamics
+from mbrl.mpc import RandomShooter, BatchStacks, BatchStacksTorch
+from mbrl.runner import StackStAct
+from mbrl.wrapped_env import QuadrotorAugmentRewards
+from wrapper_quad.wrapper_q1 import VREPQuadRotmatAugment
+from wrapper_quad.observation_layout import ROTMAT_AUGMENT
+
+""" Grid axes each benchmark depends on (the others do not change it, it is measured once) """
+BENCHMARKS  =   {
+    'get_action_torch'      :   ('threads', 'hidden', 'nstack', 'candidates', 'horizon'),
+    'get_action_CEM'        :   ('threads', 'hidden', 'nstack', 'candidates', 'horizon'),
+    'get_action_PDDM'       :   ('threads', 'hidden', 'nstack', 'candidates', 'horizon'),
+    'BatchStacks.slide'     :   ('nstack', 'candidates'),
+    'BatchStacksTorch.slide':   ('threads', 'nstack', 'candidates'),
+    'predict_next_obs'      :   ('threads', 'hidden', 'nstack', 'candidates'),
+}
+
+
+class PlannerTask(QuadrotorAugmentRewards):
+    """
+    Spaces and reward of QuadrotorEnvAugment without its simulator, what RandomShooter
+    needs of env_. The torch rewards (type8) serve get_action_torch, the numpy ones
+    (type2) get_action_CEM/get_action_PDDM
+    """
+    layout  =   ROTMAT_AUGMENT
+
+    def __init__(self, reward_type):
+        self.action_space       =   VREPQuadRotmatAugment._get_action_space()
+        self.observation_space  =   VREPQuadRotmatAugment._get_state_space()
+        self.targetpos          =   np.zeros(3, dtype=np.float32)
+        self._init_fault_reward(reward_type, None)
+
+
+def random_dynamics(task, nstack, hidden, device):
+    """ Untrained Dynamics with unit normalization, what matters here is its cost """
+    dyn =   Dynamics(task.observation_space.shape, task.action_space.shape, stack_n=nstack, sthocastic=False, actfn=torch.tanh, hlayers=hidden)
+    dyn.mean_input  =   np.zeros(dyn.input_layer_shape, dtype=np.float32)
+    dyn.std_input   =   np.ones(dyn.input_layer_shape, dtype=np.float32)
+    dyn.epsilon     =   1e-6
+    return dyn.to(device)
+
+
+def random_stack(task, nstack, rng):
+    """ StackStAct as the Runner hands it to the planner """
+    stack_  =   StackStAct(task.action_space.shape, task.observation_space.shape, n=nstack, init_st=rng.normal(size=task.observation_space.shape).astype(np.float32))
+    for _ in range(nstack):
+        stack_.append(obs=rng.normal(size=task.observation_space.shape).astype(np.float32), acts=rng.uniform(0.0, 100.0, task.action_space.shape).astype(np.float32))
+    return stack_
+
+
+def bench_point(bench, params, args, tasks, device, rng):
+    """ Return (function to time, evals per call) of bench at the grid point params """
+    candidates, nstack  =   params['candidates'], params['nstack']
+    task        =   tasks['torch']
+    obs_dim     =   task.observation_space.shape[0]
+    act_dim     =   task.action_space.shape[0]
+    if bench in ('get_action_torch', 'get_action_CEM', 'get_action_PDDM'):
+        horizon =   params['horizon']
+        numpy_planner   =   bench != 'get_action_torch'
+        task    =   tasks['numpy'] if numpy_planner else tasks['torch']
+        dyn     =   random_dynamics(task, nstack, params['hidden'], device)
+        mpc     =   RandomShooter(horizon, candidates, task, dyn, device, discount=0.99)
+        if numpy_planner:
+            """ get_action_CEM/get_action_PDDM are written for the numpy BatchStacks """
+            mpc.batch_as    =   BatchStacks(task.action_space.shape, task.observation_space.shape, nstack, candidates, device)
+        stack_  =   random_stack(task, nstack, rng)
+        if bench == 'get_action_torch':
+            return (lambda: mpc.get_action_torch(stack_)), candidates * horizon
+        if bench == 'get_action_CEM':
+            elites  =   min(args.cem_elites, candidates)
+            return (lambda: mpc.get_action_CEM(stack_, elites, args.cem_iterations, 0.8)), candidates * horizon * args.cem_iterations
+        """ PDDM evaluates the sampled and the filtered actions at every step """
+        return (lambda: mpc.get_action_PDDM(stack_, 5.0, 0.6)), 2 * candidates * horizon
+
+    if bench == 'BatchStacks.slide':
+        stacks  =   BatchStacks((act_dim,), (obs_dim,), nstack, candidates, device)
+        stacks.restart(rng.normal(size=(nstack, obs_dim)).astype(np.float32), rng.uniform(0.0, 100.0, (nstack, act_dim)).astype(np.float32))
+        actions =   rng.uniform(0.0, 100.0, (candidates, act_dim)).astype(np.float32)
+        states  =   rng.normal(size=(candidates, obs_dim)).astype(np.float32)
+        def slide():
+            stacks.slide_action_stack(actions)
+            stacks.slide_state_stack(states)
+            return stacks.get()
+        return slide, candidates
+
+    if bench == 'BatchStacksTorch.slide':
+        stacks  =   BatchStacksTorch((act_dim,), (obs_dim,), nstack, candidates, device)
+        stacks.restart(torch.randn(nstack, obs_dim, device=device), torch.rand(nstack, act_dim, device=device) * 100.0)
+        actions =   torch.rand(candidates, act_dim, device=device) * 100.0
+        states  =   torch.randn(candidates, obs_dim, device=device)
+        def slide():
+            stacks.slide_action_stack(actions)
+            stacks.slide_state_stack(states)
+            return stacks.get()
+        return slide, candidates
+
+    if bench == 'predict_next_obs':
+        dyn     =   random_dynamics(task, nstack, params['hidden'], device)
+        inputs  =   torch.randn(candidates, dyn.input_layer_shape, device=device)
+        return (lambda: dyn.predict_next_obs(inputs, device)), candidates
+
+    raise ValueError('Unknown benchmark {}'.format(bench))
+
+
+def run_grid(args):
+    device  =   torch.device(args.device)
+    tasks   =   dict(torch=PlannerTask('type8'), numpy=PlannerTask('type2'))
+    grid    =   [dict(zip(('threads', 'hidden', 'nstack', 'candidates', 'horizon'), point))
+                    for point in itertools.product(args.threads, args.hidden, args.nstack, args.candidates, args.horizon)]
+    results =   []
+    done    =   set()
+    for point in grid:
+        torch.set_num_threads(point['threads'])
+        for bench in args.benches:
+            params  =   {name: point[name] for name in BENCHMARKS[bench]}
+            key     =   (bench, tuple(sorted(params.items())))
+            if key in done: continue
+            done.add(key)
+            np.random.seed(args.seed)
+            torch.manual_seed(args.seed)
+            fn, evals   =   bench_point(bench, params, args, tasks, device, np.random.RandomState(args.seed))
+            stats       =   latency_stats(time_call(fn, args.repeats, args.warmup), evals)
+            result      =   dict(bench=bench, params={name: list(value) if name == 'hidden' else value for name, value in params.items()}, **stats)
+            results.append(result)
+            print('{:<96}p50 {:9.3f}ms p95 {:9.3f}ms p99 {:9.3f}ms {:12.0f} evals/s'.format(
+                    result_key(result), stats['p50_ms'], stats['p95_ms'], stats['p99_ms'], stats['evals_per_sec']))
+    return results
+
+
+def parse_args(argv=None):
+    parser  =   argparse.ArgumentParser(description='Planner micro-benchmarks with random dynamics')
+    parser.add_argument('--benches', nargs='+', default=list(BENCHMARKS), choices=list(BENCHMARKS))
+    parser.add_argument('--candidates', nargs='+', type=int, default=[500, 1000])
+    parser.add_argument('--horizon', nargs='+', type=int, default=[15])
+    parser.add_argument('--nstack', nargs='+', type=int, default=[2])
+    parser.add_argument('--hidden', nargs='+', type=lambda text: tuple(int(size) for size in text.split(',')), default=[(250, 250, 250)],
+                        help='hidden layer sizes, comma separated per configuration (e.g. 250,250,250 500,500)')
+    parser.add_argument('--threads', nargs='+', type=int, default=[1, torch.get_num_threads()])
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cem-iterations', type=int, default=3)
+    parser.add_argument('--cem-elites', type=int, default=50)
+    parser.add_argument('--out', default='benchmarks/results/planner.json')
+    parser.add_argument('--baseline', default='benchmarks/baselines/planner.json')
+    parser.add_argument('--save-baseline', action='store_true', help='write the results as the baseline instead of comparing')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='relative p50 slowdown counted as a regression')
+    args            =   parser.parse_args(argv)
+    args.threads    =   sorted(set(args.threads))
+    return args
+
+
+def main(argv=None):
+    args    =   parse_args(argv)
+    results =   run_grid(args)
+    meta    =   dict(benchmark='planner', device=args.device, repeats=args.repeats, warmup=args.warmup, seed=args.seed,
+                        cem_iterations=args.cem_iterations, cem_elites=args.cem_elites)
+    write_report(args.out, results, meta)
+    print('Results written to {}'.format(args.out))
+    if args.save_baseline:
+        write_report(args.baseline, results, meta)
+        print('Baseline written to {}'.format(args.baseline))
+        return 0
+    rows    =   compare_to_baseline(results, args.baseline, metric='p50_ms', tolerance=args.tolerance)
+    return 1 if any(row[4] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""
+    Planning latency under concurrent collection, with and without a thread budget (mbrl/threads.py).
+    The main process times RandomShooter.get_action_torch (random dynamics, as planner_bench) while
+    --collectors forked processes load the CPU like collection workers: NumPy simulator steps
+    plus a dynamics-sized torch matmul per step. Scenarios:
+        idle        no collectors, default threads (the reference latency)
+        default     collectors, every process keeps the default threads (one per core)
+        budget      collectors, ThreadBudget(planner=--planner-threads, worker=--worker-threads)
+                    applied in every process (and CPU pinning with --pin-cpus)
+
+    python -m benchmarks.threads_bench --collectors 8 --planner-threads 8 --pin-cpus
+"""
+from benchmarks.common import time_call, latency_stats, result_key, write_report, compare_to_baseline
+from benchmarks.planner_bench import PlannerTask, random_dynamics, random_stack
+import multiprocessing
+import argparse
+import time
+import sys
+import os
+
+import numpy as np
+import torch
+
+from mbrl.mpc import RandomShooter
+from mbrl.threads import ThreadBudget, available_cpus
+from wrapper_quad.numpy_sim import NumpyQuadSim
+
+
+def collector(idworker, budget, stop, n_quads, batch, hidden):
+    """ CPU load of one collection worker until stop is set """
+    if budget is not None:
+        budget.apply('worker', idworker)
+    sim     =   NumpyQuadSim(n_quads)
+    inputs  =   torch.randn(batch, hidden)
+    weights =   torch.randn(hidden, hidden)
+    while not stop.is_set():
+        sim.step(np.random.uniform(40.0, 60.0, (n_quads, 4)))
+        torch.mm(inputs, weights)
+
+
+def run_scenario(name, args, budget, n_collectors):
+    default_threads =   args.default_threads
+    all_cpus        =   available_cpus()
+    torch.set_num_threads(default_threads)
+    if budget is not None:
+        budget.apply('planner')
+
+    task    =   PlannerTask('type8')
+    dyn     =   random_dynamics(task, args.nstack, args.hidden, torch.device('cpu'))
+    mpc     =   RandomShooter(args.horizon, args.candidates, task, dyn, torch.device('cpu'), 0.99)
+    stack_  =   random_stack(task, args.nstack, np.random.RandomState(args.seed))
+
+    context     =   multiprocessing.get_context('fork')
+    stop        =   context.Event()
+    collectors  =   [context.Process(target=collector, args=(idx, budget, stop, args.n_quads, args.candidates, args.hidden[0]), daemon=True) for idx in range(n_collectors)]
+    for process in collectors: process.start()
+    time.sleep(args.settle if n_collectors > 0 else 0.0)
+    try:
+        samples =   time_call(lambda: mpc.get_action_torch(stack_), args.repeats, args.warmup)
+    finally:
+        stop.set()
+        for process in collectors: process.join(timeout=10.0)
+        """ Back to the defaults for the next scenario """
+        if hasattr(os, 'sched_setaffinity'): os.sched_setaffinity(0, all_cpus)
+        torch.set_num_threads(default_threads)
+
+    params  =   dict(scenario=name, collectors=n_collectors, candidates=args.candidates, horizon=args.horizon, nstack=args.nstack, hidden=list(args.hidden),
+                        planner_threads=budget.threads['planner'] if budget is not None else default_threads,
+                        worker_threads=budget.threads['worker'] if budget is not None else default_threads,
+                        pin_cpus=budget.pin_cpus if budget is not None else False)
+    result  =   dict(bench='planning_under_collection', params=params, **latency_stats(samples, args.candidates * args.horizon))
+    print('{:<8}p50 {:9.3f}ms p95 {:9.3f}ms p99 {:9.3f}ms {:12.0f} evals/s   ({})'.format(
+            name, result['p50_ms'], result['p95_ms'], result['p99_ms'], result['evals_per_sec'], result_key(result)))
+    return result
+
+
+def parse_args(argv=None):
+    parser  =   argparse.ArgumentParser(description='Planning latency under concurrent collection, with and without a thread budget')
+    parser.add_argument('--collectors', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument('--planner-threads', type=int, default=None, help='default: the CPUs left by the collectors')
+    parser.add_argument('--worker-threads', type=int, default=1)
+    parser.add_argument('--pin-cpus', action='store_true')
+    parser.add_argument('--candidates', type=int, default=1000)
+    parser.add_argument('--horizon', type=int, default=15)
+    parser.add_argument('--nstack', type=int, default=2)
+    parser.add_argument('--hidden', type=lambda text: tuple(int(size) for size in text.split(',')), default=(250, 250, 250))
+    parser.add_argument('--n-quads', type=int, default=16, help='quadrotors simulated by each collector per step')
+    parser.add_argument('--repeats', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--settle', type=float, default=1.0, help='seconds between starting the collectors and timing')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='benchmarks/results/threads.json')
+    parser.add_argument('--baseline', default='benchmarks/baselines/threads.json')
+    parser.add_argument('--save-baseline', action='store_true', help='write the results as the baseline instead of comparing')
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    args    =   parser.parse_args(argv)
+    args.default_threads    =   torch.get_num_threads()
+    if args.planner_threads is None:
+        args.planner_threads    =   max(1, len(available_cpus()) - args.collectors * args.worker_threads)
+    return args
+
+
+def main(argv=None):
+    args    =   parse_args(argv)
+    budget  =   ThreadBudget(planner=args.planner_threads, trainer=args.planner_threads, worker=args.worker_threads, pin_cpus=args.pin_cpus)
+    print('{} CPUs, {} collectors, default {} threads, budget {}'.format(len(available_cpus()), args.collectors, args.default_threads, budget.describe()))
+    results =   [run_scenario('idle', args, None, 0),
+                 run_scenario('default', args, None, args.collectors),
+                 run_scenario('budget', args, budget, args.collectors)]
+
+    meta    =   dict(benchmark='threads', repeats=args.repeats, warmup=args.warmup, n_quads=args.n_quads, settle=args.settle)
+    write_report(args.out, results, meta)
+    print('Results written to {}'.format(args.out))
+    if args.save_baseline:
+        write_report(args.baseline, results, meta)
+        print('Baseline written to {}'.format(args.baseline))
+        return 0
+    rows    =   compare_to_baseline(results, args.baseline, metric='p50_ms', tolerance=args.tolerance)
+    return 1 if any(row[4] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
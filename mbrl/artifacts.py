@@ -0,0 +1,128 @@
+# Background writer of the per-iteration artifacts (params.pkl, observations/rewards dumps,
+# loss plots, experiment checkpoints). The main loop hands over snapshots it will not modify
+# again and goes back to collecting, one thread writes them in submission order. The queue is
+# bounded: when the writer falls behind, submit blocks until there is room (backpressure)
+from collections import OrderedDict
+import threading
+import queue
+import time
+
+
+class ArtifactError(RuntimeError):
+    """
+    Writing an artifact failed in the background, raised by the next submit/flush
+    """
+    pass
+
+
+class ArtifactWriter(object):
+    """
+    writer.submit('params', torch.save, snapshot, path) runs torch.save(snapshot, path) in the
+    writer thread. The arguments are owned by the writer from then on: pass copies of anything
+    the main loop keeps changing (e.g. state_dict tensors of a model still training).
+    max_pending: artifacts queued before submit blocks
+    enabled:     False writes synchronously in submit (same statistics, nothing recovered)
+    """
+    def __init__(self, max_pending:int=4, enabled:bool=True):
+        assert max_pending > 0, 'max_pending must be positive'
+        self.enabled    =   enabled
+        self._queue     =   queue.Queue(maxsize=max_pending)
+        self._lock      =   threading.Lock()
+        self._error     =   None
+        self._closed    =   False
+        self.reset_stats()
+        self._thread    =   None
+        if enabled:
+            self._thread    =   threading.Thread(target=self._run, name='ArtifactWriter', daemon=True)
+            self._thread.start()
+
+    def reset_stats(self):
+        """ Statistics since the last reset (end_iteration resets them) """
+        with self._lock:
+            self._stats =   OrderedDict(written=0, write_time=0.0, blocked_time=0.0, flush_time=0.0)
+
+    def submit(self, name:str, fn, *args, **kwargs):
+        """ Queue fn(*args, **kwargs), blocks while max_pending artifacts are waiting """
+        self._raise_error()
+        assert not self._closed, 'ArtifactWriter is closed'
+        if not self.enabled:
+            self._write(name, fn, args, kwargs)
+            self._raise_error()
+            return
+        t_put   =   time.perf_counter()
+        self._queue.put((name, fn, args, kwargs))
+        with self._lock:
+            self._stats['blocked_time'] +=  time.perf_counter() - t_put
+
+    def flush(self):
+        """ Wait until every submitted artifact is written """
+        t_flush =   time.perf_counter()
+        if self.enabled:
+            self._queue.join()
+        with self._lock:
+            self._stats['flush_time']   +=  time.perf_counter() - t_flush
+        self._raise_error()
+
+    def close(self):
+        """ Flush and stop the thread (call it in a finally, the pending artifacts are written on exit) """
+        if self._closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._closed    =   True
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def end_iteration(self):
+        """
+        Statistics of the iteration, then reset them. recovered_time: writing time the main loop
+        did not wait for (write time minus time blocked in submit and flush)
+        """
+        with self._lock:
+            stats   =   OrderedDict(self._stats)
+        waited  =   stats['blocked_time'] + stats['flush_time']
+        stats['recovered_time'] =   max(stats['write_time'] - waited, 0.0) if self.enabled else 0.0
+        stats['pending']        =   self.pending()
+        self.reset_stats()
+        return stats
+
+    def _run(self):
+        while True:
+            item    =   self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, name, fn, args, kwargs):
+        t_write =   time.perf_counter()
+        try:
+            fn(*args, **kwargs)
+        except Exception as error:
+            """ Keep draining, a blocked submit or flush must not hang on a failed artifact """
+            print('Writing artifact {} failed: {!r}'.format(name, error))
+            with self._lock:
+                if self._error is None: self._error = (name, error)
+        with self._lock:
+            self._stats['written']      +=  1
+            self._stats['write_time']   +=  time.perf_counter() - t_write
+
+    def _raise_error(self):
+        with self._lock:
+            failed, self._error =   self._error, None
+        if failed is not None:
+            raise ArtifactError('Writing artifact {} failed'.format(failed[0])) from failed[1]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
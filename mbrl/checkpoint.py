@@ -0,0 +1,136 @@
+# Experiment checkpoints: what run_experiment needs to continue an experiment after a crash
+# (last iteration, dynamics and normalization, optimizer, best mean reward, dataset, RNG states
+# and configuration). The dataset is stored as one file per iteration (dataset/it_N.npz),
+# written once, and the checkpoint lists the files it is made of. Every file is written to a
+# temporary file and renamed, a crash while saving leaves the previous checkpoint intact.
+# With an ArtifactWriter (mbrl/artifacts.py) the files are written in its thread, in order
+import random
+import copy
+import json
+import os
+
+import numpy as np
+import torch
+
+CHECKPOINT_FILE =   'checkpoint.pkl'
+DATASET_FOLDER  =   'dataset'
+""" Configuration keys that may change when an experiment is resumed """
+RESUMABLE_KEYS  =   ('n_iterations',)
+
+
+def rng_states():
+    """ States of the generators of the main process (the workers seed their own) """
+    states  =   dict(python=random.getstate(), numpy=np.random.get_state(), torch=torch.get_rng_state())
+    if torch.cuda.is_available():
+        states['cuda']  =   torch.cuda.get_rng_state_all()
+    return states
+
+
+def set_rng_states(states:dict):
+    random.setstate(states['python'])
+    np.random.set_state(states['numpy'])
+    torch.set_rng_state(states['torch'])
+    if 'cuda' in states and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(states['cuda'])
+
+
+def config_changes(saved:dict, config:dict):
+    """ Keys whose values differ between the saved configuration and config (compared as json) """
+    saved, config   =   json.loads(json.dumps(saved)), json.loads(json.dumps(config))
+    return sorted(key for key in set(saved) | set(config) if saved.get(key) != config.get(key))
+
+
+class ExperimentCheckpoint(object):
+    """
+    Checkpoint of the experiment in save_path, saved every `every` iterations.
+    add_data stores the samples of each iteration, save writes the checkpoint and load
+    restores the model, the optimizer and the RNG states and returns the rest
+    """
+    def __init__(self, save_path:str, every:int=1):
+        self.save_path      =   save_path
+        self.every          =   every
+        self.path           =   os.path.join(save_path, CHECKPOINT_FILE)
+        self.dataset_path   =   os.path.join(save_path, DATASET_FOLDER)
+        """ Dataset files (relative to dataset_path) of the current data_features/data_targets """
+        self.chunks         =   []
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def add_data(self, n_it:int, data_x:np.ndarray, delta_obs:np.ndarray, accumulate:bool=True, writer=None):
+        """
+        Store the samples of iteration n_it, without accumulate they replace the dataset.
+        writer: ArtifactWriter that writes the file, data_x and delta_obs must not change afterwards
+        """
+        name        =   'it_{}.npz'.format(n_it)
+        self.chunks =   self.chunks + [name] if accumulate else [name]
+        if writer is not None:
+            writer.submit('dataset/' + name, self._write_chunk, name, data_x, delta_obs)
+        else:
+            self._write_chunk(name, data_x, delta_obs)
+
+    def save(self, n_it:int, dyn, optimizer, mean_reward_maximum:float, config:dict, force:bool=False, writer=None):
+        """
+        Checkpoint after iteration n_it (every `every` iterations unless force), returns if it was saved.
+        writer: ArtifactWriter that writes it, the model and optimizer states are copied first
+        """
+        if not force and n_it % self.every != 0:
+            return False
+        checkpoint  =   {
+                'n_it': n_it,
+                'model_state_dict': dyn.state_dict(),
+                'mean_input': dyn.mean_input,
+                'std_input': dyn.std_input,
+                'epsilon': dyn.epsilon,
+                'optimizer_state_dict': optimizer.state_dict(),
+                'mean_reward_maximum': mean_reward_maximum,
+                'dataset': list(self.chunks),
+                'rng_states': rng_states(),
+                'config': json.loads(json.dumps(config))
+            }
+        if writer is not None:
+            writer.submit(CHECKPOINT_FILE, self._write_checkpoint, copy.deepcopy(checkpoint))
+        else:
+            self._write_checkpoint(checkpoint)
+        return True
+
+    def load(self, dyn, optimizer, device, config:dict=None):
+        """
+        Restore dyn, optimizer and the RNG states from the checkpoint.
+        config: configuration of the resumed run, only the RESUMABLE_KEYS may differ from the saved one
+        Returns (last iteration, best mean reward, data_features, data_targets)
+        """
+        assert self.exists(), 'No checkpoint in {}'.format(self.save_path)
+        checkpoint  =   torch.load(self.path, map_location=device)
+        if config is not None:
+            changes =   [key for key in config_changes(checkpoint['config'], config) if key not in RESUMABLE_KEYS]
+            assert len(changes) == 0, 'Configuration of {} changed since the checkpoint: {}'.format(self.save_path, changes)
+        dyn.load_state_dict(checkpoint['model_state_dict'])
+        dyn.mean_input  =   checkpoint['mean_input']
+        dyn.std_input   =   checkpoint['std_input']
+        dyn.epsilon     =   checkpoint['epsilon']
+        optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
+        set_rng_states(checkpoint['rng_states'])
+
+        self.chunks     =   list(checkpoint['dataset'])
+        data_features, data_targets =   None, None
+        if len(self.chunks) > 0:
+            chunks          =   [np.load(os.path.join(self.dataset_path, name)) for name in self.chunks]
+            data_features   =   np.concatenate([chunk['features'] for chunk in chunks], axis=0)
+            data_targets    =   np.concatenate([chunk['targets'] for chunk in chunks], axis=0)
+        return checkpoint['n_it'], checkpoint['mean_reward_maximum'], data_features, data_targets
+
+    def _write_chunk(self, name, data_x, delta_obs):
+        os.makedirs(self.dataset_path, exist_ok=True)
+        tmp_path    =   os.path.join(self.dataset_path, name + '.tmp')
+        with open(tmp_path, 'wb') as fp:
+            np.savez(fp, features=data_x, targets=delta_obs)
+        os.replace(tmp_path, os.path.join(self.dataset_path, name))
+
+    def _write_checkpoint(self, checkpoint):
+        torch.save(checkpoint, self.path + '.tmp')
+        os.replace(self.path + '.tmp', self.path)
+        """ Dataset files of iterations the checkpoint no longer refers to (acumm_dataset False) """
+        for name in os.listdir(self.dataset_path) if os.path.isdir(self.dataset_path) else []:
+            if name.endswith('.npz') and name not in checkpoint['dataset']:
+                os.remove(os.path.join(self.dataset_path, name))
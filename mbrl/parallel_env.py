@@ -1,15 +1,65 @@
 from multiprocessing import Process, Pipe
+from multiprocessing import shared_memory
 import numpy as np
 import itertools
+import time
+
+
+class SharedBatchBuffer(object):
+    """
+    Block of shared memory seen as a (n_envs, dim) numpy array.
+    The buffer is created in the parent before the workers are forked,
+    the workers inherit the mapping so no data is pickled through the pipes.
+    """
+    def __init__(self, n_envs:int, dim:int, dtype=np.float32):
+        shape       =   (n_envs, dim)
+        nbytes      =   max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+        self.shm    =   shared_memory.SharedMemory(create=True, size=nbytes)
+        self.array  =   np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+        self.array[:]   =   0
+
+    def close(self):
+        """ Release the block, must be called only from the owner process """
+        del self.array
+        self.shm.close()
+        self.shm.unlink()
+
+
+class WorkerError(ConnectionError):
+    """
+    A worker did not answer in time or its process died
+    """
+    pass
+
 
 class ParallelVrepEnv(object):
     """
     Wrap multiples instances of vrep without loss the id connection
     """
     
-    def __init__(self, max_path_length:int, ports:list, envClass, reward_type, cripple_rotor):
+    def __init__(self, max_path_length:int, ports:list, envClass, reward_type, cripple_rotor, shared_memory=False, auto_reset=False, envs_per_worker=1,
+                    timeout=None, reset_timeout=120.0, max_restarts=3, restart_backoff=1.0, env_kwargs=None, frame_skip=1, thread_budget=None):
         """
         Initialize Pipes and Process
+
+        shared_memory:  If True actions, observations, rewards and dones are exchanged
+                        through shared arrays of shape (n_envs, dim), the pipes only
+                        carry the command and the env_info of each step
+        auto_reset:     If True each worker resets its environment as soon as the episode
+                        ends, so the reset overlaps with the stepping of the other workers
+        envs_per_worker:Number of environments (ports) hosted by each worker process,
+                        the worker steps its environments in a loop
+        timeout:        Seconds to wait the answer of a worker to a step, None waits forever.
+                        A worker that times out or dies is respawned, its in-flight episodes
+                        are returned as done with env_info['truncated'] = True
+        reset_timeout:  Seconds to wait a reset (also used when respawning), only with timeout
+        max_restarts:   Consecutive attempts to respawn a worker before giving up
+        restart_backoff:Seconds to wait before respawning, doubled after each failed attempt
+        env_kwargs:     Extra keyword arguments for envClass (e.g. dict(streaming=True))
+        frame_skip:     Physics steps per step, passed to envClass (WrapperQuad holds the action
+                        and accumulates the reward), the step timeout is scaled by it
+        thread_budget:  mbrl.threads.ThreadBudget, each worker applies its 'worker' role (threads
+                        and CPU affinity) after the fork, None keeps the threads inherited from the parent
         """
         self.n_parallel =   len(ports)
         
@@ -19,102 +69,491 @@ class ParallelVrepEnv(object):
         self.envClass       =   envClass
         self.reward_type    =   reward_type
         self.crippled_rotor =   cripple_rotor
+        self.env_kwargs     =   dict() if env_kwargs is None else env_kwargs
+        self.frame_skip     =   frame_skip
+        self.thread_budget  =   thread_budget
+        if frame_skip != 1:
+            self.env_kwargs =   dict(self.env_kwargs, frame_skip=frame_skip)
         self.num_rollouts   =   [0]*self.n_parallel
+        self.max_path_length    =   max_path_length
+        self.shared_memory  =   shared_memory
+        self.auto_reset     =   auto_reset
+        self.waiting        =   False
+        self.timeout        =   timeout
+        self.reset_timeout  =   reset_timeout
+        self.max_restarts   =   max_restarts
+        self.restart_backoff    =   restart_backoff
+        """ Reliability counters """
+        self.stats          =   dict(restarts=0, timeouts=0, crashes=0)
+        self.buffers        =   []
+        if self.shared_memory:
+            obs_dim         =   envClass._get_state_space().shape[0]
+            act_dim         =   envClass._get_action_space().shape[0]
+            self._actions_buf   =   SharedBatchBuffer(self.n_parallel, act_dim)
+            self._obs_buf       =   SharedBatchBuffer(self.n_parallel, obs_dim)
+            self._rewards_buf   =   SharedBatchBuffer(self.n_parallel, 1, np.float64)
+            self._dones_buf     =   SharedBatchBuffer(self.n_parallel, 1, np.bool_)
+            self.buffers        =   [self._actions_buf, self._obs_buf, self._rewards_buf, self._dones_buf]
         #assert num_rollouts == self._num_envs
         #assert num_rollouts % self.n_parallel == 0
 
         #self.samples_per_proc   =  max_path_length * (num_rollouts/self.n_parallel)
 
+        """ Split the environments in consecutive groups, one group per worker """
+        self.envs_per_worker    =   max(1, min(envs_per_worker, self.n_parallel))
+        self.env_groups         =   [list(range(i, min(i + self.envs_per_worker, self.n_parallel))) for i in range(0, self.n_parallel, self.envs_per_worker)]
+        self.n_workers          =   len(self.env_groups)
+        # Environment index -> (worker, position inside the worker)
+        self.env_slots          =   [(idworker, slot) for idworker, group in enumerate(self.env_groups) for slot in range(len(group))]
 
-        self.remotes, self.work_remotes =   zip(*[Pipe() for _ in range(self.n_parallel)])
-        seeds = np.random.choice(range(10**6), size=self.n_parallel, replace=False)   
-        self.ps = [
-            Process(target=self.worker, args=(work_remote, remote, max_path_length, idremote, seed, port)) 
-            for work_remote, remote, idremote, seed, port in zip(self.work_remotes, self.remotes, itertools.count(), seeds, ports)
-        ]
+        self.remotes    =   [None] * self.n_workers
+        self.ps         =   [None] * self.n_workers
+        self._failed    =   set()
+        """ Environments restarted together with another one of its worker -> initial observation of its new episode """
+        self._pending_truncation    =   dict()
+        self._deadline  =   None
+        for idworker in range(self.n_workers):
+            self._spawn_worker(idworker)
 
-        for p in self.ps:
-            p.daemon = True
-            p.start()
-        
-        for remote in self.work_remotes:
-            remote.close()
+    def _spawn_worker(self, idworker):
+        remote, work_remote =   Pipe()
+        group   =   self.env_groups[idworker]
+        seed    =   np.random.randint(10**6)
+        p       =   Process(target=self.worker, args=(work_remote, remote, self.max_path_length, group, seed, [self.ports[idx] for idx in group]))
+        p.daemon = True
+        p.start()
+        work_remote.close()
+
+        self.remotes[idworker]  =   remote
+        self.ps[idworker]       =   p
+
+    def _send(self, idworker, msg):
+        try:
+            self.remotes[idworker].send(msg)
+        except (BrokenPipeError, ConnectionResetError, EOFError, OSError):
+            self._failed.add(idworker)
+
+    def _recv(self, idworker, deadline=None):
+        """
+        Receive from a worker, raise WorkerError if it died or the deadline passed
+        """
+        if idworker in self._failed:
+            self.stats['crashes']   +=  1
+            raise WorkerError('Worker {} is not reachable'.format(idworker))
+        remote  =   self.remotes[idworker]
+        if deadline is not None and not remote.poll(max(0.0, deadline - time.time())):
+            self.stats['timeouts']  +=  1
+            raise WorkerError('Worker {} (ports {}) timed out'.format(idworker, [self.ports[idx] for idx in self.env_groups[idworker]]))
+        try:
+            return remote.recv()
+        except (EOFError, ConnectionResetError, OSError):
+            self.stats['crashes']   +=  1
+            raise WorkerError('Worker {} (ports {}) died'.format(idworker, [self.ports[idx] for idx in self.env_groups[idworker]]))
+
+    def _get_deadline(self, timeout):
+        return None if self.timeout is None else time.time() + timeout
+
+    def _restart_worker(self, idworker):
+        """
+        Kill the worker, respawn it (reconnecting its environments) and reset its environments
+        Return the list of initial observations of the group (None in shared memory mode)
+        """
+        for attempt in range(self.max_restarts):
+            p   =   self.ps[idworker]
+            if p.is_alive(): p.terminate()
+            p.join(timeout=5.0)
+            self.remotes[idworker].close()
+            self._failed.discard(idworker)
+
+            time.sleep(self.restart_backoff * 2**attempt)
+            print('Restarting worker {} (ports {}), attempt {}'.format(idworker, [self.ports[idx] for idx in self.env_groups[idworker]], attempt + 1))
+            self.stats['restarts']  +=  1
+            self._spawn_worker(idworker)
+
+            self._send(idworker, ('reset', None))
+            try:
+                return self._recv(idworker, self._get_deadline(self.reset_timeout))
+            except WorkerError:
+                continue
+        raise WorkerError('Worker {} could not be restarted after {} attempts'.format(idworker, self.max_restarts))
+
+    def _truncated_results(self, idworker):
+        """
+        Restart a failed worker and close the in-flight episodes of its environments
+        """
+        observations    =   self._restart_worker(idworker)
+        results         =   []
+        for idx, obs in zip(self.env_groups[idworker], observations):
+            self._pending_truncation.pop(idx, None)
+            if self.shared_memory:
+                self._rewards_buf.array[idx]    =   0.0
+                self._dones_buf.array[idx]      =   True
+                results.append(dict(truncated=True))
+            else:
+                results.append((np.asarray(obs, np.float32), 0.0, True, dict(truncated=True)))
+        return results
 
     def step(self, actions_):
         
         """
         Step for each environment
         """
+        self.step_async(actions_)
+        return self.step_wait()
+
+    def step_async(self, actions_):
+        """
+        Send the actions to the workers without waiting for the results,
+        step_wait() must be called before sending other command
+        """
+        assert not self.waiting, 'step_wait() must be called before a new step_async()'
+        if self.shared_memory:
+            self._actions_buf.array[:]  =   actions_
+            for idworker in range(self.n_workers):
+                self._send(idworker, ('step', None))
+        else:
+            for idworker, group in enumerate(self.env_groups):
+                self._send(idworker, ('step', [actions_[idx] for idx in group]))
+        self._deadline  =   self._get_deadline(None if self.timeout is None else self.timeout * self.frame_skip)
+        self.waiting    =   True
+
+    def step_wait(self):
+        """
+        Collect the results of the last step_async()
+        With auto_reset, finished environments were already restarted by its worker:
+        the returned observation is the initial one of the new episode and
+        env_info['terminal_observation'] keeps the last observation of the finished one
+        Environments of a respawned worker are returned with done and env_info['truncated'], the ones
+        that lost their episode by an earlier respawn with env_info['truncated'] and ['episode_start']:
+        the step is valid and starts from that observation
+        """
+        assert self.waiting, 'step_async() must be called before step_wait()'
+        results =   []
+        for idworker in range(self.n_workers):
+            try:
+                results.extend(self._recv(idworker, self._deadline))
+            except WorkerError as e:
+                print('Warning: {}'.format(e))
+                results.extend(self._truncated_results(idworker))
+        self.waiting    =   False
+
+        if self.shared_memory:
+            """ Only a "done" signal with the env_info travel by the pipes """
+            env_infos   =   tuple(results)
+            obs, rws, dones =   self._obs_buf.array.copy(), self._rewards_buf.array[:, 0].copy(), self._dones_buf.array[:, 0].copy()
+        else:
+            obs, rws, dones, env_infos = map(lambda x: x, zip(*results))
 
-        for remote, action_list in zip(self.remotes, actions_):
-            remote.send(('step', action_list))
+        if self._pending_truncation:
+            """ Environments restarted together with another one of its worker: the step is the
+                first of the new episode, that starts from env_info['episode_start'] """
+            env_infos   =   list(env_infos)
+            for idx, episode_start in self._pending_truncation.items():
+                env_infos[idx]  =   dict(env_infos[idx], truncated=True, episode_start=episode_start)
+            self._pending_truncation    =   dict()
 
-        results = [remote.recv() for remote in self.remotes]
-        obs, rws, dones, env_infos = map(lambda x: x, zip(*results))
+        if self.auto_reset:
+            """ A step lost by a respawn (truncated without episode_start) is not a rollout """
+            for idx, done, env_info in zip(itertools.count(), dones, env_infos):
+                if done and (not env_info.get('truncated', False) or 'episode_start' in env_info): self.num_rollouts[idx] += 1
         
         return obs, rws, dones, env_infos
     
+    def step_many(self, actions_seq):
+        """
+        Send a (k, act_dim) sequence of actions to each environment in one message
+        actions_seq:    (n_envs, k, act_dim) array or list of (k, act_dim) arrays
+        Return one trajectory dict per environment, see _wait_many
+        """
+        assert not self.waiting, 'step_wait() must be called before step_many()'
+        assert max(len(actions_) for actions_ in actions_seq) > 0, 'step_many() needs at least one action'
+        for idworker, group in enumerate(self.env_groups):
+            self._send(idworker, ('step_many', ([actions_seq[idx] for idx in group], None)))
+        return self._wait_many(max(len(actions_) for actions_ in actions_seq))
+
+    def step_random(self, k):
+        """
+        Each worker samples the actions from its action space and steps k times,
+        no per-step message is exchanged with the workers
+        """
+        assert not self.waiting, 'step_wait() must be called before step_random()'
+        assert k > 0, 'step_random() needs k > 0'
+        for idworker in range(self.n_workers):
+            self._send(idworker, ('step_many', (None, k)))
+        return self._wait_many(k)
+
+    def _wait_many(self, k):
+        """
+        Collect the trajectories of step_many/step_random, each one is a dict of:
+            actions, observations (next observations), rewards, dones:  arrays of m <= k steps,
+                                                the sequence is stopped at the first done
+            env_info:                           env_info of the last step
+            reset_observation:                  initial observation of the new episode, only if
+                                                the worker restarted the environment (auto_reset)
+            episode_start:                      only with env_info['truncated']: the worker was respawned,
+                                                the steps (if any) start from this observation
+        """
+        deadline        =   None if self.timeout is None else time.time() + self.timeout * self.frame_skip * k
+        trajectories    =   []
+        for idworker in range(self.n_workers):
+            try:
+                trajectories.extend(self._recv(idworker, deadline))
+            except WorkerError as e:
+                print('Warning: {}'.format(e))
+                trajectories.extend(self._truncated_trajectories(idworker))
+
+        for idx, trajectory in enumerate(trajectories):
+            if idx in self._pending_truncation:
+                """ Its worker was respawned before this call, the steps belong to the new episode """
+                trajectory['env_info']      =   dict(trajectory['env_info'], truncated=True)
+                trajectory['episode_start'] =   self._pending_truncation[idx]
+            if self.auto_reset and 'reset_observation' in trajectory:
+                self.num_rollouts[idx]  +=  1
+        self._pending_truncation    =   dict()
+
+        return trajectories
+
+    def _truncated_trajectories(self, idworker):
+        observations    =   self._restart_worker(idworker)
+        trajectories    =   []
+        for idx, obs in zip(self.env_groups[idworker], observations):
+            self._pending_truncation.pop(idx, None)
+            trajectories.append(dict(actions=np.asarray([]), observations=np.asarray([]), rewards=np.asarray([]), dones=np.asarray([]),
+                                    env_info=dict(truncated=True), episode_start=self._initial_observation(idx, obs)))
+        return trajectories
+
+    def _initial_observation(self, idx, obs):
+        """ Copy of the observation of environment idx right after a reset of its worker """
+        return self._obs_buf.array[idx].copy() if self.shared_memory else np.asarray(obs, np.float32)
+
+    def _truncate_group(self, idworker, observations, keep=None):
+        """ The environments of a respawned worker (but keep) lost their episodes, observations: the new initial ones """
+        for idx, obs in zip(self.env_groups[idworker], observations):
+            if idx != keep: self._pending_truncation[idx] = self._initial_observation(idx, obs)
+    
     def reset(self):
         """
         Reset all environments
         """
-        for remote in self.remotes:
-            remote.send(('reset', None))
+        for idworker in range(self.n_workers):
+            self._send(idworker, ('reset', None))
         
-        observations = [np.asarray(remote.recv(), np.float32) for remote in self.remotes]
+        deadline        =   self._get_deadline(self.reset_timeout)
+        observations    =   []
+        for idworker in range(self.n_workers):
+            try:
+                worker_obs  =   self._recv(idworker, deadline)
+            except WorkerError as e:
+                print('Warning: {}'.format(e))
+                worker_obs  =   self._restart_worker(idworker)
+            observations.extend(np.asarray(obs, np.float32) for obs in worker_obs)
+        self._pending_truncation    =   dict()
+        if self.shared_memory:
+            observations    =   list(self._obs_buf.array.copy())
         
         return observations
 
     # Reset specifi remote
     def reset_remote(self, index):
         #print('remote trying to reset... from {}'.format(index))
-        self.remotes[index].send(('reset',None))
-        observation = np.asarray(self.remotes[index].recv(), np.float32)
+        idworker, slot  =   self.env_slots[index]
+        self._send(idworker, ('reset_one', slot))
+        try:
+            observation =   self._recv(idworker, self._get_deadline(self.reset_timeout))
+        except WorkerError as e:
+            print('Warning: {}'.format(e))
+            observations    =   self._restart_worker(idworker)
+            observation     =   observations[slot]
+            """ The other environments of the worker lost their episodes """
+            self._truncate_group(idworker, observations, keep=index)
+        observation = np.asarray(observation, np.float32)
+        if self.shared_memory:
+            observation =   self._obs_buf.array[index].copy()
         
         self.num_rollouts[index]    += 1
         return observation
+
+    def check_workers(self, timeout=10.0):
+        """
+        Heartbeat: ping every worker and respawn the ones which do not answer in timeout seconds
+        Return the number of respawned workers
+        """
+        assert not self.waiting, 'check_workers() can not be called between step_async() and step_wait()'
+        for idworker in range(self.n_workers):
+            self._send(idworker, ('ping', None))
+        deadline    =   time.time() + timeout
+        restarted   =   0
+        for idworker in range(self.n_workers):
+            try:
+                self._recv(idworker, deadline)
+            except WorkerError as e:
+                print('Warning: {}'.format(e))
+                self._truncate_group(idworker, self._restart_worker(idworker))
+                restarted   +=  1
+        return restarted
     
+    def real_time_factors(self, timeout=10.0):
+        """
+        Effective real-time factor of each worker (simulated seconds per wall-clock second of
+        its steps, averaged over its environments) since the last call, nan if it does not answer
+        """
+        assert not self.waiting, 'real_time_factors() can not be called between step_async() and step_wait()'
+        for idworker in range(self.n_workers):
+            self._send(idworker, ('real_time_factor', None))
+        deadline    =   time.time() + timeout
+        factors     =   []
+        for idworker in range(self.n_workers):
+            try:
+                factors.append(float(np.mean(self._recv(idworker, deadline))))
+            except WorkerError as e:
+                print('Warning: {}'.format(e))
+                factors.append(float('nan'))
+        return factors
+
     def get_reset_nrollouts(self):
         self.tmp            =   self.num_rollouts 
         self.num_rollouts   = [0]*self.n_parallel
         return self.tmp
 
-    def worker(self, remote, parent_remote, max_path_length, idremote, seed, port_):
-        #print('idremote', idremote)
-        env = self.envClass(port=port_, reward_type=self.reward_type, fault_rotor=self.crippled_rotor)
+    def worker(self, remote, parent_remote, max_path_length, idremotes, seed, ports_):
+        """
+        Host the environments of idremotes (one per port in ports_)
+        """
+        #print('idremote', idremotes)
+        if self.thread_budget is not None:
+            self.thread_budget.apply('worker', self.env_slots[idremotes[0]][0])
+        envs = [self.envClass(port=port_, reward_type=self.reward_type, fault_rotor=self.crippled_rotor, **self.env_kwargs) for port_ in ports_]
 
-        if port_ == self.ports[0]:
-            self.env_ = env
+        if ports_[0] == self.ports[0]:
+            self.env_ = envs[0]
         np.random.seed(seed)
+        """ The spaces were created after the fork with the generator state of the parent, step_random samples from them """
+        for slot, env in enumerate(envs):
+            env.action_space.seed(seed + slot)
         
-        ts = 0
+        ts = [0] * len(envs)
+
+        def reset_env(slot):
+            obs =   envs[slot].reset()
+            ts[slot]    =   0
+            if self.shared_memory:
+                self._obs_buf.array[idremotes[slot]]    =   obs
+                obs =   None
+            return obs
+
         while True:
             cmd, data = remote.recv()
 
             if cmd == 'step':
-                action  = data
-                nextobs, rw, done, info = env.step(action)
-                ts = ts + 1
-                if done or ts >= max_path_length:
-                    done = True
-                    #print('request Reset from> {}-{}, id>{}'.format(remote,ts, idremote))
-                    
-                    ts = 0
-                """Send the next observation"""
-                remote.send((nextobs, rw, done, info))
+                results =   []
+                for slot, env, idremote in zip(itertools.count(), envs, idremotes):
+                    action  = data[slot] if not self.shared_memory else self._actions_buf.array[idremote]
+                    nextobs, rw, done, info = env.step(action)
+                    ts[slot] = ts[slot] + 1
+                    if done or ts[slot] >= max_path_length:
+                        done = True
+                        #print('request Reset from> {}-{}, id>{}'.format(remote,ts, idremote))
+
+                        ts[slot] = 0
+                        if self.auto_reset:
+                            """ Restart here, the parent receives the initial observation of the new episode """
+                            t_reset =   time.time()
+                            info    =   dict(info, terminal_observation=nextobs)
+                            nextobs =   env.reset()
+                            info['reset_time']  =   time.time() - t_reset
+                    """Send the next observation"""
+                    if self.shared_memory:
+                        self._obs_buf.array[idremote]       =   nextobs
+                        self._rewards_buf.array[idremote]   =   rw
+                        self._dones_buf.array[idremote]     =   done
+                        results.append(info)
+                    else:
+                        results.append((nextobs, rw, done, info))
+                remote.send(results)
+            elif cmd == 'step_many':
+                """
+                Step a sequence of actions (or k random actions if actions_seq is None)
+                in each environment, stopping at the end of the episode
+                """
+                actions_seq, k  =   data
+                trajectories    =   []
+                for slot, env in enumerate(envs):
+                    n_steps =   k if actions_seq is None else len(actions_seq[slot])
+                    trajectory  =   dict(actions=[], observations=[], rewards=[], dones=[], env_info=dict())
+                    done        =   False
+                    for t in range(n_steps):
+                        action  =   env.action_space.sample() if actions_seq is None else actions_seq[slot][t]
+                        nextobs, rw, done, info = env.step(action)
+                        ts[slot] = ts[slot] + 1
+                        done    =   done or ts[slot] >= max_path_length
+                        trajectory['actions'].append(action)
+                        trajectory['observations'].append(nextobs)
+                        trajectory['rewards'].append(rw)
+                        trajectory['dones'].append(done)
+                        trajectory['env_info']  =   info
+                        if done: break
+                    trajectory  =   dict(trajectory, **{key: np.asarray(trajectory[key]) for key in ['actions', 'observations', 'rewards', 'dones']})
+                    if done:
+                        ts[slot] = 0
+                        if self.auto_reset:
+                            t_reset =   time.time()
+                            trajectory['reset_observation'] =   env.reset()
+                            trajectory['env_info']  =   dict(trajectory['env_info'], reset_time=time.time() - t_reset)
+                            if self.shared_memory:
+                                self._obs_buf.array[idremotes[slot]]    =   trajectory['reset_observation']
+                    trajectories.append(trajectory)
+                remote.send(trajectories)
             elif cmd =='reset':
                 """
-                Reset the environment associated with the worker
+                Reset the environments associated with the worker
                 """
-                obs = env.reset()
-                remote.send(obs)
+                remote.send([reset_env(slot) for slot in range(len(envs))])
+            elif cmd =='reset_one':
+                remote.send(reset_env(data))
+            elif cmd == 'ping':
+                remote.send('pong')
+            elif cmd == 'real_time_factor':
+                remote.send([env.real_time_factor() for env in envs])
+            elif cmd == 'close':
+                for env in envs:
+                    env.close()
+                remote.send(None)
+                break
             else:
                 print('Warning: Receiving unknown command!!')
 
+    def close(self):
+        """
+        Close the environments, stop the workers and release the shared memory
+        """
+        for idworker in range(self.n_workers):
+            self._send(idworker, ('close', None))
+        deadline    =   time.time() + self.reset_timeout
+        for idworker in range(self.n_workers):
+            try:
+                self._recv(idworker, deadline)
+            except WorkerError:
+                pass
+        for p in self.ps:
+            p.join(timeout=5.0)
+            if p.is_alive(): p.terminate()
+        for buffer in self.buffers:
+            buffer.close()
+        self.buffers    =   []
+
+    @property
+    def observations(self):
+        """
+        Zero-copy view of the stacked observation batch (n_envs, obs_dim),
+        only available in shared memory mode, it is overwritten by the next step
+        """
+        assert self.shared_memory, 'Observations batch is only shared with shared_memory=True'
+        return self._obs_buf.array
+
     @property
     def getenv(self):
         return self.env_
 
     @property
     def num_envs(self):
-        return self._num_envs
\ No newline at end of file
+        return self._num_envs
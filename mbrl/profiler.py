@@ -0,0 +1,112 @@
+# Stage timers of the MBRL iteration loop
+# Runner, Trainer and mbrl/run.py time their stages with `with profiler.stage('env_step'):`,
+# run.py aggregates them per iteration to the SummaryWriter (timing/<stage>) and to
+# timings.json in save_path. A disabled profiler hands out one shared no-op context manager
+from collections import OrderedDict
+import json
+import os
+import time
+
+
+class _NullStage(object):
+    """ Context manager that does nothing, shared by every stage of a disabled profiler """
+    __slots__ = ()
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_STAGE =   _NullStage()
+
+
+class _Stage(object):
+    """ Accumulated time of one stage, reused for each entry (stages are not reentrant) """
+    __slots__ = ('total', 'count', 'max', '_t_enter')
+    def __init__(self):
+        self.total      =   0.0
+        self.count      =   0
+        self.max        =   0.0
+        self._t_enter   =   0.0
+
+    def __enter__(self):
+        self._t_enter   =   time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.add(time.perf_counter() - self._t_enter)
+        return False
+
+    def add(self, elapsed):
+        self.total  +=  elapsed
+        self.count  +=  1
+        if elapsed > self.max: self.max = elapsed
+
+
+class StageProfiler(object):
+    """
+    Wall time per named stage of the current iteration. The stages timed by the loop are
+    disjoint (env_step, planning, recording, process_paths, train_split, train_epoch,
+    dataset, checkpoint, artifacts), what the iteration spent outside them is reported as other
+    """
+    def __init__(self, enabled=True):
+        self.enabled    =   enabled
+        self.history    =   []
+        self._stages    =   OrderedDict()
+        self._t_start   =   time.perf_counter()
+
+    def stage(self, name):
+        """ Context manager timing name, `with profiler.stage('planning'): ...` """
+        if not self.enabled: return _NULL_STAGE
+        stage   =   self._stages.get(name)
+        if stage is None:
+            stage   =   self._stages[name]  =   _Stage()
+        return stage
+
+    def add(self, name, elapsed):
+        """ Time measured elsewhere (e.g. reported by a worker) """
+        if self.enabled: self.stage(name).add(elapsed)
+
+    def summary(self):
+        """ {stage: {total, count, mean, max}} of the current iteration, plus iteration and other """
+        iteration   =   time.perf_counter() - self._t_start
+        summary     =   OrderedDict()
+        for name, stage in self._stages.items():
+            summary[name]   =   dict(total=stage.total, count=stage.count, mean=stage.total / max(stage.count, 1), max=stage.max)
+        tracked             =   sum(stage.total for stage in self._stages.values())
+        summary['other']    =   dict(total=max(iteration - tracked, 0.0), count=1, mean=max(iteration - tracked, 0.0), max=max(iteration - tracked, 0.0))
+        summary['iteration']=   dict(total=iteration, count=1, mean=iteration, max=iteration)
+        return summary
+
+    def reset(self):
+        self._stages    =   OrderedDict()
+        self._t_start   =   time.perf_counter()
+
+    def end_iteration(self, iteration, writer=None, json_path=None):
+        """
+        Close the iteration: its totals to writer (timing/<stage>, seconds), the summary appended
+        to json_path (the file holds every iteration), then start timing the next one
+        """
+        if not self.enabled: return None
+        summary =   self.summary()
+        self.history.append(dict(iteration=iteration, stages=summary))
+        if writer is not None:
+            for name, stats in summary.items():
+                writer.add_scalar('timing/' + name, stats['total'], iteration)
+        if json_path is not None:
+            tmp_path    =   json_path + '.tmp'
+            with open(tmp_path, 'w') as fp:
+                json.dump(self.history, fp, indent=2)
+            os.replace(tmp_path, json_path)
+        self.reset()
+        return summary
+
+    def print_summary(self, summary=None):
+        summary =   self.summary() if summary is None else summary
+        for name, stats in summary.items():
+            print('{:<16}{:9.3f}s {:7d}x {:9.5f}s mean {:9.5f}s max'.format(name, stats['total'], stats['count'], stats['mean'], stats['max']))
+
+
+""" Profiler of the components built without one """
+NULL_PROFILER   =   StageProfiler(enabled=False)
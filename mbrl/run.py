@@ -0,0 +1,325 @@
+# Command line entry point of the experiments
+#   python -m mbrl.run data/sample68/config_train.json [--dry-run]
+#   python -m mbrl.run data/sample68/config_train.json --resume     (continue from data/sample68/checkpoint.pkl)
+# The configuration has the schema of config_train.json, missing keys take the defaults of
+# mbrl/run_experiments.py. torch, the wrappers, tensorboardX, joblib and matplotlib are
+# imported by the stage that needs them, so --dry-run and bad configurations return fast
+import time
+T_START =   time.time()
+from collections import OrderedDict
+import argparse
+import copy
+import json
+import os
+
+from mbrl.run_experiments import config as DEFAULT_CONFIG
+from utils.utility import ENVIRONMENTS
+
+MPC_NAMES           =   ('RandomShooter', 'CEM')
+ACTIVATION_NAMES    =   ('tanh', 'relu')
+""" Environments of the legacy wrappers (mbrl/wrapped_legacy_env.py): DecodeEnvironment still resolves
+    them for old samples, but they take no frame_skip nor VREP options and cannot be run """
+LEGACY_ENVIRONMENTS =   ('QuadrotorAcelEnv', 'QuadrotorSimpleEnv')
+
+
+def load_config(path:str):
+    """ DEFAULT_CONFIG updated with the json file at path """
+    with open(path, 'r') as fp:
+        config  =   json.load(fp)
+    unknown =   sorted(set(config) - set(DEFAULT_CONFIG))
+    assert len(unknown) == 0, 'Unknown configuration keys {} in {}'.format(unknown, path)
+    return dict(DEFAULT_CONFIG, **config)
+
+
+def check_config(config:dict):
+    """ Fail before any simulator or model is created """
+    assert config['env_name'] in ENVIRONMENTS, 'env_name {} not in {}'.format(config['env_name'], sorted(ENVIRONMENTS))
+    assert config['env_name'] not in LEGACY_ENVIRONMENTS, 'env_name {} uses a legacy wrapper without frame_skip nor VREP options, choose one of {}'.format(
+                                                            config['env_name'], sorted(set(ENVIRONMENTS) - set(LEGACY_ENVIRONMENTS)))
+    assert config['mpc'] in MPC_NAMES, 'mpc {} not in {}'.format(config['mpc'], MPC_NAMES)
+    assert config['activation_function'] in ACTIVATION_NAMES, 'activation_function {} not in {}'.format(config['activation_function'], ACTIVATION_NAMES)
+    assert config['crippled_rotor'] is None or config['crippled_rotor'] in range(4), 'crippled_rotor must be None or in [0-3]'
+    assert str(config['reward_type']).startswith('type'), 'reward_type must be \'type{N}\''
+    for key in ('n_iterations', 'horizon', 'candidates', 'max_path_length', 'total_tsteps_per_run', 'frame_skip',
+                'envs_per_worker', 'batch_size', 'n_epochs', 'nstack', 'n_numpy_envs', 'checkpoint_every', 'artifact_queue_size'):
+        assert isinstance(config[key], int) and config[key] > 0, '{} must be a positive integer, got {}'.format(key, config[key])
+    assert config['time_step_size'] > 0.0, 'time_step_size must be positive'
+    assert config['vrep_time_step_size'] > 0.0, 'vrep_time_step_size must be positive'
+    assert config['vrep_profile'] in ('default', 'turbo'), 'vrep_profile must be default or turbo'
+    assert 0.0 < config['validation_percent'] < 1.0, 'validation_percent must be in (0, 1)'
+    assert len(config['hidden_layers']) > 0, 'hidden_layers must have at least one layer'
+    assert len(config['vrep_ports']) > 0, 'vrep_ports must have at least one port'
+    for key in ('threads_planner', 'threads_trainer', 'threads_worker'):
+        assert config[key] is None or (isinstance(config[key], int) and config[key] > 0), '{} must be None or a positive integer'.format(key)
+
+
+def environment_kwargs(config:dict, local_env:bool):
+    """ Options of the environments besides port, reward_type, fault_rotor and frame_skip """
+    if local_env:
+        return dict(time_step_size=config['time_step_size'])
+    return dict(streaming=config['vrep_streaming'], packed_io=config['vrep_packed_io'], reset_mode=config['vrep_reset_mode'],
+                    profile=config['vrep_profile'], time_step_size=config['vrep_time_step_size'], physics_engine=config['vrep_physics_engine'])
+
+
+def run_experiment(config:dict, dry_run=False, data_root='./data/', t_start=None, resume=False):
+    """
+    Train the dynamics with MPC-collected samples for config['n_iterations'] iterations.
+    dry_run: Check the configuration, build the models (and the NumPy environments) and
+             step once, without VREP, writing nothing
+    t_start: Time the startup is measured from (the CLI passes the import of this module)
+    resume:  Continue the experiment in data_root/id_executor from its checkpoint (mbrl/checkpoint.py)
+    Returns the startup time of each stage until the first environment step (seconds)
+    """
+    startup =   OrderedDict()
+    t_last  =   time.time() if t_start is None else t_start
+    t_first =   t_last
+    def lap(stage):
+        nonlocal t_last
+        now             =   time.time()
+        startup[stage]  =   now - t_last
+        t_last          =   now
+
+    lap('imports')
+    check_config(config)
+    save_path   =   os.path.join(data_root, config['id_executor'])
+    if resume:
+        assert os.path.exists(os.path.join(save_path, 'checkpoint.pkl')), 'No checkpoint to resume in {}'.format(save_path)
+    else:
+        assert dry_run or not os.path.exists(save_path), 'Already this folder is busy, select other'
+    lap('config')
+
+    import numpy as np
+    import torch
+    import torch.optim as optim
+    from mbrl.network import Dynamics
+    from mbrl.train_mb import Trainer
+    from mbrl.runner import Runner
+    from mbrl.profiler import StageProfiler
+    from mbrl.threads import ThreadBudget
+    from mbrl.checkpoint import ExperimentCheckpoint
+    from wrapper_quad.numpy_sim import NumpySimMixin
+    from utils.utility import DecodeEnvironment, DecodeActFunction, DecodeMPC
+    env_class   =   DecodeEnvironment(config['env_name'])
+    """ Set before the workers are forked, they start from the planner threads and apply their own """
+    thread_budget   =   ThreadBudget.from_config(config)
+    thread_budget.apply('planner')
+    print('Thread budget> {}'.format(thread_budget.describe()))
+    lap('imports_models')
+
+    """ The NumPy environments need no simulator, a dry run builds them too """
+    local_env   =   issubclass(env_class, NumpySimMixin)
+    env_kwargs  =   environment_kwargs(config, local_env)
+    env_    =   None
+    vecenv  =   None
+    if local_env or not dry_run:
+        env_    =   env_class(port=config['vrep_planner_port'], reward_type=config['reward_type'], fault_rotor=config['crippled_rotor'], frame_skip=config['frame_skip'], **env_kwargs)
+        state_shape     =   env_.observation_space.shape
+        action_shape    =   env_.action_space.shape
+    else:
+        assert hasattr(env_class, '_get_state_space'), '{} needs an instance (a simulator) to know its spaces'.format(config['env_name'])
+        state_shape     =   env_class._get_state_space().shape
+        action_shape    =   env_class._get_action_space().shape
+    lap('planner_env')
+
+    if local_env:
+        from wrapper_quad.numpy_sim import NumpyVecEnv
+        vecenv  =   NumpyVecEnv(max_path_length=config['max_path_length'], n_envs=config['n_numpy_envs'], envClass=env_class, reward_type=config['reward_type'], cripple_rotor=config['crippled_rotor'], time_step_size=config['time_step_size'], frame_skip=config['frame_skip'])
+    elif dry_run:
+        pass
+    elif config['n_quads_per_scene'] > 0:
+        from wrapper_quad.wrapper_multi import VREPMultiQuad
+        vecenv  =   VREPMultiQuad(max_path_length=config['max_path_length'], n_quads=config['n_quads_per_scene'], envClass=env_class, reward_type=config['reward_type'], cripple_rotor=config['crippled_rotor'], port=config['vrep_ports'][0], env_kwargs=env_kwargs, frame_skip=config['frame_skip'])
+    else:
+        from mbrl.parallel_env import ParallelVrepEnv
+        vecenv  =   ParallelVrepEnv(ports=config['vrep_ports'], max_path_length=config['max_path_length'], envClass=env_class, reward_type=config['reward_type'], cripple_rotor=config['crippled_rotor'], shared_memory=config['shared_memory'], auto_reset=config['auto_reset'], envs_per_worker=config['envs_per_worker'], timeout=config['worker_timeout'], max_restarts=config['max_worker_restarts'], env_kwargs=env_kwargs, frame_skip=config['frame_skip'], thread_budget=thread_budget)
+    lap('vecenv')
+
+    device  =   torch.device('cuda:0' if torch.cuda.is_available() else 'cpu')
+    activation_function =   DecodeActFunction(config['activation_function'])
+    dyn     =   Dynamics(state_shape, action_shape, stack_n=config['nstack'], sthocastic=config['sthocastic'], actfn=activation_function, hlayers=tuple(config['hidden_layers']))
+    dyn     =   dyn.to(device)
+    optimizer   =   optim.Adam(lr=config['learning_rate'], params=dyn.parameters())
+    profiler    =   StageProfiler(enabled=config['profile_stages'])
+    mpc_class   =   DecodeMPC(config['mpc'])
+    """ The planner scores its candidates with env_.reward, without env_ (dry run of VREP) it is not built """
+    mpc         =   mpc_class(config['horizon'], config['candidates'], env_, dyn, device, config['discount']) if env_ is not None else None
+    trainer     =   Trainer(dyn, config['batch_size'], config['n_epochs'], config['validation_percent'], config['learning_rate'], device, optimizer, profiler=profiler)
+    lap('models')
+
+    if vecenv is not None:
+        """ One random step of every environment, the runner resets them again """
+        vecenv.reset()
+        vecenv.step(np.stack([env_.action_space.sample() for _ in range(vecenv.n_parallel)], axis=0))
+        lap('first_step')
+    startup['total']    =   time.time() - t_first
+
+    print('--------- Startup --------')
+    for stage, elapsed in startup.items():
+        print('{:<16}{:8.3f}s'.format(stage, elapsed))
+
+    if dry_run:
+        print(dyn)
+        print('Dry run of {}: configuration OK, {} -> {}, planner {}'.format(config['id_executor'], state_shape, action_shape, config['mpc'] if mpc is not None else 'not built (no simulator)'))
+        if vecenv is not None: vecenv.close()
+        if env_ is not None: env_.close()
+        return startup
+
+    import joblib
+    from tensorboardX import SummaryWriter
+    from mbrl.artifacts import ArtifactWriter
+    if config['async_artifacts']:
+        """ The loss plots are drawn in the writer thread, without a GUI backend """
+        import matplotlib
+        matplotlib.use('Agg')
+    from utils.plots import plot_loss_per_iteration
+
+    print('--------- Creation of runner--------')
+
+    runner = Runner(vecenv, env_, dyn, mpc, config['max_path_length'], config['total_tsteps_per_run'], profiler=profiler)
+
+    checkpoint  =   ExperimentCheckpoint(save_path, every=config['checkpoint_every'])
+    mean_reward_maximum =   0.0
+    data_features   =   None
+    data_targets    =   None
+    last_it         =   0
+    if resume:
+        last_it, mean_reward_maximum, data_features, data_targets   =   checkpoint.load(dyn, optimizer, device, config)
+        print('Resuming {} after iteration {}, {} samples, best mean reward {}'.format(config['id_executor'], last_it, 0 if data_features is None else data_features.shape[0], mean_reward_maximum))
+        timings_path    =   os.path.join(save_path, 'timings.json')
+        if os.path.exists(timings_path):
+            with open(timings_path, 'r') as fp:
+                profiler.history    =   [entry for entry in json.load(fp) if entry['iteration'] <= last_it]
+    else:
+        os.makedirs(save_path)
+
+    with open(os.path.join(save_path, 'config_train.json'),'w') as fp:
+        json.dump(config, fp, indent=2)
+    with open(os.path.join(save_path, 'startup.json' if not resume else 'startup_resume_{}.json'.format(last_it)),'w') as fp:
+        json.dump(startup, fp, indent=2)
+
+    observations_path   =   os.path.join(save_path, 'observations')
+    rewards_path        =   os.path.join(save_path, 'rewards')
+    images_path         =   os.path.join(save_path, 'images')
+    os.makedirs(observations_path, exist_ok=resume)
+    os.makedirs(rewards_path, exist_ok=resume)
+    os.makedirs(images_path, exist_ok=resume)
+
+    writer = SummaryWriter('./runs/'+config['id_executor'])
+    for stage, elapsed in startup.items():
+        writer.add_scalar('startup/' + stage, elapsed, last_it)
+
+    print(dyn)
+
+    def model_snapshot(n_it):
+        """ Copy of the model, it keeps training while the writer saves it """
+        return copy.deepcopy({
+                'n_it': n_it,
+                'model_state_dict':dyn.state_dict(),
+                'mean_input': dyn.mean_input,
+                'std_input': dyn.std_input,
+                'epsilon': dyn.epsilon
+                })
+
+    artifact_writer =   ArtifactWriter(max_pending=config['artifact_queue_size'], enabled=config['async_artifacts'])
+    profiler.reset()
+    try:
+        for n_it in range(last_it + 1, config['n_iterations']+1):
+            print('============================================')
+            print('\t\t Iteration {} \t\t\t'.format(n_it))
+            print('============================================')
+            thread_budget.apply('planner')
+            paths   =   runner.run(random=True) if n_it==1 else runner.run()
+            observations    =   paths['observations']
+            actions         =   paths['actions']
+            delta_obs       =   paths['delta_obs']
+            total_rewards   =   paths['rewards']
+            """ Save model with high rewards """
+            mean_reward     =   np.mean(total_rewards)
+            writer.add_scalar('data/reward', mean_reward, n_it)
+            if mean_reward_maximum < mean_reward:
+                print('Saving new highest reward')
+                mean_reward_maximum = mean_reward
+                with profiler.stage('checkpoint'):
+                    artifact_writer.submit('params_high.pkl', torch.save, model_snapshot(n_it), os.path.join(save_path, 'params_high.pkl'))
+            with profiler.stage('dataset'):
+                data_x          =   np.concatenate((observations, actions), axis=1)
+                if config['acumm_dataset'] and data_features is not None:
+                    data_features   =   np.concatenate((data_features, data_x), axis=0)
+                    data_targets    =   np.concatenate((data_targets, delta_obs), axis=0)
+                else:
+                    data_features   =   data_x
+                    data_targets    =   delta_obs
+
+            thread_budget.apply('trainer')
+            tr_loss, vl_loss = trainer.fit(data_features, data_targets)
+            print('-------------Info {}-------------'.format(n_it))
+            rolls_info      =   vecenv.get_reset_nrollouts()
+            print('Rolls per env> {}, total rollouts {}'.format(rolls_info, sum(rolls_info)))
+            print('Workers restarts> {restarts}, timeouts> {timeouts}, crashes> {crashes}'.format(**vecenv.stats))
+            for key, value in vecenv.stats.items():
+                writer.add_scalar('vecenv/' + key, value, n_it)
+            for key, value in runner.stats.items():
+                writer.add_scalar('runner/' + key, value, n_it)
+            if hasattr(vecenv, 'real_time_factors'):
+                real_time_factors   =   vecenv.real_time_factors()
+                print('Real-time factor per worker> {}'.format(['{:.2f}'.format(rtf) for rtf in real_time_factors]))
+                for idworker, rtf in enumerate(real_time_factors):
+                    writer.add_scalar('vecenv/real_time_factor_{}'.format(idworker), rtf, n_it)
+            print('total time steps: \t{}'.format(data_features.shape[0]))
+            print('Reward mean: \t\t{}'.format(mean_reward))
+            print('Reward  std: \t\t{}'.format(np.std(total_rewards)))
+            print('Reward  min: \t\t{}'.format(np.min(total_rewards)))
+            print('Reward  max: \t\t{}'.format(np.max(total_rewards)))
+
+            print('Saving model ...')
+            """ Written by artifact_writer, the paths arrays are not touched again by the loop """
+            with profiler.stage('checkpoint'):
+                artifact_writer.submit('params.pkl', torch.save, model_snapshot(n_it), os.path.join(save_path, 'params.pkl'))
+
+            with profiler.stage('artifacts'):
+                artifact_writer.submit('observations', joblib.dump, observations, os.path.join(observations_path, 'observations_it_' + str(n_it)+'.pkl'))
+                artifact_writer.submit('rewards', joblib.dump, total_rewards, os.path.join(rewards_path, 'rewards_it_'+str(n_it)+'.pkl'))
+                artifact_writer.submit('loss plot', plot_loss_per_iteration, tr_loss, vl_loss, os.path.join(images_path, 'loss_it_'+str(n_it)+'.png'))
+
+            with profiler.stage('checkpoint'):
+                checkpoint.add_data(n_it, data_x, delta_obs, accumulate=config['acumm_dataset'], writer=artifact_writer)
+                checkpoint.save(n_it, dyn, optimizer, mean_reward_maximum, config, force=(n_it == config['n_iterations']), writer=artifact_writer)
+
+            timings =   profiler.end_iteration(n_it, writer=writer, json_path=os.path.join(save_path, 'timings.json'))
+            if timings is not None:
+                print('-------------Timing {}-------------'.format(n_it))
+                profiler.print_summary(timings)
+            artifact_stats  =   artifact_writer.end_iteration()
+            print('Artifacts> {written} written in {write_time:.3f}s, blocked {blocked_time:.3f}s, main loop recovered {recovered_time:.3f}s, {pending} pending'.format(**artifact_stats))
+            for key, value in artifact_stats.items():
+                writer.add_scalar('artifacts/' + key, value, n_it)
+
+    finally:
+        """ Pending artifacts are written also when the loop fails """
+        t_close =   time.time()
+        try:
+            artifact_writer.close()
+            print('Artifacts flushed in {:.3f}s'.format(time.time() - t_close))
+        finally:
+            """ The worker processes, shared-memory segments and simulator connections are released in any case """
+            vecenv.close()
+            env_.close()
+
+    print(dyn)
+    return startup
+
+
+def main(argv=None):
+    parser  =   argparse.ArgumentParser(description='Model-based RL of the quadrotor: collect with MPC, fit the dynamics')
+    parser.add_argument('config', help='json configuration (schema of config_train.json), missing keys take the defaults')
+    parser.add_argument('--dry-run', action='store_true', help='check the configuration and build the models without simulators')
+    parser.add_argument('--data-root', default='./data/', help='folder of the experiment folders (data_root/id_executor)')
+    parser.add_argument('--resume', action='store_true', help='continue the experiment of the configuration from its last checkpoint')
+    args    =   parser.parse_args(argv)
+    config  =   load_config(args.config)
+    assert not (args.dry_run and args.resume), '--dry-run and --resume are exclusive'
+    run_experiment(config, dry_run=args.dry_run, data_root=args.data_root, t_start=T_START, resume=args.resume)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,7 @@
-from mbrl.network import Dynamics
-from mbrl.parallel_env import ParallelVrepEnv
-from mbrl.runner import Runner
-from mbrl.wrapped_env import QuadrotorEnv, QuadrotorAcelEnv, QuadrotorSimpleEnv, QuadrotorAcelRotmat
-from mbrl.mpc import RandomShooter
-from mbrl.train_mb import Trainer
-
-import torch
-import torch.nn as nn
-import torch.optim as optim
-
-import numpy as np
-import os
-import joblib
-import json
-
-from utils.plots import *
-from utils.utility import *
-from IPython.core.debugger import set_trace
-
-from tensorboardX import SummaryWriter
+# Default configuration of the experiments (the schema of config_train.json), edit it and run
+#   python -m mbrl.run_experiments
+# or run a json configuration with python -m mbrl.run config.json [--dry-run].
+# Nothing heavy is imported here, mbrl.run imports this config as its defaults
 """
     mpc:                    RandomShooter 
                             CEM 
@@ -57,6 +40,30 @@ config  =   {
     "reward_type"           :   'type8',
     "crippled_rotor"        :   1,
     "time_step_size"        :   0.050,  #seconds
+    "frame_skip"            :   1,      # physics steps per action (one MPC plan every frame_skip * time_step_size seconds)
+    "shared_memory"         :   True,
+    "auto_reset"            :   True,
+    "envs_per_worker"       :   1,
+    "worker_timeout"        :   60.0,   #seconds
+    "max_worker_restarts"   :   5,
+    "vrep_streaming"        :   True,
+    "vrep_packed_io"        :   False,  # needs wrapper_quad/quadricopter_packed.lua in the scene
+    "vrep_reset_mode"       :   'restart', # 'teleport' needs wrapper_quad/quadricopter_packed.lua in the scene
+    "vrep_profile"          :   'default', # 'turbo' (opt-in): no rendering/GUI updates/real-time mode during data collection
+    "vrep_time_step_size"   :   0.010,  #seconds, physics step of VREP (time_step_size is the one of the NumPy simulator)
+    "vrep_physics_engine"   :   None,   # 0=Bullet, 1=ODE, 2=Vortex on every port, None keeps the engine of the scene
+    "n_quads_per_scene"     :   0,      # >0: one VREP (port 19999) with Quadricopter#0..N-1 instead of one VREP per quadrotor
+    "n_numpy_envs"          :   16,     # Quadrotors of the NumPy simulator (env_name QuadrotorNumpyEnv*)
+    "vrep_ports"            :   [19999, 20001, 21001, 22001], # One VREP per port (the first one with n_quads_per_scene > 0)
+    "vrep_planner_port"     :   27001,  # VREP of the environment used by the planner (its rewards)
+    "profile_stages"        :   True,   # Per-stage timings of each iteration to tensorboard (timing/*) and timings.json
+    "threads_planner"       :   None,   # torch/OpenMP/MKL threads of the MPC, None keeps the default (one per core)
+    "threads_trainer"       :   None,   # threads of Trainer.fit, None keeps the default
+    "threads_worker"        :   1,      # threads of each ParallelVrepEnv worker process
+    "pin_cpus"              :   False,  # Pin the main process and each worker to disjoint CPUs (Linux)
+    "checkpoint_every"      :   1,      # Iterations between experiment checkpoints (python -m mbrl.run ... --resume)
+    "async_artifacts"       :   True,   # Write params, dumps, plots and checkpoints in a background thread
+    "artifact_queue_size"   :   8,      # Artifacts waiting to be written before the loop blocks
     # Training Parameters #
     
     "batch_size"            :   500,
@@ -71,125 +78,7 @@ config  =   {
     "activation_function"   :   'tanh',
     "nstack"                :   2
 }
-"""*****************************************
-    Hyper-Parameters Settings
-********************************************
-"""
-
-
-save_path               =   os.path.join('./data/', config['id_executor'])
-
-"""************************
-    Objects for training
-***************************
-"""
-
-device = torch.device('cuda:0' if torch.cuda.is_available() else 'cpu')
-
-env_class   =   DecodeEnvironment(config['env_name'])
-env_ = env_class(port=27001, reward_type=config['reward_type'], fault_rotor=config['crippled_rotor']) # 28
-#vecenv=ParallelVrepEnv(ports=[25001,28001], max_path_length=250, envClass=QuadrotorEnv)
-vecenv=ParallelVrepEnv(ports=[19999, 20001,21001,22001], max_path_length=config['max_path_length'], envClass=env_class, reward_type=config['reward_type'], cripple_rotor=config['crippled_rotor'])
-state_shape         =   env_.observation_space.shape
-action_shape        =   env_.action_space.shape
-activation_function =   DecodeActFunction(config['activation_function'])
-
-dyn = Dynamics(state_shape, action_shape, stack_n=config['nstack'], sthocastic=config['sthocastic'], actfn=activation_function, hlayers=config['hidden_layers'])
-dyn = dyn.to(device)
-
-optimizer           =   optim.Adam(lr=config['learning_rate'], params=dyn.parameters())
-
-mpc_class           =   DecodeMPC(config['mpc'])
-mpc                 =   mpc_class(config['horizon'], config['candidates'], env_, dyn, device, config['discount'])
-
-trainer =   Trainer(dyn, config['batch_size'], config['n_epochs'], config['validation_percent'], config['learning_rate'], device, optimizer)
-
-print('--------- Creation of runner--------')
-
-runner = Runner(vecenv, env_, dyn, mpc, config['max_path_length'], config['total_tsteps_per_run'])
-
-
-assert not os.path.exists(save_path), 'Already this folder is busy, select other'
-os.makedirs(save_path)
-
-with open(os.path.join(save_path, 'config_train.json'),'w') as fp:
-    json.dump(config, fp, indent=2)
-
-observations_path   =   os.path.join(save_path, 'observations')
-rewards_path        =   os.path.join(save_path, 'rewards')
-images_path         =   os.path.join(save_path, 'images')
-os.makedirs(observations_path)
-os.makedirs(rewards_path)
-os.makedirs(images_path)
-
-writer = SummaryWriter('./runs/'+config['id_executor'])
-mean_reward_maximum =   0.0
-
-print(dyn)
-
-data_features   =   None
-data_targets    =   None
-
-for n_it in range(1, config['n_iterations']+1):
-    print('============================================')
-    print('\t\t Iteration {} \t\t\t'.format(n_it))
-    print('============================================')
-    paths   =   runner.run(random=True) if n_it==1 else runner.run()
-    #set_trace()
-    observations    =   paths['observations']
-    actions         =   paths['actions']
-    delta_obs       =   paths['delta_obs']
-    total_rewards   =   paths['rewards']
-    data_x          =   np.concatenate((observations, actions), axis=1)
-    """ Save model with high rewards """
-    mean_reward     =   np.mean(total_rewards)
-    writer.add_scalar('data/reward', mean_reward, n_it)
-    if mean_reward_maximum < mean_reward:
-        print('Saving new highest reward') 
-        mean_reward_maximum = mean_reward
-        torch.save({
-            'n_it': n_it,
-            'model_state_dict':dyn.state_dict(),
-            'mean_input': dyn.mean_input,
-            'std_input': dyn.std_input,
-            'epsilon': dyn.epsilon
-            }, os.path.join(save_path, 'params_high.pkl'))
-        #torch.save(dyn.state_dict(), os.path.join(save_path, 'params_high.pkl'))
-    #set_trace()
-    if config['acumm_dataset'] and data_features is not None:
-        data_features   =   np.concatenate((data_features, data_x), axis=0)
-        data_targets    =   np.concatenate((data_targets, delta_obs), axis=0)
-    else: 
-        data_features   =   data_x
-        data_targets    =   delta_obs
-    
-    tr_loss, vl_loss = trainer.fit(data_features, data_targets)
-    print('-------------Info {}-------------'.format(n_it))
-    rolls_info      =   vecenv.get_reset_nrollouts()
-    print('Rolls per env> {}, total rollouts {}'.format(rolls_info, sum(rolls_info)))
-    print('total time steps: \t{}'.format(data_features.shape[0]))
-    print('Reward mean: \t\t{}'.format(mean_reward))
-    print('Reward  std: \t\t{}'.format(np.std(total_rewards)))
-    print('Reward  min: \t\t{}'.format(np.min(total_rewards)))
-    print('Reward  max: \t\t{}'.format(np.max(total_rewards)))
-    
-    print('Saving model ...')
-    torch.save({
-        'n_it': n_it,
-        'model_state_dict':dyn.state_dict(),
-        'mean_input': dyn.mean_input,
-        'std_input': dyn.std_input,
-        'epsilon': dyn.epsilon
-        }, os.path.join(save_path, 'params.pkl'))
-
-    joblib.dump(observations, os.path.join(observations_path, 'observations_it_' + str(n_it)+'.pkl'))
-    joblib.dump(total_rewards, os.path.join(rewards_path, 'rewards_it_'+str(n_it)+'.pkl'))
-    plot_loss_per_iteration(tr_loss, vl_loss, os.path.join(images_path, 'loss_it_'+str(n_it)+'.png'))
-
-#paths = runner.run(random=False)
-#rolls = vecenv.get_reset_nrollouts()
-#print('Rolls> {} \t-->{}'.format(rolls, sum(rolls)))
-#
-#set_trace()
 
-print(dyn)
+if __name__ == '__main__':
+    from mbrl.run import run_experiment
+    run_experiment(config)
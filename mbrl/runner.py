@@ -3,7 +3,9 @@ import numpy as np
 from collections import deque
 from mbrl.data_processor import DataProcessor
 from mbrl.mpc import RandomShooter
+from mbrl.profiler import NULL_PROFILER
 import itertools
+import time
 import torch
 from tqdm import tqdm
 from IPython.core.debugger import set_trace
@@ -15,7 +17,7 @@ class Runner:
         Collect Samples of quadrotor
     """
 
-    def __init__(self, vecenv, env, net, mpc:RandomShooter, max_path_len, total_nsteps):
+    def __init__(self, vecenv, env, net, mpc:RandomShooter, max_path_len, total_nsteps, random_chunk=None, profiler=None):
         self.vec_env    =   vecenv
         self.env_   =   env
         self.net    =   net
@@ -24,13 +26,21 @@ class Runner:
         self.max_path_len   =   max_path_len
         #self.total_samples  =   n_rollouts * nsteps
         self.total_samples  =   total_nsteps
+        """ Number of random steps run by the workers per message (step_random) """
+        self.random_chunk   =   max_path_len if random_chunk is None else random_chunk
 
         self.n_parallel =   self.vec_env.n_parallel
+        """ Physics steps per sample, the samples are (obs, action, obs after frame_skip steps) """
+        self.frame_skip =   getattr(self.vec_env, 'frame_skip', 1)
 
         self.dProcesor       =   DataProcessor(0.99)
 
         #self.env_   =   self.vec_env.getenv
         self.mpc    =   mpc
+        """ Stage timers (env_step, planning, recording, process_paths) """
+        self.profiler   =   NULL_PROFILER if profiler is None else profiler
+        """ Timing of the last run: samples/sec and mean reset latency """
+        self.stats  =   dict()
 
 
     def run(self, random=False):
@@ -39,7 +49,11 @@ class Runner:
         paths       =   []
         n_samples   =   0
         running_paths = [_get_empty_running_paths_dict() for _ in range(self.n_parallel)]
+        t_start     =   time.time()
+        self._reset_times   =   []
 
+        # Respawn hung or dead simulators before starting
+        if hasattr(self.vec_env, 'check_workers'): self.vec_env.check_workers()
         # Reset environments
         #obses   =   np.asarray(self.vec_env.reset())
         obses   =   self.vec_env.reset()
@@ -48,6 +62,12 @@ class Runner:
         # TQDM bar
         pbar    =   tqdm(total=self.total_samples)
         while n_samples < self.total_samples:
+            if random and hasattr(self.vec_env, 'step_random'):
+                # Actions are sampled inside the workers, no per-step IPC
+                new_samples =   self._run_random_chunk(stack_as, running_paths, paths)
+                n_samples   +=  new_samples
+                pbar.update(new_samples)
+                continue
             if random:
                 actions =   np.stack([self.env_.action_space.sample() for _ in range(self.n_parallel)], axis=0)
             else:
@@ -57,20 +77,114 @@ class Runner:
                 #actions =   np.stack([self.mpc.get_action_PDDM(stack_, 5.0, 0.6) for stack_ in stack_as], axis=0)
                 #actions =   np.stack([self.mpc.get_action(stack_) for stack_ in stack_as], axis=0)
                 #actions =   np.stack([self.mpc.get_action_CEM(stack_, 50, 3, 0.8) for stack_ in stack_as], axis=0)
-                actions =   np.stack([self.mpc.get_action_torch(stack_) for stack_ in stack_as], axis=0)
-
-            next_obs, rewards, dones, env_infos = self.vec_env.step(actions)
-
-            #from IPython.core.debugger import set_trace
-            #set_trace()
-            delta_obs   =   [stack_.get_last_state() for stack_ in stack_as]
-            delta_obs   =   [next_ob - delta_ob for delta_ob, next_ob in zip(delta_obs, next_obs)]
+                with self.profiler.stage('planning'):
+                    actions =   np.stack([self.mpc.get_action_torch(stack_) for stack_ in stack_as], axis=0)
+
+            with self.profiler.stage('env_step'):
+                next_obs, rewards, dones, env_infos = self.vec_env.step(actions)
+            t_record    =   time.perf_counter()
+            new_samples =   self._record_step(stack_as, running_paths, paths, actions, next_obs, rewards, dones, env_infos)
+            n_samples   +=  new_samples
+            pbar.update(new_samples)
+            self.profiler.add('recording', time.perf_counter() - t_record)
+            
+            #[stack_.append(obs=next_ob) for next_ob, stack_ in zip(next_obs, stack_as)]
+        pbar.close()
+        elapsed     =   time.time() - t_start
+        self.stats  =   dict(
+                            samples_per_sec=n_samples / elapsed,
+                            sim_steps_per_sec=n_samples * self.frame_skip / elapsed,
+                            reset_latency=np.mean(self._reset_times) if len(self._reset_times) > 0 else 0.0,
+                            n_resets=len(self._reset_times),
+                            collect_time=elapsed
+                        )
+        print('Collected {} samples in {:.1f}s> {:.1f} samples/sec, {} resets of {:.3f}s'.format(n_samples, elapsed, self.stats['samples_per_sec'], self.stats['n_resets'], self.stats['reset_latency']))
+        with self.profiler.stage('process_paths'):
+            sampled_data = self.dProcesor.process(paths)
 
-            _   = [stack_.append(acts=act) for act, stack_ in zip(actions, stack_as)]
-            # append new samples:
+        return sampled_data
 
-            new_samples = 0
-            for idx, stack_, reward, done, next_ob, delta_ob in zip(itertools.count(), stack_as, rewards, dones, next_obs, delta_obs):
+    def _record_step(self, stack_as, running_paths, paths, actions, next_obs, rewards, dones, env_infos):
+        """
+        Record the transitions of one vec_env.step into the stacks and running paths,
+        return the number of samples of the closed paths
+        """
+        self._reset_times.extend(env_info['reset_time'] for env_info in env_infos if 'reset_time' in env_info)
+        # With auto_reset the worker already restarted finished episodes, the transition ends in the terminal observation
+        last_obs    =   [env_info['terminal_observation'] if 'terminal_observation' in env_info else next_ob for env_info, next_ob in zip(env_infos, next_obs)]
+
+        #from IPython.core.debugger import set_trace
+        #set_trace()
+        delta_obs   =   [stack_.get_last_state() for stack_ in stack_as]
+        delta_obs   =   [last_ob - delta_ob for delta_ob, last_ob in zip(delta_obs, last_obs)]
+
+        _   = [stack_.append(acts=act) for act, stack_ in zip(actions, stack_as)]
+        # append new samples:
+
+        new_samples = 0
+        for idx, stack_, reward, done, next_ob, last_ob, delta_ob, env_info in zip(itertools.count(), stack_as, rewards, dones, next_obs, last_obs, delta_obs, env_infos):
+            if env_info.get('truncated', False):
+                # The worker was respawned, the in-flight episode is discarded
+                running_paths[idx] = _get_empty_running_paths_dict()
+                if 'episode_start' not in env_info:
+                    # Respawned during this step, the step is lost too
+                    stack_.reset_stacks(init_st=next_ob)
+                    continue
+                # Respawned before this step, it is the first transition of the new episode (as in _run_random_chunk)
+                stack_.reset_stacks(init_st=env_info['episode_start'])
+                stack_.append(acts=actions[idx])
+                delta_ob    =   last_ob - env_info['episode_start']
+            observation, action =   stack_.get()
+            running_paths[idx]['observations'].append(observation.flatten())
+            running_paths[idx]['actions'].append(action.flatten())
+            running_paths[idx]['rewards'].append(reward)
+            running_paths[idx]['dones'].append(done)
+            running_paths[idx]['next_obs'].append(last_ob)
+            running_paths[idx]['delta_obs'].append(delta_ob)
+
+
+            if len(running_paths[idx]['rewards']) >= self.max_path_len or done:
+                paths.append(dict(
+                    observations=np.asarray(running_paths[idx]["observations"]),
+                    actions=np.asarray(running_paths[idx]["actions"]),
+                    rewards=np.asarray(running_paths[idx]["rewards"]),
+                    dones=np.asarray(running_paths[idx]["dones"]),
+                    next_obs=np.asarray(running_paths[idx]['next_obs']),
+                    delta_obs=np.asarray(running_paths[idx]['delta_obs'])
+                ))
+                new_samples += len(running_paths[idx]['rewards'])
+                running_paths[idx] = _get_empty_running_paths_dict()
+                # Restart environments
+                #obses   =   self.vec_env.reset()
+                ob_    =   next_ob if 'terminal_observation' in env_info else self._timed_reset_remote(idx)
+                #stack_as    =   [StackStAct(self.env_.action_space.shape, self.env_.observation_space.shape, n=4, init_st=ob) for ob in obses]
+                stack_as[idx].reset_stacks(init_st=ob_)
+
+        ## Update all the next states
+        for done, stack_, next_ob in zip(dones, stack_as, next_obs):
+            if not done:
+                stack_.append(obs=next_ob)
+        return new_samples
+
+    def _run_random_chunk(self, stack_as, running_paths, paths):
+        """
+        Run random_chunk random steps in every environment with a single
+        step_random call, then replay the trajectories into the stacks
+        and running paths. Return the number of samples of the closed paths
+        """
+        with self.profiler.stage('env_step'):
+            trajectories    =   self.vec_env.step_random(self.random_chunk)
+        t_record        =   time.perf_counter()
+        self._reset_times.extend(trajectory['env_info']['reset_time'] for trajectory in trajectories if 'reset_time' in trajectory['env_info'])
+        new_samples     =   0
+        for idx, stack_, trajectory in zip(itertools.count(), stack_as, trajectories):
+            if trajectory['env_info'].get('truncated', False):
+                # The worker was respawned, the in-flight episode is discarded, the steps start a new one
+                running_paths[idx] = _get_empty_running_paths_dict()
+                stack_.reset_stacks(init_st=trajectory['episode_start'])
+            for act, next_ob, reward, done in zip(trajectory['actions'], trajectory['observations'], trajectory['rewards'], trajectory['dones']):
+                delta_ob    =   next_ob - stack_.get_last_state()
+                stack_.append(acts=act)
                 observation, action =   stack_.get()
                 running_paths[idx]['observations'].append(observation.flatten())
                 running_paths[idx]['actions'].append(action.flatten())
@@ -79,7 +193,6 @@ class Runner:
                 running_paths[idx]['next_obs'].append(next_ob)
                 running_paths[idx]['delta_obs'].append(delta_ob)
 
-
                 if len(running_paths[idx]['rewards']) >= self.max_path_len or done:
                     paths.append(dict(
                         observations=np.asarray(running_paths[idx]["observations"]),
@@ -91,24 +204,19 @@ class Runner:
                     ))
                     new_samples += len(running_paths[idx]['rewards'])
                     running_paths[idx] = _get_empty_running_paths_dict()
-                    # Restart environments
-                    #obses   =   self.vec_env.reset()
-                    ob_    =   self.vec_env.reset_remote(idx)
-                    #stack_as    =   [StackStAct(self.env_.action_space.shape, self.env_.observation_space.shape, n=4, init_st=ob) for ob in obses]
-                    stack_as[idx].reset_stacks(init_st=ob_)
-
-            n_samples += new_samples
-            pbar.update(new_samples)
-            ## Update all the next states
-            for done, stack_, next_ob in zip(dones, stack_as, next_obs):
-                if not done:
+                    ob_    =   trajectory['reset_observation'] if 'reset_observation' in trajectory else self._timed_reset_remote(idx)
+                    stack_.reset_stacks(init_st=ob_)
+                else:
                     stack_.append(obs=next_ob)
-            
-            #[stack_.append(obs=next_ob) for next_ob, stack_ in zip(next_obs, stack_as)]
-        pbar.close()
-        sampled_data = self.dProcesor.process(paths)
 
-        return sampled_data
+        self.profiler.add('recording', time.perf_counter() - t_record)
+        return new_samples
+
+    def _timed_reset_remote(self, idx):
+        t_reset =   time.time()
+        ob_     =   self.vec_env.reset_remote(idx)
+        self._reset_times.append(time.time() - t_reset)
+        return ob_
 
 
 
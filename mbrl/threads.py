@@ -0,0 +1,83 @@
+# Thread budget of the processes of an experiment
+# The planner and the trainer run in the main process one after the other, the env workers
+# of ParallelVrepEnv are forked and run at the same time as the planner. Without a budget every
+# process keeps the default intra-op pool (one thread per core) and they oversubscribe the CPU
+import os
+import sys
+
+""" Variables read by OpenMP/MKL/OpenBLAS/numexpr when their pools start (e.g. in a new process) """
+THREAD_ENV_VARS =   ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'NUMEXPR_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS')
+ROLES           =   ('planner', 'trainer', 'worker')
+
+
+def available_cpus():
+    """ CPUs this process may run on (its affinity mask where supported) """
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class ThreadBudget(object):
+    """
+    Threads per role and, optionally, CPU affinity:
+        planner:    intra-op threads of the MPC in the main process
+        trainer:    intra-op threads of Trainer.fit in the main process
+        worker:     threads of each env worker process
+    With pin_cpus the main process takes the first max(planner, trainer) CPUs and the workers
+    take `worker` CPUs each from the rest (round robin when there are not enough). None leaves
+    the library defaults
+    """
+    def __init__(self, planner=None, trainer=None, worker=1, pin_cpus=False, cpus=None):
+        """
+        cpus: CPUs of the budget, default the affinity of the process creating it
+        """
+        self.threads    =   dict(planner=planner, trainer=trainer, worker=worker)
+        self.pin_cpus   =   pin_cpus
+        self.cpus       =   available_cpus() if cpus is None else list(cpus)
+        for role, n in self.threads.items():
+            assert n is None or n > 0, 'Threads of {} must be positive or None'.format(role)
+
+    @classmethod
+    def from_config(cls, config:dict):
+        """ Budget of the keys threads_planner, threads_trainer, threads_worker and pin_cpus """
+        return cls(planner=config.get('threads_planner'), trainer=config.get('threads_trainer'), worker=config.get('threads_worker', 1), pin_cpus=config.get('pin_cpus', False))
+
+    def main_cpus(self):
+        n_main  =   max(n for n in (self.threads['planner'], self.threads['trainer'], 1) if n is not None)
+        return self.cpus[:min(n_main, len(self.cpus))]
+
+    def worker_cpus(self, idworker:int):
+        """ CPUs of worker idworker, taken after the ones of the main process """
+        rest    =   self.cpus[len(self.main_cpus()):] or self.cpus
+        n       =   self.threads['worker'] or 1
+        return [rest[(idworker * n + offset) % len(rest)] for offset in range(n)]
+
+    def apply(self, role:str, idworker:int=0):
+        """
+        Set the threads (and the affinity with pin_cpus) of the calling process for role.
+        The main process switches between planner and trainer, a worker calls it once after the fork
+        """
+        assert role in ROLES, 'Unknown role {}, roles {}'.format(role, ROLES)
+        n   =   self.threads[role]
+        if n is not None:
+            for name in THREAD_ENV_VARS:
+                os.environ[name]    =   str(n)
+            """ torch only if the process already uses it, a worker of VREP clients never imports it """
+            if 'torch' in sys.modules:
+                sys.modules['torch'].set_num_threads(n)
+            _limit_blas_threads(n)
+        if self.pin_cpus and hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, self.worker_cpus(idworker) if role == 'worker' else self.main_cpus())
+
+    def describe(self):
+        text    =   ', '.join('{}={}'.format(role, self.threads[role] if self.threads[role] is not None else 'default') for role in ROLES)
+        return text + (', pinned to {} CPUs'.format(len(self.cpus)) if self.pin_cpus else '')
+
+
+def _limit_blas_threads(n):
+    """ Resize the BLAS pools numpy already started (optional: threadpoolctl) """
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    threadpool_limits(limits=n)
@@ -4,9 +4,11 @@ import torch.optim as optim
 import torch.nn as nn
 
 import numpy as np
+import time
+from mbrl.profiler import NULL_PROFILER
 
 class Trainer:
-    def __init__(self, network, batch_sz, nepochs, split_ratio, lr, device, optimizer=None, randn_seed=42):
+    def __init__(self, network, batch_sz, nepochs, split_ratio, lr, device, optimizer=None, randn_seed=42, profiler=None):
         self.network        =   network
         self.device         =   device
         self.loss           =   nn.MSELoss()
@@ -19,12 +21,15 @@ class Trainer:
         self.optimizer          =   optimizer if optimizer is not None else optim.Adam(self.network.parameters(), lr=lr)
 
         self.index          =   0
+        """ Stage timers (train_split, train_epoch) """
+        self.profiler       =   NULL_PROFILER if profiler is None else profiler
 
 
     def fit(self, X_data, target):
         """ Data must be compatible in shapes"""
         assert X_data.shape[0] ==target.shape[0]
 
+        t_split =   time.perf_counter()
         x_train, x_test, y_train, y_test  =   train_test_split(X_data, target, test_size=self.split_ratio, random_state=42, shuffle=True)
 
         """ Compute normalization mean and std """
@@ -36,11 +41,13 @@ class Trainer:
         n_batches   =   y_train.shape[0]//self.batch_size# + (1 if target.shape[0] % self.batch_size > 0 else 0)
 
         n_batches_test  = y_test.shape[0]//self.batch_size if y_test.shape[0] >= self.batch_size else 1 
+        self.profiler.add('train_split', time.perf_counter() - t_split)
         # TODO: Last N<batch_size - 1 data in the epoch could not be taking into account in training
         #
         loss_validation =   []
         loss_training   =   []
         for n_epoch in range(self.nepochs):
+            t_epoch =   time.perf_counter()
             """ Training Step """
             loss_per_epoch  =   []    
             self.index  =   0
@@ -80,6 +87,7 @@ class Trainer:
             print('Loss epoch {} -> (train, test) loss-> ({:3.4f}, {:3.4f})'.format(n_epoch + 1, loss_mean_training, loss_mean_testing))
             loss_training.append(loss_mean_training)
             loss_validation.append(loss_mean_testing)
+            self.profiler.add('train_epoch', time.perf_counter() - t_epoch)
         
         return loss_training, loss_validation
     
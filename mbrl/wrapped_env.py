@@ -1,14 +1,30 @@
-from wrapper_quad.wrapper_vrep import VREPQuad
-from wrapper_quad.wrapper_vrep2 import VREPQuadAccel
-from wrapper_quad.wrapper_vrep3 import VREPQuadSimple
+# Environments of the wrapper_q1 observations and the reward functions shared with the NumPy
+# environments (mbrl/wrapped_numpy_env.py). The legacy wrapper_vrep2/3 environments are in
+# mbrl/wrapped_legacy_env.py, so importing one family does not import the others' wrappers
 from wrapper_quad.wrapper_q1 import VREPQuadAccelRot, VREPQuadRotmat, VREPQuadRotmatAugment, VREPQuadQuaternionAugment
 import numpy as np
+import importlib
 import torch
 
-class QuadrotorEnv(VREPQuadRotmat):
-    def __init__(self, port, reward_type, fault_rotor=None):
-        super(QuadrotorEnv, self).__init__(port=port)
-
+""" Environments defined in other modules, still importable from here (imported on first access) """
+_MOVED  =   {
+    'QuadrotorNumpyEnv'         :   'mbrl.wrapped_numpy_env',
+    'QuadrotorNumpyEnvAugment'  :   'mbrl.wrapped_numpy_env',
+    'QuadrotorAcelEnv'          :   'mbrl.wrapped_legacy_env',
+    'QuadrotorSimpleEnv'        :   'mbrl.wrapped_legacy_env',
+}
+
+def __getattr__(name):
+    if name in _MOVED:
+        return getattr(importlib.import_module(_MOVED[name]), name)
+    raise AttributeError('module {} has no attribute {}'.format(__name__, name))
+
+class QuadrotorRewards(object):
+    """
+        Fault mask and reward functions of the 18-dim (rotmat, pos, lin_vel, ang_vel) observation,
+        shared by the VREP and the NumPy environments
+    """
+    def _init_fault_reward(self, reward_type, fault_rotor=None):
         self.faultmotor =   fault_rotor
         self.mask       =   np.ones(4, dtype=np.float32)
                 
@@ -29,17 +45,16 @@ class QuadrotorEnv(VREPQuadRotmat):
             self.reward = self.roll_pitch_angle_penalized
         else:
             assert True, 'Error: No valid reward function: example: ("type1")'
-    
+
     def step(self, action:np.ndarray):
         fault_action    =   self.mask * action
-        return super(QuadrotorEnv, self).step(fault_action)
+        return super(QuadrotorRewards, self).step(fault_action)
 
     def distance_reward(self, next_obs):
         targetpos   =   self.targetpos
         targetpos   =   np.array([targetpos] * next_obs.shape[0])
 
-        # TODO: Must change if observation space changes
-        currpos     =   next_obs[:, 9:12]
+        currpos     =   next_obs[:, self.layout['position']]
 
         #distance    =   targetpos - currpos
         distance    =   currpos
@@ -50,7 +65,7 @@ class QuadrotorEnv(VREPQuadRotmat):
         #print(reward)
         return  reward
     def distance_reward_torch(self, next_obs, actions=None):
-        currpos =   next_obs[:, 9:12]
+        currpos =   next_obs[:, self.layout['position']]
 
         distance    =   torch.sqrt(torch.sum(currpos * currpos, dim=1))
 
@@ -59,8 +74,8 @@ class QuadrotorEnv(VREPQuadRotmat):
 
     def roll_pitch_vel_penalized(self, next_obs):
         # rangues varing from [-10.0 to 10.0] we devide between 10 to scale
-        roll_pitch_ang_vel  =   next_obs[:, 15:17]/10.0
-        rel_distance        =   next_obs[:, 9:12]
+        roll_pitch_ang_vel  =   next_obs[:, self.layout['ang_vel']][:, :2]/10.0
+        rel_distance        =   next_obs[:, self.layout['position']]
 
         rwdistance          =   np.sqrt(np.sum(rel_distance * rel_distance, axis=1))
         rwdistance          =   4.0 - 1.25 * rwdistance
@@ -71,9 +86,9 @@ class QuadrotorEnv(VREPQuadRotmat):
 
     def roll_pitch_yaw_vel_penalized(self, next_obs):
         # rangues varing from [-10.0 to 10.0] we devide between 10 to scale
-        roll_pitch_ang_vel  =   next_obs[:, 15:17]/10.0
-        yaw_vel             =   next_obs[:, 17]/10.0    
-        rel_distance        =   next_obs[:, 9:12]
+        roll_pitch_ang_vel  =   next_obs[:, self.layout['ang_vel']][:, :2]/10.0
+        yaw_vel             =   next_obs[:, self.layout.index('ang_vel', 2)]/10.0
+        rel_distance        =   next_obs[:, self.layout['position']]
 
         #rwdistance          =   np.sqrt(np.sum(rel_distance * rel_distance, axis=1)+yaw_vel*yaw_vel)
         rwdistance          =   np.sqrt(np.sum(rel_distance * rel_distance, axis=1))
@@ -88,12 +103,13 @@ class QuadrotorEnv(VREPQuadRotmat):
             Hardcode to use nstack = 4
             statespaceof 18: (rotmat, pos, lin_vel, ang_vel)
         """
-        index_SyawCroll     =   3
-        index_Sroll         =   6
-        index_SpitchCroll   =   7
+        index_SyawCroll     =   self.layout.index('rotation_matrix', 3)
+        index_Sroll         =   self.layout.index('rotation_matrix', 6)
+        index_SpitchCroll   =   self.layout.index('rotation_matrix', 7)
 
         roll_rad            =   np.arcsin(-next_obs[:, index_Sroll])
-        cosroll             =   np.cos(roll_rad)
+        """ cos(asin(x)) in closed form """
+        cosroll             =   np.sqrt(np.clip(1.0 - next_obs[:, index_Sroll] ** 2, 0.0, None))
         pitch_rad           =   np.arcsin(next_obs[:, index_SpitchCroll])/cosroll
         yaw_rad             =   np.arcsin(next_obs[:, index_SyawCroll])/cosroll
 
@@ -109,13 +125,13 @@ class QuadrotorEnv(VREPQuadRotmat):
             Hardcode to use nstack = 4
             statespaceof 18: (rotmat, pos, lin_vel, ang_vel)
         """
-        #index_SyawCroll     =   3
-        index_Sroll         =   6
-        index_SpitchCroll   =   7
+        #index_SyawCroll     =   self.layout.index('rotation_matrix', 3)
+        index_Sroll         =   self.layout.index('rotation_matrix', 6)
+        index_SpitchCroll   =   self.layout.index('rotation_matrix', 7)
 
         roll_sin            =   -next_obs[:, index_Sroll]
-        roll_rad            =   torch.asin(roll_sin)
-        cosroll             =   torch.cos(roll_rad)
+        """ cos(asin(x)) in closed form """
+        cosroll             =   torch.sqrt(torch.clamp(1.0 - roll_sin * roll_sin, min=0.0))
         pitch_sin           =   next_obs[:, index_SpitchCroll]/(cosroll + 1e-5)
         #yaw_rad             =   next_obs[:, index_SyawCroll]/(cosroll + 1e-5)
 
@@ -132,10 +148,18 @@ class QuadrotorEnv(VREPQuadRotmat):
         self.targetpos  =   tpos
 
 
-class QuadrotorEnvAugment(VREPQuadRotmatAugment):
-    def __init__(self, port, reward_type, fault_rotor=None):
-        super(QuadrotorEnvAugment, self).__init__(port=port)
+class QuadrotorEnv(QuadrotorRewards, VREPQuadRotmat):
+    def __init__(self, port, reward_type, fault_rotor=None, **kwargs):
+        super(QuadrotorEnv, self).__init__(port=port, **kwargs)
+        self._init_fault_reward(reward_type, fault_rotor)
 
+
+class QuadrotorAugmentRewards(object):
+    """
+        Fault mask and reward functions of the 21-dim (rotmat, pos, lin_vel, ang_vel, orientation) observation,
+        shared by the VREP and the NumPy environments
+    """
+    def _init_fault_reward(self, reward_type, fault_rotor=None):
         self.faultmotor =   fault_rotor
         self.mask       =   np.ones(4, dtype=np.float32)
                 
@@ -164,17 +188,16 @@ class QuadrotorEnvAugment(VREPQuadRotmatAugment):
             self.reward = self.pos_roll_pitch_rot_penalization
         else:
             assert True, 'Error: No valid reward function: example: ("type1")'
-    
+
     def step(self, action:np.ndarray):
         fault_action    =   self.mask * action
-        return super(QuadrotorEnvAugment, self).step(fault_action)
+        return super(QuadrotorAugmentRewards, self).step(fault_action)
 
     def distance_reward(self, next_obs):
         targetpos   =   self.targetpos
         targetpos   =   np.array([targetpos] * next_obs.shape[0])
 
-        # TODO: Must change if observation space changes
-        currpos     =   next_obs[:, 9:12]
+        currpos     =   next_obs[:, self.layout['position']]
 
         #distance    =   targetpos - currpos
         distance    =   currpos
@@ -185,7 +208,7 @@ class QuadrotorEnvAugment(VREPQuadRotmatAugment):
         #print(reward)
         return  reward
     def distance_reward_torch(self, next_obs):
-        currpos =   next_obs[:, 9:12]
+        currpos =   next_obs[:, self.layout['position']]
 
         distance    =   torch.sqrt(torch.sum(currpos * currpos, dim=1))
 
@@ -194,8 +217,8 @@ class QuadrotorEnvAugment(VREPQuadRotmatAugment):
 
     def roll_pitch_vel_penalized(self, next_obs):
         # rangues varing from [-10.0 to 10.0] we devide between 10 to scale
-        roll_pitch_ang_vel  =   next_obs[:, 15:17]/10.0
-        rel_distance        =   next_obs[:, 9:12]
+        roll_pitch_ang_vel  =   next_obs[:, self.layout['ang_vel']][:, :2]/10.0
+        rel_distance        =   next_obs[:, self.layout['position']]
 
         rwdistance          =   np.sqrt(np.sum(rel_distance * rel_distance, axis=1))
         rwdistance          =   4.0 - 1.25 * rwdistance
@@ -206,9 +229,9 @@ class QuadrotorEnvAugment(VREPQuadRotmatAugment):
 
     def roll_pitch_yaw_vel_penalized(self, next_obs):
         # rangues varing from [-10.0 to 10.0] we devide between 10 to scale
-        roll_pitch_ang_vel  =   next_obs[:, 15:17]/10.0
-        yaw_vel             =   next_obs[:, 17]/10.0    
-        rel_distance        =   next_obs[:, 9:12]
+        roll_pitch_ang_vel  =   next_obs[:, self.layout['ang_vel']][:, :2]/10.0
+        yaw_vel             =   next_obs[:, self.layout.index('ang_vel', 2)]/10.0
+        rel_distance        =   next_obs[:, self.layout['position']]
 
         #rwdistance          =   np.sqrt(np.sum(rel_distance * rel_distance, axis=1)+yaw_vel*yaw_vel)
         rwdistance          =   np.sqrt(np.sum(rel_distance * rel_distance, axis=1))
@@ -223,12 +246,13 @@ class QuadrotorEnvAugment(VREPQuadRotmatAugment):
             Hardcode to use nstack = 4
             statespaceof 18: (rotmat, pos, lin_vel, ang_vel)
         """
-        index_SyawCroll     =   3
-        index_Sroll         =   6
-        index_SpitchCroll   =   7
+        index_SyawCroll     =   self.layout.index('rotation_matrix', 3)
+        index_Sroll         =   self.layout.index('rotation_matrix', 6)
+        index_SpitchCroll   =   self.layout.index('rotation_matrix', 7)
 
         roll_rad            =   np.arcsin(-next_obs[:, index_Sroll])
-        cosroll             =   np.cos(roll_rad)
+        """ cos(asin(x)) in closed form """
+        cosroll             =   np.sqrt(np.clip(1.0 - next_obs[:, index_Sroll] ** 2, 0.0, None))
         pitch_rad           =   np.arcsin(next_obs[:, index_SpitchCroll])/cosroll
         yaw_rad             =   np.arcsin(next_obs[:, index_SyawCroll])/cosroll
 
@@ -242,12 +266,12 @@ class QuadrotorEnvAugment(VREPQuadRotmatAugment):
     def roll_pitch_angle_penalized(self, next_obs):
         """
             reward_type:    'type4'
-            Hardcoded
+            Indices from self.layout
             statespaceof 18: (rotmat, pos, lin_vel, ang_vel, orientation)
         """
         #index_SyawCroll     =   3
-        index_roll          =   18
-        index_pitch         =   19
+        index_roll          =   self.layout.index('orientation', 0)
+        index_pitch         =   self.layout.index('orientation', 1)
 
         roll_rad            =   next_obs[:, index_roll]
         
@@ -264,14 +288,14 @@ class QuadrotorEnvAugment(VREPQuadRotmatAugment):
     def roll_pitch_angle_rotyaw_penalized(self, next_obs):
         """
             reward_type:    'type5'
-            Hardcoded
+            Indices from self.layout
             statespaceof 18: (rotmat, pos, lin_vel, ang_vel, orientation)
         """
         #index_SyawCroll     =   3
-        index_roll          =   18
-        index_pitch         =   19
+        index_roll          =   self.layout.index('orientation', 0)
+        index_pitch         =   self.layout.index('orientation', 1)
 
-        index_rot_yaw       =   17
+        index_rot_yaw       =   self.layout.index('ang_vel', 2)
 
         """ Reward angular """
         roll_rad            =   next_obs[:, index_roll]
@@ -320,7 +344,7 @@ class QuadrotorEnvAugment(VREPQuadRotmatAugment):
             &   Position penalization
             &   rotation speed penalization, in 3 axes
         """
-        index_start_rot         =   15
+        index_start_rot         =   self.layout.index('ang_vel', 0)
         #constant_roll_pitch_rot =   -1e-1
         #constant_yaw_rot        =   -1e-2
         constant_roll_pitch_rot =   -1e-1
@@ -338,7 +362,7 @@ class QuadrotorEnvAugment(VREPQuadRotmatAugment):
             &   Penalization of position,
             &   rotation roll-pitch penalization
         """
-        index_start_rot         =   15
+        index_start_rot         =   self.layout.index('ang_vel', 0)
         constant_roll_pitch_rot =   -1e-2
         constant_yaw_rot        =   -1e-3
         #constant_roll_pitch_rot =   -1e-1
@@ -355,82 +379,15 @@ class QuadrotorEnvAugment(VREPQuadRotmatAugment):
         self.targetpos  =   tpos
     
 
-class QuadrotorAcelEnv(VREPQuadAccel):
-    def __init__(self, port, reward_type, fault_rotor=None):
-        super(QuadrotorAcelEnv, self).__init__(port=port)
-        
-        self.faultmotor =   fault_rotor
-        self.mask       =   np.ones(4, dtype=np.float32)
-                
-        if self.faultmotor is not None:
-            assert fault_rotor < 4, 'Choose a fault rotor in range of [0-3]'
-            self.mask[self.faultmotor]  =   0.0
-            print('QuadrotorAcelEnv Initialized with rotor {} faulted, and reward: {}'.format(self.faultmotor, reward_type))
-        else: print('QuadrotorAcelEnv Initialized in fault-free case, and reward: {}'.format(reward_type))
-        
-        """ Initialize Reward function """
-        if reward_type  ==  'type1':
-            self.reward =   self.distance_reward
-        else:
-            assert True, 'Error: No valid reward function: example: ("type1")'
-        
-
-    def step(self, action:np.ndarray):
-        fault_action    =   self.mask * action
-        return super(QuadrotorAcelEnv, self).step(fault_action)
-
-    def distance_reward(self, next_obs):
-        currpos =   next_obs[:, 0:3]
-
-        distance    =   torch.sqrt(torch.sum(currpos * currpos, dim=1))
-
-        reward      =   4.0 - 1.25 * distance
-        return reward
-
-    def set_targetpos(self, tpos:np.ndarray):
-        assert tpos.shape[0]    ==  3
-        self.targetpos  =   tpos
-
-
-class QuadrotorSimpleEnv(VREPQuadSimple):
-    def __init__(self, port, reward_type, fault_rotor=None):
-        super(QuadrotorSimpleEnv, self).__init__(port=port)
-        
-        self.faultmotor =   fault_rotor
-        self.mask       =   np.ones(4, dtype=np.float32)
-                
-        if self.faultmotor is not None:
-            assert fault_rotor < 4, 'Choose a fault rotor in range of [0-3]'
-            self.mask[self.faultmotor]  =   0.0
-            print('QuadrotorSimpleEnv Initialized with rotor {} faulted, and reward: {}'.format(self.faultmotor, reward_type))
-        else: print('QuadrotorSimpleEnv Initialized in fault-free case, and reward: {}'.format(reward_type))
-        
-        """ Initialize Reward function """
-        if reward_type  ==  'type1':
-            self.reward =   self.distance_reward
-        else:
-            assert True, 'Error: No valid reward function: example: ("type1")'
-        
-
-    def step(self, action:np.ndarray):
-        fault_action    =   self.mask * action
-        return super(QuadrotorSimpleEnv, self).step(fault_action)
-
-    def distance_reward(self, next_obs):
-        currpos =   next_obs[:, 0:3]
+class QuadrotorEnvAugment(QuadrotorAugmentRewards, VREPQuadRotmatAugment):
+    def __init__(self, port, reward_type, fault_rotor=None, **kwargs):
+        super(QuadrotorEnvAugment, self).__init__(port=port, **kwargs)
+        self._init_fault_reward(reward_type, fault_rotor)
 
-        distance    =   torch.sqrt(torch.sum(currpos * currpos, dim=1))
-
-        reward      =   4.0 - 1.25 * distance
-        return reward
-    
-    def set_targetpos(self, tpos:np.ndarray):
-        assert tpos.shape[0]    ==  3
-        self.targetpos  =   tpos
 
 class QuadrotorAcelRotmat(VREPQuadAccelRot):
-    def __init__(self, port, reward_type, fault_rotor=None):
-        super(QuadrotorAcelRotmat, self).__init__(port=port)
+    def __init__(self, port, reward_type, fault_rotor=None, **kwargs):
+        super(QuadrotorAcelRotmat, self).__init__(port=port, **kwargs)
         self.faultmotor =   fault_rotor
         self.mask       =   np.ones(4, dtype=np.float32)
 
@@ -451,7 +408,7 @@ class QuadrotorAcelRotmat(VREPQuadAccelRot):
         return super(QuadrotorAcelRotmat, self).step(fault_action)
 
     def distance_reward(self, next_obs):
-        currpos =   next_obs[:, 0:3]
+        currpos =   next_obs[:, self.layout['position']]
 
         distance    =   torch.sqrt(torch.sum(currpos * currpos, dim=1))
 
@@ -464,8 +421,8 @@ class QuadrotorAcelRotmat(VREPQuadAccelRot):
 
 
 class QuadrotorQuaternionAugment(VREPQuadQuaternionAugment):
-    def __init__(self, port, reward_type, fault_rotor=None):
-        super(QuadrotorQuaternionAugment, self).__init__(port=port)
+    def __init__(self, port, reward_type, fault_rotor=None, **kwargs):
+        super(QuadrotorQuaternionAugment, self).__init__(port=port, **kwargs)
         
         self.faultmotor =   fault_rotor
         self.mask       =   np.ones(4, dtype=np.float32)
@@ -495,7 +452,7 @@ class QuadrotorQuaternionAugment(VREPQuadQuaternionAugment):
         return super(QuadrotorQuaternionAugment, self).step(fault_action)
     
     def distance_reward_torch(self, next_obs):
-        currpos =   next_obs[:, 0:3]
+        currpos =   next_obs[:, self.layout['position']]
         distance    =   torch.sqrt(torch.sum(currpos * currpos, dim=1))
 
         reward      =   4.0 - 1.25 * distance
@@ -503,14 +460,14 @@ class QuadrotorQuaternionAugment(VREPQuadQuaternionAugment):
     def roll_pitch_angle_rotyaw_penalized(self, next_obs):
         """
             reward_type:    'type5'
-            Hardcoded
+            Indices from self.layout
             statespaceof 18: (rotmat, pos, lin_vel, ang_vel, orientation)
         """
         #index_SyawCroll     =   3
-        index_roll          =   13
-        index_pitch         =   14
+        index_roll          =   self.layout.index('orientation', 0)
+        index_pitch         =   self.layout.index('orientation', 1)
 
-        index_rot_yaw       =   8
+        index_rot_yaw       =   self.layout.index('ang_vel', 2)
 
         """ Reward angular """
         roll_rad            =   next_obs[:, index_roll]
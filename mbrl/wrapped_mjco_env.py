@@ -2,11 +2,17 @@ import gym
 import gym_reinmav
 import numpy as np
 import torch
-from scipy.spatial.transform import Rotation
 from gym_reinmav.envs.mujoco import MujocoQuadEnv
 from gym import spaces
+from wrapper_quad.rotations import quat_to_rotmat
+from wrapper_quad.observation_layout import ObservationLayout
+
+""" (rot_mat, pos, lin_vel, rot_vel, orient): 22, orient is the (x, y, z, w) quaternion """
+MUJOCO_LAYOUT   =   ObservationLayout([('rotation_matrix', 9), ('position', 3), ('lin_vel', 3), ('ang_vel', 3), ('quaternion', 4)])
 
 class QuadrotorMujocoEnv(gym.Env):
+    layout  =   MUJOCO_LAYOUT
+
     def __init__(self, port=None, reward_type='type1', fault_rotor=None):
         super(QuadrotorMujocoEnv, self).__init__()
         self.mujocoenv          =   MujocoQuadEnv()
@@ -15,8 +21,14 @@ class QuadrotorMujocoEnv(gym.Env):
         self.observation_space  =   spaces.Box(-np.inf, np.inf, (22,), np.float32)
         self.action_space       =   self.mujocoenv.action_space
 
-        if reward_type == 'type8':
-            self.reward =   pos_roll_pitch_rot_penalization
+        if self.faultmotor is not None:
+            assert fault_rotor < 4, 'Choose a fault rotor in range of [0-3]'
+            self.mask[self.faultmotor]  =   0.0
+
+        if reward_type  ==  'type1':
+            self.reward =   self.distance_reward_torch
+        elif reward_type == 'type8':
+            self.reward =   self.pos_roll_pitch_rot_penalization
 
     def step(self, action:np.ndarray):
         fault_action                =   self.mask * action
@@ -33,33 +45,21 @@ class QuadrotorMujocoEnv(gym.Env):
         return self._transform_observation(obs)
 
     def _transform_observation(self, _native_obs):
-        """
-            Reinmav Quadrotor mujoco, distribution of observation_space
-            [qpos, qvel]
-            [{pos[0-2], orientation[3-6]}, {lin_speed[7-9], rot_speed[10-12]}]--> (13, )
-        """
-        
-        orient  =   _native_obs[3:7]
-        pos     =   _native_obs[0:3]
-        lin_vel =   _native_obs[7:10]
-        rot_vel =   _native_obs[10:13]
-
-        rot_mat =   Rotation.from_quat(orient).as_matrix().flatten()
-        
-        return np.concatenate((rot_mat, pos, lin_vel, rot_vel, orient))
+        return transform_observations(np.asarray(_native_obs)[None])[0]
     
     def compute_rewards_distance(self, _obs):
-        position    =   _obs[9:12]
-        magnitud    =   np.sqrt((position * position).sum())
-
-        return 4.0 - 1.25 * magnitud
+        return compute_rewards_distance(np.asarray(_obs)[None])[0]
 
     def compute_done(self, _obs):
-        position    =   _obs[9:12]
-        magnitud    =   np.sqrt((position * position).sum())
+        return compute_done(np.asarray(_obs)[None])[0]
 
-        done    =   magnitud > 3.2
-        return done
+    def distance_reward_torch(self, next_obs, actions=None):
+        currpos =   next_obs[:, self.layout['position']]
+
+        distance    =   torch.sqrt(torch.sum(currpos * currpos, dim=1))
+
+        reward      =   4.0 - 1.25 * distance
+        return reward
     
     def pos_roll_pitch_rot_penalization(self, next_obs, acts):
         """ 
@@ -67,7 +67,7 @@ class QuadrotorMujocoEnv(gym.Env):
             &   Penalization of position,
             &   rotation roll-pitch penalization
         """
-        index_start_rot         =   15
+        index_start_rot         =   self.layout.index('ang_vel', 0)
         constant_roll_pitch_rot =   -1e-2
         constant_yaw_rot        =   -1e-3
         #constant_roll_pitch_rot =   -1e-1
@@ -78,3 +78,110 @@ class QuadrotorMujocoEnv(gym.Env):
         reward_speeds           =   constant_roll_pitch_rot * torch.sum(rotation_speeds[:,:2], axis=1) + constant_yaw_rot * rotation_speeds[:,-1]
 
         return reward_distance + reward_speeds
+
+
+def transform_observations(native_obs):
+    """
+        Reinmav Quadrotor mujoco, distribution of observation_space
+        [qpos, qvel]
+        [{pos[0-2], orientation[3-6]}, {lin_speed[7-9], rot_speed[10-12]}]--> (N, 13)
+        Return the (N, 22) observations (rot_mat, pos, lin_vel, rot_vel, orient). The
+        orientation is read in (x, y, z, w) order as scipy's Rotation.from_quat did
+    """
+    orient  =   native_obs[:, 3:7]
+    pos     =   native_obs[:, 0:3]
+    lin_vel =   native_obs[:, 7:10]
+    rot_vel =   native_obs[:, 10:13]
+
+    quat    =   orient / np.linalg.norm(orient, axis=1, keepdims=True)
+    obs     =   np.empty((native_obs.shape[0], MUJOCO_LAYOUT.size), dtype=native_obs.dtype)
+    fields  =   MUJOCO_LAYOUT.views(obs)
+    fields['rotation_matrix'][:]    =   quat_to_rotmat(quat).reshape(-1, 9)
+    fields['position'][:]           =   pos
+    fields['lin_vel'][:]            =   lin_vel
+    fields['ang_vel'][:]            =   rot_vel
+    fields['quaternion'][:]         =   orient
+
+    return obs
+
+
+def compute_rewards_distance(obs):
+    position    =   obs[:, MUJOCO_LAYOUT['position']]
+    magnitud    =   np.sqrt((position * position).sum(axis=1))
+
+    return 4.0 - 1.25 * magnitud
+
+
+def compute_done(obs):
+    position    =   obs[:, MUJOCO_LAYOUT['position']]
+    magnitud    =   np.sqrt((position * position).sum(axis=1))
+
+    return magnitud > 3.2
+
+
+class MujocoVecEnv(object):
+    """
+    Several MuJoCo quadrotor models in-process, stepped in a loop, with the
+    observation, reward and done computed on the whole batch. Same batched
+    interface as ParallelVrepEnv (n_parallel, reset, step, reset_remote,
+    get_reset_nrollouts), no IPC is involved
+    """
+    def __init__(self, max_path_length:int, n_envs:int, reward_type='type1', cripple_rotor=None):
+        self.n_parallel         =   n_envs
+        self._num_envs          =   n_envs
+        self.max_path_length    =   max_path_length
+        self.num_rollouts       =   [0] * n_envs
+        self.ts                 =   np.zeros(n_envs, dtype=np.int64)
+        self.stats              =   dict(restarts=0, timeouts=0, crashes=0)
+
+        self.envs   =   [QuadrotorMujocoEnv(reward_type=reward_type, fault_rotor=cripple_rotor) for _ in range(n_envs)]
+        self.env_   =   self.envs[0]
+        self.masks  =   np.stack([env.mask for env in self.envs], axis=0)
+
+    def step(self, actions):
+        """
+        actions:    (N, 4)
+        Return the batched next observations, rewards, dones and env_infos
+        """
+        actions     =   np.asarray(actions) * self.masks
+        native_obs  =   []
+        infos       =   []
+        for env, action in zip(self.envs, actions):
+            native_ob, _, _, info   =   env.mujocoenv.step(action)
+            native_obs.append(native_ob)
+            infos.append(info)
+
+        obs     =   transform_observations(np.stack(native_obs, axis=0))
+        rewards =   compute_rewards_distance(obs)
+        self.ts +=  1
+        dones   =   compute_done(obs) | (self.ts >= self.max_path_length)
+        self.ts[dones]  =   0
+
+        return obs, rewards, dones, infos
+
+    def reset(self):
+        self.ts[:] =   0
+        return list(transform_observations(np.stack([env.mujocoenv.reset() for env in self.envs], axis=0)))
+
+    def reset_remote(self, index):
+        self.ts[index]              =   0
+        self.num_rollouts[index]    +=  1
+        return self.envs[index].reset()
+
+    def get_reset_nrollouts(self):
+        """ Rollouts of each environment since the last call (the counters restart at zero) """
+        nrollouts           =   self.num_rollouts
+        self.num_rollouts   =   [0] * len(nrollouts)
+        return nrollouts
+
+    def close(self):
+        for env in self.envs:
+            env.mujocoenv.close()
+
+    @property
+    def getenv(self):
+        return self.env_
+
+    @property
+    def num_envs(self):
+        return self._num_envs
@@ -0,0 +1,18 @@
+# Environments of the NumPy simulator (wrapper_quad/numpy_sim.py), same rewards and fault
+# masks as their VREP counterparts of mbrl/wrapped_env.py
+from wrapper_quad.numpy_sim import NumpyQuadRotmat, NumpyQuadRotmatAugment
+from mbrl.wrapped_env import QuadrotorRewards, QuadrotorAugmentRewards
+
+
+class QuadrotorNumpyEnv(QuadrotorRewards, NumpyQuadRotmat):
+    """ QuadrotorEnv on the NumPy simulator (no VREP) """
+    def __init__(self, port, reward_type, fault_rotor=None, **kwargs):
+        super(QuadrotorNumpyEnv, self).__init__(port=port, **kwargs)
+        self._init_fault_reward(reward_type, fault_rotor)
+
+
+class QuadrotorNumpyEnvAugment(QuadrotorAugmentRewards, NumpyQuadRotmatAugment):
+    """ QuadrotorEnvAugment on the NumPy simulator (no VREP) """
+    def __init__(self, port, reward_type, fault_rotor=None, **kwargs):
+        super(QuadrotorNumpyEnvAugment, self).__init__(port=port, **kwargs)
+        self._init_fault_reward(reward_type, fault_rotor)
@@ -0,0 +1,53 @@
+"""
+    Tests of the connection pool (wrapper_quad/connection.py) with the remote API calls
+    replaced (no VREP), run with pytest
+"""
+from wrapper_quad.connection import ConnectionPool
+import wrapper_quad.vrep as vrep
+import pytest
+
+
+@pytest.fixture
+def remote_api(monkeypatch):
+    """ Fake remote API recording the calls, every simxStart opens a new client """
+    calls   =   []
+    clients =   iter(range(100))
+    monkeypatch.setattr(vrep, 'simxStart', lambda *args: next(clients))
+    monkeypatch.setattr(vrep, 'simxGetConnectionId', lambda clientID: clientID)
+    monkeypatch.setattr(vrep, 'simxFinish', lambda clientID: calls.append(('finish', clientID)))
+    monkeypatch.setattr(vrep, 'simxClearIntegerSignal', lambda clientID, *args: calls.append(('clear', clientID)))
+    monkeypatch.setattr(vrep, 'simxStopSimulation', lambda clientID, *args: calls.append(('stop', clientID)))
+    return calls
+
+
+def test_users_follow_acquire_and_release(remote_api):
+    pool        =   ConnectionPool(keep_alive=False)
+    clientID    =   pool.acquire('127.0.0.1', 19999)
+    assert pool.acquire('127.0.0.1', 19999) == clientID
+    assert pool.users(clientID) == 2
+    pool.release(clientID)
+    assert pool.users(clientID) == 1 and remote_api == []
+    pool.release(clientID)
+    assert pool.users(clientID) == 0 and remote_api == [('finish', clientID)]
+
+
+def test_close_stops_the_simulation_on_the_last_release(remote_api, monkeypatch):
+    pytest.importorskip('gym')
+    import wrapper_quad.wrapper as wrapper
+    pool    =   ConnectionPool(keep_alive=True)
+    monkeypatch.setattr(wrapper, 'pool', pool)
+    monkeypatch.setattr(wrapper.time, 'sleep', lambda seconds: None)
+
+    envs    =   []
+    for _ in range(2):
+        env                 =   wrapper.WrapperQuad.__new__(wrapper.WrapperQuad)
+        env.recorder        =   None
+        env.owns_client     =   True
+        env.clientID        =   pool.acquire('127.0.0.1', 19999)
+        envs.append(env)
+
+    envs[0].close()
+    assert remote_api == []
+    envs[1].close()
+    assert ('stop', envs[1].clientID) in remote_api
+    assert pool.users(envs[1].clientID) == 0
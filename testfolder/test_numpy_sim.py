@@ -0,0 +1,179 @@
+"""
+    Tests of the NumPy simulator environments (wrapper_quad/numpy_sim.py), run with pytest
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip('gym')
+from wrapper_quad.numpy_sim import NumpyVecEnv, NumpyQuadRotmatAugment
+
+
+def make_vecenv(n_envs=3, max_path_length=2, **kwargs):
+    return NumpyVecEnv(max_path_length=max_path_length, n_envs=n_envs, envClass=NumpyQuadRotmatAugment, reward_type=None, cripple_rotor=None, **kwargs)
+
+
+def test_get_reset_nrollouts_counts_since_the_last_call():
+    vecenv  =   make_vecenv()
+    vecenv.reset()
+    vecenv.reset_remote(0)
+    vecenv.reset_remote(0)
+    vecenv.reset_remote(2)
+    assert vecenv.get_reset_nrollouts() == [2, 0, 1]
+    assert vecenv.get_reset_nrollouts() == [0, 0, 0]
+    vecenv.reset_remote(1)
+    assert vecenv.get_reset_nrollouts() == [0, 1, 0]
+
+
+def test_step_matches_the_scalar_observation():
+    """ The batched rotation matrices pushed by step give the observation of the scalar path """
+    np.random.seed(0)
+    vecenv  =   make_vecenv(n_envs=4, max_path_length=100)
+    vecenv.reset()
+    for _ in range(3):
+        obs, _, _, _    =   vecenv.step(np.random.uniform(40.0, 60.0, (4, 4)))
+    for idx, env in enumerate(vecenv.envs):
+        env.pushed_state, env.pushed_rotation_matrix    =   None, None
+        scalar  =   env._flat_observation(env._write_observation(compute_acelleration=False))
+        np.testing.assert_allclose(obs[idx], scalar, atol=1e-6)
+
+
+def test_last_observation_has_every_field_and_is_not_overwritten():
+    """ sanity_check flattens last_observation with the _flat_observation_st of other classes """
+    from wrapper_quad.observation_layout import ACCEL_ROT, ROTMAT, ROTMAT_AUGMENT
+    vecenv  =   make_vecenv(n_envs=1, max_path_length=100)
+    vecenv.reset()
+    vecenv.step(np.full((1, 4), 60.0))
+    env     =   vecenv.envs[0]
+    last    =   env.last_observation
+    flats   =   [layout.flatten(last) for layout in (ACCEL_ROT, ROTMAT, ROTMAT_AUGMENT)]
+    vecenv.step(np.full((1, 4), 40.0))
+    assert env.last_observation is not last
+    np.testing.assert_array_equal(flats[2], ROTMAT_AUGMENT.flatten(last))
+    assert not np.allclose(flats[2], ROTMAT_AUGMENT.flatten(env.last_observation))
+
+
+def test_step_records_a_trace_per_env(tmp_path):
+    from wrapper_quad.replay import TraceRecorder
+    vecenv  =   make_vecenv(n_envs=2, max_path_length=100, env_kwargs=dict(record_path=str(tmp_path / 'trace_{port}.npz')))
+    vecenv.reset()
+    actions =   [np.full((2, 4), 50.0), np.full((2, 4), 55.0)]
+    obses   =   [vecenv.step(action)[0] for action in actions]
+    vecenv.close()
+    for idx in range(2):
+        trace   =   TraceRecorder.load(str(tmp_path / 'trace_{}.npz'.format(idx)))
+        np.testing.assert_array_equal(trace['actions'], [action[idx] for action in actions])
+        np.testing.assert_array_equal(trace['observations'], [obs[idx] for obs in obses])
+        np.testing.assert_array_equal(trace['episode_starts'], [0])
+
+
+def test_step_computes_only_the_fields_of_the_layout():
+    """ The acceleration of a layout without it is computed when last_observation is read, not per step """
+    vecenv  =   make_vecenv(n_envs=1, max_path_length=100)
+    vecenv.reset()
+    env     =   vecenv.envs[0]
+    calls   =   []
+    compute_aceleration     =   env.compute_aceleration
+    env.compute_aceleration =   lambda linv, angv: calls.append(1) or compute_aceleration(linv, angv)
+    for _ in range(3):
+        vecenv.step(np.full((1, 4), 50.0))
+    assert calls == []
+    last    =   env.last_observation
+    assert calls == [1] and env.last_observation is last
+    np.testing.assert_allclose(last['lin_acel'], last['lin_vel'] / env.control_dt, rtol=1e-6)
+
+
+def test_hover_speed_keeps_a_level_quadrotor_still():
+    from wrapper_quad.numpy_sim import NumpyQuadSim
+    sim     =   NumpyQuadSim(2)
+    sim.set_states([0, 1], np.zeros((2, 3)), np.zeros((2, 3)))
+    np.testing.assert_allclose(sim.hover_speed, 50.0, atol=0.1)
+    for _ in range(100):
+        sim.step(np.full((2, 4), sim.hover_speed))
+    np.testing.assert_allclose(sim.pos, 0.0, atol=1e-9)
+    np.testing.assert_allclose(sim.vel, 0.0, atol=1e-9)
+    """ Less thrust falls """
+    sim.step(np.full((2, 4), 0.9 * sim.hover_speed))
+    assert np.all(sim.vel[:, 2] < 0.0)
+
+
+def test_yaw_torque_follows_the_rotor_imbalance():
+    """ Rotors 0 and 2 spin positive: speeding them up yaws positive, with the same total thrust """
+    from wrapper_quad.numpy_sim import NumpyQuadSim
+    sim     =   NumpyQuadSim(2)
+    sim.set_states([0, 1], np.zeros((2, 3)), np.zeros((2, 3)))
+    imbalance   =   np.array([[5.0, -5.0, 5.0, -5.0], [-5.0, 5.0, -5.0, 5.0]])
+    for _ in range(5):
+        sim.step(sim.hover_speed + imbalance)
+    assert sim.omega[0, 2] > 0.0 and sim.omega[1, 2] < 0.0
+    np.testing.assert_allclose(sim.omega[:, :2], 0.0, atol=1e-9)
+    yaw     =   sim.packed_states()[:, 5]
+    assert yaw[0] > 0.0 and yaw[1] < 0.0
+    np.testing.assert_allclose(sim.pos, 0.0, atol=1e-9)
+
+
+def test_quaternion_stays_unit_norm():
+    from wrapper_quad.numpy_sim import NumpyQuadSim
+    np.random.seed(0)
+    sim     =   NumpyQuadSim(8)
+    for _ in range(200):
+        sim.step(np.random.uniform(0.0, 100.0, (8, 4)))
+    np.testing.assert_allclose(np.linalg.norm(sim.quat, axis=1), 1.0, atol=1e-12)
+
+
+def test_finished_env_is_frozen_until_reset_remote():
+    vecenv  =   make_vecenv(n_envs=2, max_path_length=2)
+    vecenv.reset()
+    vecenv.step(np.full((2, 4), 60.0))
+    obs, _, dones, _    =   vecenv.step(np.full((2, 4), 60.0))
+    assert dones.all()
+    state   =   vecenv.sim.pos.copy()
+    """ Nobody reset them: still done, same observation, no reward and no physics """
+    obs_, rws, dones, _ =   vecenv.step(np.full((2, 4), 100.0))
+    assert dones.all() and not rws.any()
+    np.testing.assert_array_equal(obs_, obs)
+    np.testing.assert_array_equal(vecenv.sim.pos, state)
+    vecenv.reset_remote(1)
+    state   =   vecenv.sim.pos.copy()
+    _, _, dones, _  =   vecenv.step(np.full((2, 4), 100.0))
+    assert dones.tolist() == [True, False]
+    np.testing.assert_array_equal(vecenv.sim.pos[0], state[0])
+    assert vecenv.sim.pos[1, 2] > state[1, 2]
+
+
+def test_step_random_stops_each_trajectory_at_its_done():
+    np.random.seed(0)
+    vecenv  =   make_vecenv(n_envs=2, max_path_length=3)
+    vecenv.reset()
+    vecenv.step(np.full((2, 4), 50.0))
+    vecenv.reset_remote(1)
+    trajectories    =   vecenv.step_random(5)
+    assert [len(trajectory['dones']) for trajectory in trajectories] == [2, 3]
+    for trajectory in trajectories:
+        assert trajectory['actions'].shape == (len(trajectory['dones']), 4)
+        assert trajectory['observations'].shape == (len(trajectory['dones']), 21)
+        assert trajectory['dones'].tolist() == [False] * (len(trajectory['dones']) - 1) + [True]
+        assert 'reset_observation' not in trajectory
+
+
+def test_fault_mask_zeroes_the_crippled_rotor():
+    pytest.importorskip('torch')
+    from mbrl.wrapped_numpy_env import QuadrotorNumpyEnvAugment
+    vecenv  =   NumpyVecEnv(max_path_length=100, n_envs=2, envClass=QuadrotorNumpyEnvAugment, reward_type='type1', cripple_rotor=1)
+    np.testing.assert_array_equal(vecenv.masks, [[1, 0, 1, 1]] * 2)
+    speeds  =   []
+    step    =   vecenv.sim.step
+    vecenv.sim.step =   lambda speeds_, active=None: speeds.append(speeds_) or step(speeds_, active)
+    vecenv.reset()
+    vecenv.step(np.full((2, 4), 60.0))
+    np.testing.assert_array_equal(speeds[0], [[60, 0, 60, 60]] * 2)
+
+
+def test_decode_environment_resolves_the_numpy_envs():
+    pytest.importorskip('torch')
+    from utils.utility import DecodeEnvironment
+    from wrapper_quad.numpy_sim import NumpySimMixin
+    import mbrl.wrapped_numpy_env as wrapped_numpy_env
+    for name in ['QuadrotorNumpyEnv', 'QuadrotorNumpyEnvAugment']:
+        envClass    =   DecodeEnvironment(name)
+        assert envClass is getattr(wrapped_numpy_env, name)
+        assert issubclass(envClass, NumpySimMixin)
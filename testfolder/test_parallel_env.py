@@ -0,0 +1,202 @@
+"""
+    Tests of mbrl/parallel_env.py with fake environments in real worker processes (no VREP),
+    run with pytest
+"""
+from mbrl.parallel_env import ParallelVrepEnv
+import numpy as np
+import pytest
+import time
+import os
+
+
+class FakeSpace(object):
+    def __init__(self, shape):
+        """ Same generator state in every process until seeded """
+        self.shape      =   shape
+        self.np_random  =   np.random.RandomState(0)
+
+    def seed(self, seed=None):
+        self.np_random.seed(seed)
+        return [seed]
+
+    def sample(self):
+        return self.np_random.uniform(0.0, 100.0, self.shape).astype(np.float32)
+
+
+class FakeEnv(object):
+    """
+    Observation [port, time step]. The reset of port hang_port sleeps once when hang_file
+    exists (the file is removed), so its worker times out and is respawned
+    """
+    def __init__(self, port=None, reward_type=None, fault_rotor=None, hang_port=None, hang_file=None, **kwargs):
+        self.port           =   port
+        self.hang_port      =   hang_port
+        self.hang_file      =   hang_file
+        self.t              =   0
+        self.action_space   =   self._get_action_space()
+        self.observation_space  =   self._get_state_space()
+
+    @classmethod
+    def _get_state_space(cls):
+        return FakeSpace((2,))
+
+    @classmethod
+    def _get_action_space(cls):
+        return FakeSpace((4,))
+
+    def reset(self):
+        if self.port == self.hang_port and self.hang_file is not None and os.path.exists(self.hang_file):
+            os.remove(self.hang_file)
+            time.sleep(10.0)
+        self.t  =   0
+        return np.array([self.port, 0.0], dtype=np.float32)
+
+    def step(self, action):
+        self.t  +=  1
+        return np.array([self.port, self.t], dtype=np.float32), 1.0, False, dict()
+
+    def real_time_factor(self):
+        return 1.0
+
+    def close(self):
+        pass
+
+
+def make_vecenv(tmp_path, shared_memory, max_path_length=100):
+    return ParallelVrepEnv(max_path_length=max_path_length, ports=[0, 1, 2, 3], envClass=FakeEnv, reward_type=None, cripple_rotor=None,
+                            shared_memory=shared_memory, auto_reset=True, envs_per_worker=2, timeout=2.0, reset_timeout=0.5,
+                            restart_backoff=0.0, env_kwargs=dict(hang_port=0, hang_file=str(tmp_path / 'hang')))
+
+
+@pytest.mark.parametrize('shared_memory', [False, True])
+def test_reset_timeout_truncates_the_other_envs_of_the_worker(tmp_path, shared_memory):
+    vecenv  =   make_vecenv(tmp_path, shared_memory)
+    try:
+        vecenv.reset()
+        vecenv.step_random(2)
+        (tmp_path / 'hang').touch()
+        observation =   vecenv.reset_remote(0)
+        assert vecenv.stats['restarts'] == 1
+        np.testing.assert_array_equal(observation, [0.0, 0.0])
+
+        trajectories    =   vecenv.step_random(3)
+        """ Env 1 shared the worker of env 0: its old episode is lost, the steps start the new one """
+        assert trajectories[1]['env_info']['truncated']
+        np.testing.assert_array_equal(trajectories[1]['episode_start'], [1.0, 0.0])
+        np.testing.assert_array_equal(trajectories[1]['observations'][:, 1], [1.0, 2.0, 3.0])
+        for idx in (0, 2, 3):
+            assert not trajectories[idx]['env_info'].get('truncated', False)
+            assert 'episode_start' not in trajectories[idx]
+    finally:
+        vecenv.close()
+
+
+def test_runner_keeps_the_steps_of_a_truncated_trajectory(tmp_path):
+    pytest.importorskip('torch')
+    pytest.importorskip('tqdm')
+    from types import SimpleNamespace
+    from mbrl.runner import Runner, StackStAct, _get_empty_running_paths_dict
+
+    vecenv  =   make_vecenv(tmp_path, shared_memory=True, max_path_length=5)
+    try:
+        env_    =   FakeEnv()
+        runner  =   Runner(vecenv, env_, SimpleNamespace(stack_n=2), None, max_path_len=5, total_nsteps=20, random_chunk=3)
+        runner._reset_times =   []
+        obses   =   vecenv.reset()
+        stack_as        =   [StackStAct(env_.action_space.shape, env_.observation_space.shape, n=2, init_st=ob) for ob in obses]
+        running_paths   =   [_get_empty_running_paths_dict() for _ in range(vecenv.n_parallel)]
+        paths           =   []
+        runner._run_random_chunk(stack_as, running_paths, paths)
+        (tmp_path / 'hang').touch()
+        runner._timed_reset_remote(0)
+        running_paths[0]    =   _get_empty_running_paths_dict()
+        stack_as[0].reset_stacks(init_st=np.array([0.0, 0.0], dtype=np.float32))
+
+        runner._run_random_chunk(stack_as, running_paths, paths)
+        """ Env 1 restarted: its 3 new steps are recorded from the new episode, the 3 old ones dropped """
+        assert len(running_paths[1]['rewards']) == 3
+        np.testing.assert_array_equal(running_paths[1]['delta_obs'][0], [0.0, 1.0])
+    finally:
+        vecenv.close()
+
+
+def test_workers_sample_different_random_actions(tmp_path):
+    vecenv  =   make_vecenv(tmp_path, shared_memory=False)
+    try:
+        vecenv.reset()
+        trajectories    =   vecenv.step_random(3)
+        actions         =   [trajectory['actions'] for trajectory in trajectories]
+        for idx in range(1, len(actions)):
+            assert not np.allclose(actions[0], actions[idx])
+    finally:
+        vecenv.close()
+
+
+def test_step_many_with_an_empty_sequence(tmp_path):
+    vecenv  =   make_vecenv(tmp_path, shared_memory=False)
+    try:
+        vecenv.reset()
+        actions_seq     =   [np.zeros((2, 4), np.float32), np.zeros((0, 4), np.float32), np.zeros((1, 4), np.float32), np.zeros((2, 4), np.float32)]
+        trajectories    =   vecenv.step_many(actions_seq)
+        assert [len(trajectory['actions']) for trajectory in trajectories] == [2, 0, 1, 2]
+        assert vecenv.stats['restarts'] == 0
+        with pytest.raises(AssertionError):
+            vecenv.step_random(0)
+    finally:
+        vecenv.close()
+
+
+def collect_around_a_truncation(tmp_path, use_step):
+    """ 2 steps, reset_remote(0) respawning the worker of envs 0 and 1, 3 steps: with vecenv.step or step_random """
+    from types import SimpleNamespace
+    from mbrl.runner import Runner, StackStAct, _get_empty_running_paths_dict
+
+    vecenv  =   make_vecenv(tmp_path, shared_memory=True, max_path_length=5)
+    try:
+        env_    =   FakeEnv()
+        runner  =   Runner(vecenv, env_, SimpleNamespace(stack_n=2), None, max_path_len=5, total_nsteps=20)
+        runner._reset_times =   []
+        obses   =   vecenv.reset()
+        stack_as        =   [StackStAct(env_.action_space.shape, env_.observation_space.shape, n=2, init_st=ob) for ob in obses]
+        running_paths   =   [_get_empty_running_paths_dict() for _ in range(vecenv.n_parallel)]
+        paths           =   []
+        def advance(k):
+            if not use_step:
+                runner.random_chunk =   k
+                return runner._run_random_chunk(stack_as, running_paths, paths)
+            new_samples =   0
+            for _ in range(k):
+                actions =   np.zeros((vecenv.n_parallel, 4), dtype=np.float32)
+                next_obs, rewards, dones, env_infos =   vecenv.step(actions)
+                new_samples +=  runner._record_step(stack_as, running_paths, paths, actions, next_obs, rewards, dones, env_infos)
+            return new_samples
+
+        n_samples   =   advance(2)
+        (tmp_path / 'hang').touch()
+        stack_as[0].reset_stacks(init_st=runner._timed_reset_remote(0))
+        running_paths[0]    =   _get_empty_running_paths_dict()
+        n_samples   +=  advance(3)
+        return n_samples, paths, running_paths
+    finally:
+        vecenv.close()
+
+
+def test_step_and_step_random_record_a_truncation_alike(tmp_path):
+    pytest.importorskip('torch')
+    pytest.importorskip('tqdm')
+    (tmp_path / 'step').mkdir()
+    (tmp_path / 'random').mkdir()
+    n_step, paths_step, running_step        =   collect_around_a_truncation(tmp_path / 'step', use_step=True)
+    n_random, paths_random, running_random  =   collect_around_a_truncation(tmp_path / 'random', use_step=False)
+
+    assert n_step == n_random == 10
+    assert len(paths_step) == len(paths_random)
+    for path_step, path_random in zip(paths_step, paths_random):
+        np.testing.assert_array_equal(path_step['observations'], path_random['observations'])
+        np.testing.assert_array_equal(path_step['delta_obs'], path_random['delta_obs'])
+    for running_s, running_r in zip(running_step, running_random):
+        assert len(running_s['rewards']) == len(running_r['rewards'])
+        np.testing.assert_array_equal(running_s['observations'], running_r['observations'])
+    """ Env 1 lost its episode: its 3 steps start from the new initial observation """
+    assert len(running_step[1]['rewards']) == 3
+    np.testing.assert_array_equal(running_step[1]['delta_obs'][0], [0.0, 1.0])
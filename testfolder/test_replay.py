@@ -0,0 +1,46 @@
+"""
+    Tests of the trace recorder of wrapper_quad/replay.py, run with pytest
+"""
+import numpy as np
+import pytest
+import os
+
+pytest.importorskip('gym')
+from wrapper_quad.replay import TraceRecorder
+
+
+def record_episodes(recorder, lengths):
+    """ Episodes of the given lengths, observation [episode, step], action [step] * 4 """
+    for episode, length in enumerate(lengths):
+        recorder.begin_episode(np.array([episode, -1.0], dtype=np.float32))
+        for step in range(length):
+            recorder.record(np.full(4, step, dtype=np.float32), np.array([episode, step], dtype=np.float32), float(step), step == length - 1)
+            assert len(recorder.actions) < recorder.chunk_steps
+
+
+def test_steps_are_flushed_in_parts_and_joined_on_save(tmp_path):
+    path        =   str(tmp_path / 'trace.npz')
+    recorder    =   TraceRecorder(path, meta=dict(dt=0.05), chunk_steps=3)
+    record_episodes(recorder, [4, 3])
+    assert recorder.n_parts == 2 and len(recorder.actions) == 1
+    recorder.save()
+    assert sorted(os.listdir(str(tmp_path))) == ['trace.npz']
+
+    trace   =   TraceRecorder.load(path)
+    np.testing.assert_array_equal(trace['episode_starts'], [0, 4])
+    np.testing.assert_array_equal(trace['reset_observations'][:, 0], [0.0, 1.0])
+    np.testing.assert_array_equal(trace['observations'][:, 1], [0, 1, 2, 3, 0, 1, 2])
+    np.testing.assert_array_equal(trace['actions'][:, 0], [0, 1, 2, 3, 0, 1, 2])
+    np.testing.assert_array_equal(trace['dones'], [False, False, False, True, False, False, True])
+    assert trace['meta'] == dict(dt=0.05)
+
+
+def test_load_recovers_the_parts_of_an_unsaved_trace(tmp_path):
+    path        =   str(tmp_path / 'trace.npz')
+    recorder    =   TraceRecorder(path, chunk_steps=2)
+    record_episodes(recorder, [5])
+    """ Crash before save(): the flushed steps are on disk, the last one is lost """
+    trace   =   TraceRecorder.load(path)
+    np.testing.assert_array_equal(trace['observations'][:, 1], [0, 1, 2, 3])
+    np.testing.assert_array_equal(trace['episode_starts'], [0])
+    assert trace['meta'] == dict()
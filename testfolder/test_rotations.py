@@ -0,0 +1,97 @@
+"""
+    Property tests of wrapper_quad/rotations.py against the 3-matrix product
+    R = Rz(gamma)*Ry(beta)*Rx(alpha), run with pytest.
+    python testfolder/test_rotations.py runs the throughput benchmark
+"""
+from wrapper_quad import rotations
+from wrapper_quad.utility import GetRotationMatrix
+import numpy as np
+import pytest
+import math
+import time
+
+
+def reference_rotation_matrix(eulerAngles):
+    """ Previous implementation of utility.GetRotationMatrix """
+    alpha, beta, gamma = eulerAngles
+    rx  =   np.array([[1, 0, 0], [0, math.cos(alpha), -math.sin(alpha)], [0, math.sin(alpha), math.cos(alpha)]])
+    ry  =   np.array([[math.cos(beta), 0, math.sin(beta)], [0, 1, 0], [-math.sin(beta), 0, math.cos(beta)]])
+    rz  =   np.array([[math.cos(gamma), -math.sin(gamma), 0], [math.sin(gamma), math.cos(gamma), 0], [0, 0, 1]])
+    return np.dot(rz, np.dot(ry, rx))
+
+
+def random_euler(n, seed=0):
+    """ beta inside (-pi/2, pi/2) where the Euler angles are unique """
+    rng     =   np.random.RandomState(seed)
+    euler   =   rng.uniform(-np.pi, np.pi, (n, 3))
+    euler[:, 1] =   rng.uniform(-np.pi / 2.0 + 1e-3, np.pi / 2.0 - 1e-3, n)
+    return euler
+
+
+def test_euler_to_rotmat_matches_reference():
+    euler   =   random_euler(500)
+    R       =   rotations.euler_to_rotmat(euler)
+    for idx in range(euler.shape[0]):
+        assert np.allclose(R[idx], reference_rotation_matrix(euler[idx]), atol=1e-12)
+        assert np.allclose(GetRotationMatrix(euler[idx]), reference_rotation_matrix(euler[idx]), atol=1e-12)
+
+
+def test_rotmat_is_orthonormal():
+    R   =   rotations.euler_to_rotmat(random_euler(500))
+    assert np.allclose(np.einsum('bij,bkj->bik', R, R), np.eye(3)[None], atol=1e-12)
+    assert np.allclose(np.linalg.det(R), 1.0)
+
+
+def test_euler_roundtrip():
+    euler   =   random_euler(500)
+    assert np.allclose(rotations.rotmat_to_euler(rotations.euler_to_rotmat(euler)), euler, atol=1e-9)
+    assert np.allclose(rotations.quat_to_euler(rotations.euler_to_quat(euler)), euler, atol=1e-9)
+
+
+def test_quaternion_consistency():
+    euler   =   random_euler(500)
+    quat    =   rotations.euler_to_quat(euler)
+    assert np.allclose(np.linalg.norm(quat, axis=1), 1.0)
+    assert np.allclose(rotations.quat_to_rotmat(quat), rotations.euler_to_rotmat(euler), atol=1e-12)
+    """ q and -q are the same rotation, rotmat_to_quat returns w >= 0 """
+    quat    =   quat * np.sign(quat[:, 3:4])
+    assert np.allclose(rotations.rotmat_to_quat(rotations.euler_to_rotmat(euler)), quat, atol=1e-9)
+
+
+def test_rotmat_to_quat_half_turns():
+    """ 180 degrees rotations, where w = 0 """
+    axes    =   np.array([[1, 0, 0], [0, 1, 0], [0, 0, 1], [1, -1, 0], [1, 1, 1], [0, -2, 1]], dtype=np.float64)
+    axes    =   axes / np.linalg.norm(axes, axis=1, keepdims=True)
+    quat    =   np.concatenate((axes, np.zeros((axes.shape[0], 1))), axis=1)
+    R       =   rotations.quat_to_rotmat(quat)
+    assert np.allclose(rotations.quat_to_rotmat(rotations.rotmat_to_quat(R)), R, atol=1e-12)
+
+
+def test_torch_backend():
+    torch   =   pytest.importorskip('torch')
+    euler   =   random_euler(100)
+    euler_t =   torch.from_numpy(euler)
+    assert np.allclose(rotations.euler_to_rotmat(euler_t).numpy(), rotations.euler_to_rotmat(euler))
+    assert np.allclose(rotations.rotmat_to_euler(rotations.euler_to_rotmat(euler_t)).numpy(), euler, atol=1e-9)
+    assert np.allclose(rotations.rotmat_to_quat(rotations.euler_to_rotmat(euler_t)).numpy(), rotations.rotmat_to_quat(rotations.euler_to_rotmat(euler)))
+
+
+if __name__ == '__main__':
+    n       =   10000
+    euler   =   random_euler(n)
+
+    t_start =   time.time()
+    for idx in range(n): reference_rotation_matrix(euler[idx])
+    t_reference =   time.time() - t_start
+
+    t_start =   time.time()
+    for idx in range(n): GetRotationMatrix(euler[idx])
+    t_closed    =   time.time() - t_start
+
+    t_start =   time.time()
+    rotations.euler_to_rotmat(euler)
+    t_batched   =   time.time() - t_start
+
+    print('3-matrix product:\t{:.0f} rotations/sec'.format(n / t_reference))
+    print('GetRotationMatrix:\t{:.0f} rotations/sec'.format(n / t_closed))
+    print('euler_to_rotmat (N={}):\t{:.0f} rotations/sec'.format(n, n / t_batched))
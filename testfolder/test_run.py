@@ -0,0 +1,51 @@
+"""
+    Tests of the configuration checks and environment options of mbrl/run.py, the VREP
+    environments are built against a fake remote API (no VREP), run with pytest
+"""
+from mbrl.run import DEFAULT_CONFIG, LEGACY_ENVIRONMENTS, check_config, environment_kwargs
+from utils.utility import ENVIRONMENTS, DecodeEnvironment
+from wrapper_quad.connection import ConnectionPool
+import wrapper_quad.vrep as vrep
+import pytest
+
+""" Return values of the remote API calls made while building an environment, the others return simx_return_ok """
+REMOTE_API  =   dict(
+                    simxStart=0,
+                    simxGetConnectionId=0,
+                    simxGetFloatingParameter=(vrep.simx_return_ok, 0.01),
+                    simxGetBooleanParameter=(vrep.simx_return_ok, True),
+                    simxGetIntegerParameter=(vrep.simx_return_ok, 0),
+                    simxGetObjectHandle=(vrep.simx_return_ok, 1)
+                )
+
+
+@pytest.fixture
+def remote_api(monkeypatch):
+    pytest.importorskip('gym')
+    pytest.importorskip('torch')
+    import wrapper_quad.wrapper as wrapper
+    for name in dir(vrep):
+        if name.startswith('simx') and callable(getattr(vrep, name)):
+            value   =   REMOTE_API.get(name, vrep.simx_return_ok)
+            monkeypatch.setattr(vrep, name, lambda *args, value=value: value)
+    monkeypatch.setattr(wrapper, 'pool', ConnectionPool())
+    monkeypatch.setattr(wrapper.time, 'sleep', lambda seconds: None)
+
+
+@pytest.mark.parametrize('env_name', sorted(ENVIRONMENTS))
+def test_builds_every_environment_with_the_options_of_run(env_name, remote_api):
+    from wrapper_quad.numpy_sim import NumpySimMixin
+    config  =   dict(DEFAULT_CONFIG, env_name=env_name)
+    if env_name in LEGACY_ENVIRONMENTS:
+        with pytest.raises(AssertionError, match='legacy wrapper'):
+            check_config(config)
+        return
+    check_config(config)
+    env_class   =   DecodeEnvironment(env_name)
+    env_kwargs  =   environment_kwargs(config, issubclass(env_class, NumpySimMixin))
+    env     =   env_class(port=config['vrep_planner_port'], reward_type=config['reward_type'], fault_rotor=config['crippled_rotor'], frame_skip=config['frame_skip'], **env_kwargs)
+    try:
+        assert env.frame_skip == config['frame_skip']
+        assert env.mask[config['crippled_rotor']] == 0.0
+    finally:
+        env.close()
@@ -0,0 +1,47 @@
+"""
+    Steps/sec of a single VREP instance with blocking, streaming and packed state reads,
+    and with the turbo profile (no rendering, time step 0.05)
+    Run first: ./vrep.sh -h -gREMOTEAPISERVERSERVICE_19999_FALSE_TRUE scene.ttt
+    The packed and teleport modes need wrapper_quad/quadricopter_packed.lua in the scene
+"""
+from wrapper_quad.wrapper_q1 import VREPQuadRotmatAugment
+import numpy as np
+import time
+import sys
+
+port    =   int(sys.argv[1]) if len(sys.argv) > 1 else 19999
+n_steps =   int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+modes   =   dict(
+                blocking=dict(),
+                streaming=dict(streaming=True),
+                packed=dict(packed_io=True),
+                packed_streaming=dict(packed_io=True, streaming=True),
+                teleport=dict(packed_io=True, streaming=True, reset_mode='teleport'),
+                turbo=dict(streaming=True, profile='turbo', time_step_size=0.05)
+            )
+
+results =   dict()
+resets  =   dict()
+rtfs    =   dict()
+for mode, kwargs in modes.items():
+    env =   VREPQuadRotmatAugment(port=port, **kwargs)
+    env.reset()
+    action  =   np.full(4, 50.0, dtype=np.float32)
+
+    reset_times =   []
+    t_start =   time.time()
+    for _ in range(n_steps):
+        obs, reward, done, _ = env.step(action)
+        if done:
+            env.reset()
+            reset_times.append(env.last_reset_time)
+    elapsed =   time.time() - t_start
+
+    results[mode]   =   n_steps / elapsed
+    resets[mode]    =   np.mean(reset_times) if len(reset_times) > 0 else float('nan')
+    rtfs[mode]      =   env.real_time_factor()
+    env.close()
+
+for key, value in results.items():
+    print('{:>16}:\t{:.1f} steps/sec\t({:.2f}x)\treset {:.3f}s\treal-time factor {:.1f}'.format(key, value, value / results['blocking'], resets[key], rtfs[key]))
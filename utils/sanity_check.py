@@ -2,7 +2,6 @@ from mbrl.network import Dynamics
 from mbrl.mpc import RandomShooter
 #from rolls import rollouts
 from mbrl.runner import StackStAct
-from mbrl.wrapped_env import QuadrotorEnv, QuadrotorAcelRotmat
 from utils.gen_trajectories import Trajectory
 
 from utils.analize_dynamics import plot_error_map, plot_multiple_error_map
@@ -1,14 +1,24 @@
+import importlib
 import json
 
-import torch
-
-from mbrl.mpc import RandomShooter, CrossEntropyMethod
-from mbrl.wrapped_env import QuadrotorEnv, QuadrotorAcelEnv, QuadrotorSimpleEnv, QuadrotorAcelRotmat, QuadrotorEnvAugment, QuadrotorQuaternionAugment
+""" Environment name -> module defining it, imported by DecodeEnvironment on demand """
+ENVIRONMENTS    =   {
+    'QuadrotorEnv'              :   'mbrl.wrapped_env',
+    'QuadrotorAcelEnv'          :   'mbrl.wrapped_legacy_env',
+    'QuadrotorSimpleEnv'        :   'mbrl.wrapped_legacy_env',
+    'QuadrotorAcelRotmat'       :   'mbrl.wrapped_env',
+    'QuadrotorEnvAugment'       :   'mbrl.wrapped_env',
+    'QuadrotorQuaternionAugment':   'mbrl.wrapped_env',
+    'QuadrotorNumpyEnv'         :   'mbrl.wrapped_numpy_env',
+    'QuadrotorNumpyEnvAugment'  :   'mbrl.wrapped_numpy_env',
+}
 
 def DecodeMPC(name_mpc:str):
     if name_mpc == 'RandomShooter':
+        from mbrl.mpc import RandomShooter
         return RandomShooter
     elif name_mpc == 'CEM':
+        from mbrl.mpc import CrossEntropyMethod
         return CrossEntropyMethod
     elif name_mpc == 'PDDM':
         return 'PDDM'
@@ -18,6 +28,7 @@ def EncodeMPC(obj):
         return obj.__name__
 
 def DecodeActFunction(name_actfn:str):
+    import torch
     if name_actfn == torch.tanh.__name__:
         return torch.tanh
     elif name_actfn == torch.relu.__name__:
@@ -29,18 +40,12 @@ def EncodeActFunction(obj):
         return obj.__name__
 
 def DecodeEnvironment(name_env:str):
-    if name_env == QuadrotorEnv.__name__:
-        return QuadrotorEnv
-    elif name_env == QuadrotorAcelEnv.__name__:
-        return QuadrotorAcelEnv
-    elif name_env == QuadrotorSimpleEnv.__name__:
-        return QuadrotorSimpleEnv
-    elif name_env == QuadrotorAcelRotmat.__name__:
-        return QuadrotorAcelRotmat
-    elif name_env == QuadrotorEnvAugment.__name__:
-        return QuadrotorEnvAugment
-    elif name_env == QuadrotorQuaternionAugment.__name__:
-        return QuadrotorQuaternionAugment
+    """
+    Environment class of name_env, its module (and the wrappers, torch) is imported only
+    now, so the tools that never build an environment do not pay for it
+    """
+    if name_env in ENVIRONMENTS:
+        return getattr(importlib.import_module(ENVIRONMENTS[name_env]), name_env)
     else:
         assert True, 'insert valid Environment_name'
     
\ No newline at end of file
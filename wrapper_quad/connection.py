@@ -0,0 +1,103 @@
+# Remote API connections of this process, shared by the wrappers
+# One clientID per (ip, port), reference counted and kept open between environments,
+# plus a cache of the object handles of each client
+import wrapper_quad.vrep as vrep
+import atexit
+import os
+
+
+class ConnectionPool(object):
+    """
+    clientIDs per (ip, port) and object handles per (clientID, name).
+    Only the clients opened by the pool are finished (never simxFinish(-1)), so several
+    environments of one process can share or own connections safely
+    """
+    def __init__(self, keep_alive=True, timeout_ms=5000):
+        """
+        keep_alive: Keep a client open when its last environment releases it, the next
+                    environment on the same (ip, port) reuses it. Closed by close_all() at exit
+        """
+        self.keep_alive =   keep_alive
+        self.timeout_ms =   timeout_ms
+        self._reset_state()
+
+    def _reset_state(self):
+        self._pid       =   os.getpid()
+        """ (ip, port) -> [clientID, number of environments using it] """
+        self._clients   =   dict()
+        """ (clientID, object name) -> handle """
+        self._handles   =   dict()
+
+    def _check_process(self):
+        """ The clients of the parent are not usable in a forked worker, start empty """
+        if os.getpid() != self._pid:
+            self._reset_state()
+
+    def acquire(self, ip, port):
+        """
+        Return the clientID of (ip, port), connecting if there is no live client
+        """
+        self._check_process()
+        key     =   (ip, port)
+        entry   =   self._clients.get(key)
+        if entry is not None and vrep.simxGetConnectionId(entry[0]) != -1:
+            entry[1]    +=  1
+            return entry[0]
+        if entry is not None:
+            self._drop(key)
+
+        clientID    =   vrep.simxStart(ip, port, True, True, self.timeout_ms, 0)
+        if clientID == -1:
+            raise ConnectionError("Can't Connect with the envinronment at IP:{}, Port:{}".format(ip, port))
+        self._clients[key]  =   [clientID, 1]
+        return clientID
+
+    def release(self, clientID):
+        """
+        An environment stops using clientID, it is finished when unused (unless keep_alive)
+        """
+        self._check_process()
+        for key, entry in list(self._clients.items()):
+            if entry[0] != clientID: continue
+            entry[1]    =   max(0, entry[1] - 1)
+            if entry[1] == 0 and not self.keep_alive:
+                self._drop(key)
+            return
+
+    def users(self, clientID):
+        """ Number of environments using clientID (0 if the pool did not open it) """
+        self._check_process()
+        for entry in self._clients.values():
+            if entry[0] == clientID: return entry[1]
+        return 0
+
+    def get_handle(self, clientID, name):
+        """ Object handle of name, fetched once per client """
+        self._check_process()
+        key =   (clientID, name)
+        if key not in self._handles:
+            r, handle   =   vrep.simxGetObjectHandle(clientID, name, vrep.simx_opmode_oneshot_wait)
+            assert r == vrep.simx_return_ok, 'Object {} not found in the scene (client {})'.format(name, clientID)
+            self._handles[key]  =   handle
+        return self._handles[key]
+
+    def invalidate(self, clientID):
+        """ Forget the handles of clientID (e.g. after loading another scene) """
+        for key in [key for key in self._handles if key[0] == clientID]:
+            del self._handles[key]
+
+    def _drop(self, key):
+        clientID    =   self._clients.pop(key)[0]
+        self.invalidate(clientID)
+        vrep.simxFinish(clientID)
+
+    def close_all(self):
+        """ Finish every client opened by the pool in this process """
+        if os.getpid() != self._pid: return
+        for key in list(self._clients):
+            self._drop(key)
+
+
+""" Pool shared by all the wrappers of the process """
+pool    =   ConnectionPool()
+atexit.register(pool.close_all)
@@ -0,0 +1,336 @@
+# Pure NumPy quadrotor simulator, no VREP needed
+# Steps a batch of quadrotors at once and emits the same observations as wrapper_q1
+import numpy as np
+import time
+from gym import spaces
+from wrapper_quad.wrapper_q1 import VREPQuadRotmat, VREPQuadRotmatAugment
+from wrapper_quad.rotations import quat_to_rotmat, euler_to_quat, rotmat_to_euler, euler_to_rotmat
+from wrapper_quad.replay import TraceRecorder
+
+
+class NumpyQuadSim(object):
+    """
+    Batch of n_quads non-interacting rigid-body quadrotors (X configuration),
+    integrated with RK4 at time_step_size.
+    State per quadrotor: position (3), linear velocity (3) in world frame,
+    quaternion (x, y, z, w) body->world and angular velocity (3) in body frame.
+    Rotor i produces thrust thrust_coef * speed_i along the body z axis,
+    speeds in [0, 100]. The default parameters approximate the VREP Quadricopter
+    (hover around speed 50)
+    """
+    def __init__(self, n_quads=1, time_step_size=0.05, n_substeps=1, mass=0.52, arm_length=0.13, inertia=(5e-3, 5e-3, 9e-3),
+                    thrust_coef=0.0255, torque_coef=0.016, lin_drag=0.1, ang_drag=2e-3, gravity=9.81):
+        self.n_quads        =   n_quads
+        self.time_step_size =   time_step_size
+        self.n_substeps     =   n_substeps
+        self.mass           =   mass
+        self.inertia        =   np.asarray(inertia, dtype=np.float64)
+        self.thrust_coef    =   thrust_coef
+        self.torque_coef    =   torque_coef
+        self.lin_drag       =   lin_drag
+        self.ang_drag       =   ang_drag
+        self.gravity        =   gravity
+        """ Rotor positions (x, y) in body frame and spin directions """
+        angles              =   np.pi / 4.0 + np.arange(4) * np.pi / 2.0
+        self.rotor_xy       =   arm_length * np.stack([np.cos(angles), np.sin(angles)], axis=1)
+        self.rotor_spin     =   np.array([1.0, -1.0, 1.0, -1.0])
+
+        self.pos            =   np.zeros((n_quads, 3))
+        self.vel            =   np.zeros((n_quads, 3))
+        self.quat           =   np.tile([0.0, 0.0, 0.0, 1.0], (n_quads, 1))
+        self.omega          =   np.zeros((n_quads, 3))
+
+    def set_states(self, index, pos, ang):
+        """
+        Place quadrotor(s) index at pos with Euler angles ang (same convention
+        as utility.GetRotationMatrix) and zero velocities
+        """
+        self.pos[index]     =   pos
+        self.quat[index]    =   euler_to_quat(np.asarray(ang, dtype=np.float64).reshape(-1, 3))
+        self.vel[index]     =   0.0
+        self.omega[index]   =   0.0
+
+    def _derivatives(self, pos, vel, quat, omega, thrusts):
+        R           =   quat_to_rotmat(quat)
+        total       =   thrusts.sum(axis=1)
+        acc         =   R[:, :, 2] * (total / self.mass)[:, None] - self.lin_drag / self.mass * vel
+        acc[:, 2]   -=  self.gravity
+
+        torque      =   np.stack([
+                            thrusts @ self.rotor_xy[:, 1],
+                            -thrusts @ self.rotor_xy[:, 0],
+                            self.torque_coef * (thrusts @ self.rotor_spin)
+                        ], axis=1)
+        I_omega     =   self.inertia * omega
+        omega_dot   =   (torque - np.cross(omega, I_omega) - self.ang_drag * omega) / self.inertia
+
+        x, y, z, w  =   quat[:, 0], quat[:, 1], quat[:, 2], quat[:, 3]
+        p, q, r     =   omega[:, 0], omega[:, 1], omega[:, 2]
+        quat_dot    =   0.5 * np.stack([
+                             w * p + y * r - z * q,
+                             w * q - x * r + z * p,
+                             w * r + x * q - y * p,
+                            -x * p - y * q - z * r
+                        ], axis=1)
+
+        return vel, acc, quat_dot, omega_dot
+
+    @property
+    def hover_speed(self):
+        """ Rotor speed whose total thrust balances the gravity """
+        return self.mass * self.gravity / (4.0 * self.thrust_coef)
+
+    def step(self, speeds, active=None):
+        """
+        speeds: (n_quads, 4) rotor speeds in [0, 100]
+        active: (n_quads,) bool, the other quadrotors keep their state (None: all of them are integrated)
+        """
+        thrusts =   self.thrust_coef * np.clip(np.asarray(speeds, dtype=np.float64), 0.0, 100.0)
+        h       =   self.time_step_size / self.n_substeps
+        frozen  =   None if active is None else ~np.asarray(active, dtype=bool)
+        if frozen is not None:
+            saved   =   [x[frozen] for x in (self.pos, self.vel, self.quat, self.omega)]
+        for _ in range(self.n_substeps):
+            x0  =   (self.pos, self.vel, self.quat, self.omega)
+            k1  =   self._derivatives(*x0, thrusts)
+            k2  =   self._derivatives(*[x + 0.5 * h * k for x, k in zip(x0, k1)], thrusts)
+            k3  =   self._derivatives(*[x + 0.5 * h * k for x, k in zip(x0, k2)], thrusts)
+            k4  =   self._derivatives(*[x + h * k for x, k in zip(x0, k3)], thrusts)
+            self.pos, self.vel, self.quat, self.omega = [x + h / 6.0 * (a + 2.0 * b + 2.0 * c + d) for x, a, b, c, d in zip(x0, k1, k2, k3, k4)]
+            self.quat   =   self.quat / np.linalg.norm(self.quat, axis=1, keepdims=True)
+        if frozen is not None:
+            for x, x_saved in zip((self.pos, self.vel, self.quat, self.omega), saved):
+                x[frozen]   =   x_saved
+
+    def packed_states(self):
+        """
+        (n_quads, 16) states with the layout of the VREP packed state:
+        position(3), orientation(3), lin_vel(3), ang_vel(3) in world frame, quaternion(4) as (x, y, z, w)
+        """
+        R       =   quat_to_rotmat(self.quat)
+        euler   =   rotmat_to_euler(R)
+        ang_vel =   np.einsum('bij,bj->bi', R, self.omega)
+
+        return np.concatenate((self.pos, euler, self.vel, ang_vel, self.quat), axis=1).astype(np.float32)
+
+
+class NumpySimMixin(object):
+    """
+    Replace the VREP connection of a wrapper_q1 observation class by a row of a
+    NumpyQuadSim. Observation, reward and done are computed by the wrapper_q1 class
+    """
+    def _init_sim(self, time_step_size=0.05, sim=None, sim_index=0, targetpos=np.zeros(3, dtype=np.float32), frame_skip=1, record_path=None, port=None):
+        """
+        sim:        Shared NumpyQuadSim (NumpyVecEnv steps it for all the quadrotors),
+                    if None the environment owns a simulator of one quadrotor
+        record_path:Trace of the environment, '{port}' is replaced by the port or, without
+                    one, by sim_index ('{sim_index}' also works) so every quadrotor has its file
+        """
+        self.sim            =   NumpyQuadSim(1, time_step_size) if sim is None else sim
+        self.owns_sim       =   sim is None
+        self.sim_index      =   sim_index
+        self.envname        =   'NumpyQuad'
+        self.targetpos      =   targetpos
+        self.dt             =   self.sim.time_step_size
+        self.prev_linvel    =   np.zeros(3, dtype=np.float32)
+        self.prev_angvel    =   np.zeros(3, dtype=np.float32)
+        self.last_observation   =   None
+        self.last_reset_time    =   0.0
+        self.pushed_state   =   None
+        self.pushed_rotation_matrix =   None
+        self.sim_running    =   True
+        self.frame_skip     =   frame_skip
+        self.recorder       =   None if record_path is None else TraceRecorder(record_path.format(port=sim_index if port is None else port, sim_index=sim_index))
+        self.sim_seconds    =   0.0
+        self.wall_seconds   =   0.0
+        self._init_observation_buffer()
+
+    def _read_state(self, quaternion=False):
+        """ NumpyVecEnv pushes the states of all the quadrotors after each step """
+        if self.pushed_state is not None: return self._unpack_state(self.pushed_state, quaternion)
+        return self._unpack_state(self.sim.packed_states()[self.sim_index], quaternion)
+
+    def step(self, action:np.ndarray):
+        """ A shared simulator is stepped by NumpyVecEnv, which also handles frame_skip """
+        if not self.owns_sim:
+            return self._process_step()
+
+        speeds  =   np.asarray(action)[None]
+        return self._step_frames(lambda: self.sim.step(speeds), action)
+
+    def set_states(self, pos=None, ang=None):
+        if pos is None or ang is None:
+            init_position, init_ang     =   self._get_random_pos_ang(max_radius=3.1, max_angle=np.pi, respecto=self.targetpos)
+            if pos is None: pos=init_position
+            if ang is None: ang=init_ang
+        self.sim.set_states(self.sim_index, pos, ang)
+
+    def reset(self, init_pos=None, init_ang=None):
+        t_start =   time.time()
+        self.set_states(init_pos, init_ang)
+        """ The pushed state is the one before the reset """
+        self.pushed_state, self.pushed_rotation_matrix  =   None, None
+        observation =   self._flat_observation(self._get_observation_state())
+        self.last_reset_time    =   time.time() - t_start
+        if self.recorder is not None:
+            self.recorder.begin_episode(observation)
+
+        return observation
+
+    def close(self):
+        self._save_trace()
+
+
+class NumpyQuadRotmat(NumpySimMixin, VREPQuadRotmat):
+    """
+        18-dim VREPQuadRotmat observation from the NumPy simulator
+        (ip, port and the VREP options are accepted and ignored)
+    """
+    def __init__(self, ip='127.0.0.1', port=None, time_step_size=0.05, sim=None, sim_index=0, frame_skip=1, record_path=None, **kwargs):
+        self._init_sim(time_step_size=time_step_size, sim=sim, sim_index=sim_index, frame_skip=frame_skip, record_path=record_path, port=port)
+
+        self.action_space       =   spaces.Box(low=0.0,high=100.0,shape=(4,), dtype=np.float32)
+        self.observation_space  =   spaces.Box(low=-np.inf, high=np.inf, shape=(18,), dtype=np.float32)
+
+
+class NumpyQuadRotmatAugment(NumpySimMixin, VREPQuadRotmatAugment):
+    """
+        21-dim VREPQuadRotmatAugment observation from the NumPy simulator
+        (ip, port and the VREP options are accepted and ignored)
+    """
+    def __init__(self, ip='127.0.0.1', port=None, time_step_size=0.05, sim=None, sim_index=0, frame_skip=1, record_path=None, **kwargs):
+        self._init_sim(time_step_size=time_step_size, sim=sim, sim_index=sim_index, frame_skip=frame_skip, record_path=record_path, port=port)
+
+        self.action_space       =   spaces.Box(low=0.0,high=100.0,shape=(4,), dtype=np.float32)
+        self.observation_space  =   spaces.Box(low=-np.inf, high=np.inf, shape=(21,), dtype=np.float32)
+
+
+class NumpyVecEnv(object):
+    """
+    n_envs quadrotors of one NumpyQuadSim stepped with one batched RK4 call, with the
+    batched interface of ParallelVrepEnv (n_parallel, reset, step, step_random, reset_remote,
+    get_reset_nrollouts) so Runner can use it in-process.
+    There is no auto_reset: a finished quadrotor (done returned, reset_remote not called yet)
+    is not integrated anymore, its step returns the final observation, a zero reward and done
+    """
+    def __init__(self, max_path_length:int, n_envs:int, envClass, reward_type, cripple_rotor, time_step_size=0.05, env_kwargs=None, frame_skip=1):
+        """
+        envClass:   NumPy environment class (e.g. QuadrotorNumpyEnvAugment), it defines
+                    the observation, reward, done and fault mask of each quadrotor
+        frame_skip: Physics steps per step(), the actions are held and the rewards accumulated
+        """
+        self.n_parallel         =   n_envs
+        self._num_envs          =   n_envs
+        self.max_path_length    =   max_path_length
+        self.num_rollouts       =   [0] * n_envs
+        self.ts                 =   [0] * n_envs
+        self.stats              =   dict(restarts=0, timeouts=0, crashes=0)
+        self.frame_skip         =   frame_skip
+        env_kwargs              =   dict() if env_kwargs is None else env_kwargs
+
+        self.sim    =   NumpyQuadSim(n_envs, time_step_size)
+        self.envs   =   [envClass(port=None, reward_type=reward_type, fault_rotor=cripple_rotor, sim=self.sim, sim_index=idx, frame_skip=frame_skip, **env_kwargs) for idx in range(n_envs)]
+        self.env_   =   self.envs[0]
+        self.masks  =   np.stack([getattr(env, 'mask', np.ones(4, dtype=np.float32)) for env in self.envs], axis=0)
+        """ Quadrotors done and not reset yet, with their final observations """
+        self.finished   =   np.zeros(n_envs, dtype=bool)
+        self.final_obs  =   [None] * n_envs
+
+    def step(self, actions):
+        """
+        actions:    (N, 4) propeller speeds
+        Return the batched next observations, rewards, dones and env_infos
+        """
+        speeds  =   np.asarray(actions, dtype=np.float32) * self.masks
+        obs     =   list(self.final_obs)
+        infos   =   [dict() for _ in range(self.n_parallel)]
+        rws     =   np.zeros(self.n_parallel, dtype=np.float32)
+        dones   =   self.finished.copy()
+        """ Hold the actions for frame_skip steps, a quadrotor that is done is frozen with its last observation """
+        for _ in range(self.frame_skip):
+            if dones.all(): break
+            self.sim.step(speeds, active=~dones)
+            self._push_states()
+            for idx, env in enumerate(self.envs):
+                if dones[idx]: continue
+                obs[idx], rw, dones[idx], infos[idx] = env._process_step()
+                rws[idx]    +=  rw
+        """ Same record as the step of a single environment: masked action, before max_path_length """
+        for idx, env in enumerate(self.envs):
+            if env.recorder is not None and not self.finished[idx]:
+                env.recorder.record(speeds[idx], obs[idx], rws[idx], dones[idx])
+
+        for idx in range(self.n_parallel):
+            if self.finished[idx]: continue
+            self.ts[idx]    +=  1
+            if dones[idx] or self.ts[idx] >= self.max_path_length:
+                dones[idx]      =   True
+                self.ts[idx]    =   0
+                self.finished[idx]  =   True
+                self.final_obs[idx] =   obs[idx]
+
+        return np.stack(obs), rws, dones, infos
+
+    def step_random(self, k):
+        """
+        Step k actions sampled from the action spaces, as the step_random of ParallelVrepEnv
+        Return one trajectory dict per environment (actions, observations, rewards, dones of
+        m <= k steps stopped at the first done, env_info of the last step). There is no
+        reset_observation: the caller resets the finished environments with reset_remote
+        """
+        assert k > 0, 'step_random() needs k > 0'
+        trajectories    =   [dict(actions=[], observations=[], rewards=[], dones=[], env_info=dict()) for _ in range(self.n_parallel)]
+        for _ in range(k):
+            active  =   ~self.finished
+            if not active.any(): break
+            actions =   np.stack([env.action_space.sample() for env in self.envs], axis=0)
+            obs, rws, dones, infos  =   self.step(actions)
+            for idx in np.flatnonzero(active):
+                trajectory  =   trajectories[idx]
+                trajectory['actions'].append(actions[idx])
+                trajectory['observations'].append(obs[idx])
+                trajectory['rewards'].append(rws[idx])
+                trajectory['dones'].append(dones[idx])
+                trajectory['env_info']  =   infos[idx]
+
+        return [dict(trajectory, **{key: np.asarray(trajectory[key]) for key in ['actions', 'observations', 'rewards', 'dones']}) for trajectory in trajectories]
+
+    def _push_states(self):
+        """ Packed states and rotation matrices of all the quadrotors in one batched call """
+        states  =   self.sim.packed_states()
+        rotmats =   euler_to_rotmat(states[:, 3:6].astype(np.float64)).reshape(self.n_parallel, 9)
+        for env, state, rotmat in zip(self.envs, states, rotmats):
+            env.pushed_state            =   state
+            env.pushed_rotation_matrix  =   rotmat
+
+    def reset(self):
+        self.ts         =   [0] * self.n_parallel
+        self.finished[:]    =   False
+        self.final_obs  =   [None] * self.n_parallel
+        return [env.reset() for env in self.envs]
+
+    def reset_remote(self, index):
+        self.ts[index]              =   0
+        self.finished[index]        =   False
+        self.final_obs[index]       =   None
+        self.num_rollouts[index]    +=  1
+        return self.envs[index].reset()
+
+    def get_reset_nrollouts(self):
+        """ Rollouts of each environment since the last call (the counters restart at zero) """
+        nrollouts           =   self.num_rollouts
+        self.num_rollouts   =   [0] * len(nrollouts)
+        return nrollouts
+
+    def close(self):
+        """ Writes the traces of the recording environments """
+        for env in self.envs:
+            env.close()
+
+    @property
+    def getenv(self):
+        return self.env_
+
+    @property
+    def num_envs(self):
+        return self._num_envs
@@ -0,0 +1,60 @@
+# Declared layouts of the flat observations of wrapper_q1
+# A layout maps each field name to its slice of the float32 observation vector, the
+# wrappers write their readings into one preallocated buffer through these slices and
+# the reward functions (mbrl/wrapped_env.py) index the observations with them
+from collections import OrderedDict
+import numpy as np
+
+
+class ObservationLayout(object):
+    """
+    Fixed layout of a flat observation, fields: list of (name, size) in order
+    layout['position']  ->  slice(9, 12)
+    """
+    def __init__(self, fields):
+        self.fields =   OrderedDict()
+        offset      =   0
+        for name, size in fields:
+            assert name not in self.fields, 'Repeated field {}'.format(name)
+            self.fields[name]   =   slice(offset, offset + size)
+            offset              +=  size
+        self.size   =   offset
+
+    def __getitem__(self, name):
+        return self.fields[name]
+
+    def __contains__(self, name):
+        return name in self.fields
+
+    def index(self, name, offset=0):
+        """ Column of the offset-th element of a field (e.g. index('ang_vel', 2) is the yaw speed) """
+        assert offset < self.fields[name].stop - self.fields[name].start, 'Offset out of field {}'.format(name)
+        return self.fields[name].start + offset
+
+    def new_buffer(self):
+        return np.zeros(self.size, dtype=np.float32)
+
+    def views(self, buffer):
+        """ OrderedDict of the fields as views of buffer, writing a view writes the buffer """
+        assert buffer.shape[-1] == self.size, 'Buffer of size {} for a layout of size {}'.format(buffer.shape[-1], self.size)
+        return OrderedDict((name, buffer[..., sl]) for name, sl in self.fields.items())
+
+    def flatten(self, rowdata, out=None):
+        """
+        Flat observation from a dict of readings (only the fields of the layout are used,
+        a field shorter than its reading takes its first elements, e.g. roll and pitch)
+        """
+        out =   self.new_buffer() if out is None else out
+        for name, sl in self.fields.items():
+            out[sl] =   rowdata[name][:sl.stop - sl.start]
+        return out
+
+
+""" (rotmat, pos, lin_vel, ang_vel): VREPQuadRotmat, 18 """
+ROTMAT              =   ObservationLayout([('rotation_matrix', 9), ('position', 3), ('lin_vel', 3), ('ang_vel', 3)])
+""" (rotmat, pos, lin_vel, ang_vel, orientation): VREPQuadRotmatAugment, 21 """
+ROTMAT_AUGMENT      =   ObservationLayout([('rotation_matrix', 9), ('position', 3), ('lin_vel', 3), ('ang_vel', 3), ('orientation', 3)])
+""" (pos, lin_vel, ang_vel, rotmat, lin_acel, ang_acel): VREPQuadAccelRot, 24 """
+ACCEL_ROT           =   ObservationLayout([('position', 3), ('lin_vel', 3), ('ang_vel', 3), ('rotation_matrix', 9), ('lin_acel', 3), ('ang_acel', 3)])
+""" (pos, lin_vel, ang_vel, quaternion, roll-pitch): VREPQuadQuaternionAugment, 15 """
+QUATERNION_AUGMENT  =   ObservationLayout([('position', 3), ('lin_vel', 3), ('ang_vel', 3), ('quaternion', 4), ('orientation', 2)])
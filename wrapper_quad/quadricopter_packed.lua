@@ -0,0 +1,68 @@
+-- Packed remote I/O for WrapperQuad(packed_io=True), in-place reset (reset_mode='teleport')
+-- and multi-quadrotor scenes (VREPMultiQuad)
+-- Add these functions to the child script of 'Quadricopter' in quadrotor_remote_control_rl.ttt,
+-- the copies Quadricopter#0..N-1 of a multi-quadrotor scene share the same child script
+--
+-- Per step the client then sends one packed string signal ('speedprops') and either
+-- calls getPackedState once, or (streaming=True) reads the 'packedstate' signal
+-- published in sysCall_sensing from its local buffer.
+
+-- State layout: position(3), orientation(3), lin_vel(3), ang_vel(3), quaternion(4)
+function packState(name)
+    local h = sim.getObjectHandle(name or 'Quadricopter')
+    local p = sim.getObjectPosition(h, -1)
+    local e = sim.getObjectOrientation(h, -1)
+    local lv, av = sim.getObjectVelocity(h)
+    local q = sim.getObjectQuaternion(h, -1)
+    return {p[1], p[2], p[3], e[1], e[2], e[3], lv[1], lv[2], lv[3], av[1], av[2], av[3], q[1], q[2], q[3], q[4]}
+end
+
+-- Called by the client with simxCallScriptFunction, inStrings[1] is the name of the quadrotor
+function getPackedState(inInts, inFloats, inStrings, inBuffer)
+    return {}, packState(inStrings[1]), {}, ''
+end
+
+-- States of all the quadrotors named in inStrings, concatenated (16 floats each)
+function getPackedStates(inInts, inFloats, inStrings, inBuffer)
+    local states = {}
+    for i=1,#inStrings do
+        local state = packState(inStrings[i])
+        for j=1,#state do states[#states+1] = state[j] end
+    end
+    return {}, states, {}, ''
+end
+
+-- Called by the client on reset_mode='teleport', after the quadrotor has been moved:
+-- zero the velocities of the whole model without stopping the simulation
+function resetDynamics(inInts, inFloats, inStrings, inBuffer)
+    local h = sim.getObjectHandle(inStrings[1] or 'Quadricopter')
+    sim.resetDynamicObject(h + sim.handleflag_model)
+    return {}, {}, {}, ''
+end
+
+-- Propeller speeds sent with simxPackFloats, nil if the client uses the speedprop1..4 float signals.
+-- In a multi-quadrotor scene the (N, 4) speeds come in 'speedprops_multi', each copy
+-- takes the row given by its name suffix (Quadricopter#i)
+function readPackedSpeeds()
+    local multi = sim.getStringSignal('speedprops_multi')
+    if multi then
+        local speeds = sim.unpackFloatTable(multi)
+        local row = sim.getNameSuffix(nil)
+        if row < 0 then row = 0 end
+        return {speeds[4*row+1], speeds[4*row+2], speeds[4*row+3], speeds[4*row+4]}
+    end
+    local packed = sim.getStringSignal('speedprops')
+    if packed then
+        return sim.unpackFloatTable(packed)
+    end
+    return nil
+end
+
+-- In sysCall_actuation, replace the four sim.getFloatSignal('speedprop'..i) reads by:
+--     local speeds = readPackedSpeeds()
+--     if speeds then for i=1,4 do sim.setFloatSignal('speedprop'..i, speeds[i]) end end
+-- before the propeller velocities are applied (in a multi-quadrotor scene use local
+-- variables instead of the global speedprop signals, they are shared by all the copies).
+
+-- In sysCall_sensing, publish the state for the streamed read:
+--     sim.setStringSignal('packedstate', sim.packFloatTable(packState()))
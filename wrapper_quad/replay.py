@@ -0,0 +1,240 @@
+# Record-and-replay of the (action, observation, reward, done) exchanged with an environment
+# TraceRecorder writes a WrapperQuad (or NumPy) environment to a binary .npz trace,
+# ReplayEnv serves it back without any simulator, at memory speed and deterministically
+from gym import spaces
+import numpy as np
+import json
+import os
+
+
+class ReplayError(Exception):
+    """
+    The replayed environment was driven away from its trace
+    """
+    pass
+
+
+class TraceRecorder(object):
+    """
+    Trace of the episodes of one environment, saved as .npz with the arrays:
+        reset_observations  (E, obs_dim) float32, initial observation of each episode
+        episode_starts      (E,) int64, index of the first step of each episode
+        actions             (N, act_dim) float32, as applied (after the fault mask)
+        observations        (N, obs_dim) float32
+        rewards             (N,) float32
+        dones               (N,) bool
+        meta                json: env class, mask, dt, frame_skip
+    At most chunk_steps steps are kept in memory: then they are written to the part file
+    path.partK.npz and dropped. save() joins the parts and the steps in memory into path and
+    removes the parts, load() joins the parts left by a process that crashed before save()
+    (without meta)
+    """
+    def __init__(self, path:str, meta:dict=None, chunk_steps:int=4096):
+        assert chunk_steps > 0, 'chunk_steps must be positive'
+        self.path           =   path
+        self.meta           =   dict() if meta is None else meta
+        self.chunk_steps    =   chunk_steps
+        """ Steps and part files already written """
+        self.n_flushed      =   0
+        self.n_parts        =   0
+        self._clear()
+
+    def _clear(self):
+        self.reset_observations =   []
+        self.episode_starts     =   []
+        self.actions            =   []
+        self.observations       =   []
+        self.rewards            =   []
+        self.dones              =   []
+
+    @property
+    def n_steps(self):
+        return self.n_flushed + len(self.actions)
+
+    def begin_episode(self, observation):
+        self.reset_observations.append(np.asarray(observation, dtype=np.float32).copy())
+        self.episode_starts.append(self.n_steps)
+
+    def record(self, action, observation, reward, done):
+        assert self.n_parts > 0 or len(self.episode_starts) > 0, 'Reset the environment before stepping it'
+        self.actions.append(np.asarray(action, dtype=np.float32).copy())
+        self.observations.append(np.asarray(observation, dtype=np.float32).copy())
+        self.rewards.append(reward)
+        self.dones.append(done)
+        if len(self.actions) >= self.chunk_steps:
+            self.flush()
+
+    def flush(self):
+        """ Write the steps in memory to the next part file and drop them """
+        if len(self.actions) == 0 and len(self.episode_starts) == 0: return
+        self._write(self._part_path(self.n_parts), self._arrays())
+        self.n_parts    +=  1
+        self.n_flushed  +=  len(self.actions)
+        self._clear()
+
+    def save(self):
+        """ Write the trace (to a temporary file first, the trace on disk is always complete) """
+        if self.n_parts == 0 and len(self.episode_starts) == 0: return
+        parts   =   [self._part_path(idx) for idx in range(self.n_parts)]
+        arrays  =   TraceRecorder._join([TraceRecorder._read(path) for path in parts] + [self._arrays()])
+        arrays['meta']  =   np.array(json.dumps(self.meta))
+        self._write(self.path, arrays)
+        for path in parts:
+            os.remove(path)
+        self.n_flushed  +=  len(self.actions)
+        self.n_parts    =   0
+        self._clear()
+
+    def _part_path(self, idx):
+        return '{}.part{}.npz'.format(self.path, idx)
+
+    def _arrays(self):
+        return dict(reset_observations=np.asarray(self.reset_observations, dtype=np.float32).reshape(len(self.reset_observations), -1) if len(self.reset_observations) > 0 else np.zeros((0, 0), dtype=np.float32),
+                    episode_starts=np.asarray(self.episode_starts, dtype=np.int64),
+                    actions=np.asarray(self.actions, dtype=np.float32).reshape(len(self.actions), -1) if len(self.actions) > 0 else np.zeros((0, 0), dtype=np.float32),
+                    observations=np.asarray(self.observations, dtype=np.float32).reshape(len(self.observations), -1) if len(self.observations) > 0 else np.zeros((0, 0), dtype=np.float32),
+                    rewards=np.asarray(self.rewards, dtype=np.float32),
+                    dones=np.asarray(self.dones, dtype=np.bool_))
+
+    def _write(self, path, arrays):
+        directory   =   os.path.dirname(path)
+        if directory != '': os.makedirs(directory, exist_ok=True)
+        tmp_path    =   path + '.tmp.npz'
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read(path):
+        with np.load(path) as data:
+            return {key: data[key] for key in data.files}
+
+    @staticmethod
+    def _join(chunks):
+        """ Arrays of consecutive chunks as one trace, the empty ones are skipped """
+        return {key: np.concatenate([chunk[key] for chunk in chunks if chunk[key].shape[0] > 0] or [chunks[0][key]], axis=0)
+                    for key in ('reset_observations', 'episode_starts', 'actions', 'observations', 'rewards', 'dones')}
+
+    @staticmethod
+    def load(path:str):
+        """ dict of the arrays of a trace, meta decoded """
+        if os.path.exists(path):
+            trace   =   TraceRecorder._read(path)
+            trace['meta']   =   json.loads(str(trace['meta']))
+            return trace
+        parts   =   []
+        while os.path.exists('{}.part{}.npz'.format(path, len(parts))):
+            parts.append('{}.part{}.npz'.format(path, len(parts)))
+        if len(parts) == 0:
+            raise FileNotFoundError('No trace {} (nor parts of it)'.format(path))
+        trace   =   TraceRecorder._join([TraceRecorder._read(part) for part in parts])
+        trace['meta']   =   dict()
+        return trace
+
+
+class ReplayEnv(object):
+    """
+    Environment that serves a trace instead of simulating. Same constructor as the
+    environment classes, so it can be used as envClass of ParallelVrepEnv (and then by
+    Runner) on any machine. Each reset() starts the next recorded episode (cycling), each step(action)
+    returns the recorded next observation, reward and done, after checking that action
+    (masked like the recorded environment) is within atol of the recorded one
+    """
+    trace_path  =   None
+    trace_atol  =   1e-3
+    obs_dim     =   None
+    act_dim     =   None
+
+    def __init__(self, port=None, reward_type=None, fault_rotor=None, trace_path=None, atol=None, **kwargs):
+        """
+        trace_path: .npz trace, '{port}' is replaced by port (one trace per recorded port)
+        atol:       Tolerance of the action check, np.inf serves the trace for any action
+        """
+        trace_path      =   self.trace_path if trace_path is None else trace_path
+        atol            =   self.trace_atol if atol is None else atol
+        assert trace_path is not None, 'ReplayEnv needs a trace_path (or ReplayEnv.for_trace)'
+        self.port       =   port
+        self.path       =   trace_path.format(port=port)
+        self.atol       =   atol
+        trace           =   TraceRecorder.load(self.path)
+        self.meta       =   trace['meta']
+        self.reset_observations =   trace['reset_observations']
+        self.episode_starts     =   trace['episode_starts']
+        self.episode_ends       =   np.append(self.episode_starts[1:], trace['actions'].shape[0])
+        self.actions            =   trace['actions']
+        self.observations       =   trace['observations']
+        self.rewards            =   trace['rewards']
+        self.dones              =   trace['dones']
+        self.mask               =   np.asarray(self.meta.get('mask', np.ones(self.actions.shape[1])), dtype=np.float32)
+        self.dt                 =   self.meta.get('dt', 0.0)
+        self.frame_skip         =   self.meta.get('frame_skip', 1)
+        self.episode            =   -1
+        self.index              =   0
+        self.last_reset_time    =   0.0
+
+        self.action_space       =   spaces.Box(low=0.0, high=100.0, shape=(self.actions.shape[1],), dtype=np.float32)
+        self.observation_space  =   spaces.Box(low=-np.inf, high=np.inf, shape=(self.observations.shape[1],), dtype=np.float32)
+
+    @classmethod
+    def for_trace(cls, trace_path:str, atol=1e-3):
+        """
+        Subclass bound to trace_path (its spaces are then known without an instance,
+        as ParallelVrepEnv(shared_memory=True) needs)
+        """
+        trace   =   TraceRecorder.load(_first_trace(trace_path) if '{port}' in trace_path else trace_path)
+        return type(cls.__name__, (cls,), dict(trace_path=trace_path, trace_atol=atol, obs_dim=trace['observations'].shape[1], act_dim=trace['actions'].shape[1]))
+
+    @classmethod
+    def _get_state_space(cls):
+        assert cls.obs_dim is not None, 'Use ReplayEnv.for_trace to know the spaces before loading a trace'
+        return spaces.Box(low=-np.inf, high=np.inf, shape=(cls.obs_dim,), dtype=np.float32)
+
+    @classmethod
+    def _get_action_space(cls):
+        assert cls.act_dim is not None, 'Use ReplayEnv.for_trace to know the spaces before loading a trace'
+        return spaces.Box(low=0.0, high=100.0, shape=(cls.act_dim,), dtype=np.float32)
+
+    @property
+    def n_episodes(self):
+        return self.episode_starts.shape[0]
+
+    def episode_actions(self, episode):
+        """ Recorded actions of an episode, to drive the replay (e.g. by a benchmark) """
+        return self.actions[self.episode_starts[episode]:self.episode_ends[episode]]
+
+    def reset(self, init_pos=None, init_ang=None):
+        self.episode    =   (self.episode + 1) % self.n_episodes
+        self.index      =   self.episode_starts[self.episode]
+        return self.reset_observations[self.episode].copy()
+
+    def step(self, action:np.ndarray):
+        if self.episode < 0:
+            raise ReplayError('{}: step() before reset()'.format(self.path))
+        if self.index >= self.episode_ends[self.episode]:
+            raise ReplayError('{}: episode {} has only {} recorded steps'.format(self.path, self.episode, self.episode_ends[self.episode] - self.episode_starts[self.episode]))
+        expected    =   self.actions[self.index]
+        action      =   self.mask * np.asarray(action, dtype=np.float32)
+        if not np.all(np.abs(action - expected) <= self.atol):
+            raise ReplayError('{}: episode {} step {}: action {} differs from the recorded {} (atol {})'.format(
+                                self.path, self.episode, self.index - self.episode_starts[self.episode], action, expected, self.atol))
+        index       =   self.index
+        self.index  +=  1
+        return self.observations[index].copy(), float(self.rewards[index]), bool(self.dones[index]), dict()
+
+    def real_time_factor(self):
+        return 0.0
+
+    def set_targetpos(self, tpos:np.ndarray):
+        pass
+
+    def close(self):
+        pass
+
+
+def _first_trace(trace_path):
+    """ Any existing trace of a '{port}' pattern, the ports share the spaces """
+    directory, pattern  =   os.path.split(trace_path)
+    prefix, suffix      =   pattern.split('{port}')
+    for name in sorted(os.listdir(directory if directory != '' else '.')):
+        if name.startswith(prefix) and name.endswith(suffix):
+            return os.path.join(directory, name)
+    raise FileNotFoundError('No trace matches {}'.format(trace_path))
@@ -0,0 +1,123 @@
+# Batched rotation conversions for (N, 3) Euler angles, (N, 4) quaternions and (N, 3, 3) matrices
+# Every function works on numpy arrays and on torch tensors (same backend as the input)
+#
+# Conventions (same as VREP and utility.GetRotationMatrix):
+#   Euler angles (alpha, beta, gamma):  R = Rz(gamma) * Ry(beta) * Rx(alpha)
+#   Quaternions:                        (x, y, z, w), scalar last as VREP and scipy
+import numpy as np
+
+
+class _NumpyOps(object):
+    sin, cos, sqrt, arctan2, arcsin  =   np.sin, np.cos, np.sqrt, np.arctan2, np.arcsin
+    @staticmethod
+    def stack(x, axis):     return np.stack(x, axis=axis)
+    @staticmethod
+    def clip(x, lo, hi):    return np.clip(x, lo, hi)
+    @staticmethod
+    def norm(x):            return np.sqrt((x * x).sum(axis=-1, keepdims=True))
+    @staticmethod
+    def arange(n):          return np.arange(n)
+
+
+class _TorchOps(object):
+    def __init__(self, torch):
+        self.sin, self.cos, self.sqrt, self.arctan2, self.arcsin = torch.sin, torch.cos, torch.sqrt, torch.atan2, torch.asin
+        self._torch =   torch
+    def stack(self, x, axis):   return self._torch.stack(x, dim=axis)
+    def clip(self, x, lo, hi):  return self._torch.clamp(x, lo, hi)
+    def norm(self, x):          return self._torch.sqrt((x * x).sum(dim=-1, keepdim=True))
+    def arange(self, n):        return self._torch.arange(n)
+
+
+def _ops(x):
+    if isinstance(x, np.ndarray): return _NumpyOps
+    import torch
+    return _TorchOps(torch)
+
+
+def euler_to_rotmat(euler):
+    """ (N, 3) Euler angles -> (N, 3, 3) rotation matrices, closed form """
+    ops     =   _ops(euler)
+    sa, ca  =   ops.sin(euler[:, 0]), ops.cos(euler[:, 0])
+    sb, cb  =   ops.sin(euler[:, 1]), ops.cos(euler[:, 1])
+    sg, cg  =   ops.sin(euler[:, 2]), ops.cos(euler[:, 2])
+    R       =   ops.stack([
+                    cg * cb, cg * sb * sa - sg * ca, cg * sb * ca + sg * sa,
+                    sg * cb, sg * sb * sa + cg * ca, sg * sb * ca - cg * sa,
+                    -sb,     cb * sa,                cb * ca
+                ], axis=1)
+    return R.reshape(-1, 3, 3)
+
+
+def rotmat_to_euler(R):
+    """ (N, 3, 3) rotation matrices -> (N, 3) Euler angles """
+    ops     =   _ops(R)
+    alpha   =   ops.arctan2(R[:, 2, 1], R[:, 2, 2])
+    beta    =   ops.arcsin(ops.clip(-R[:, 2, 0], -1.0, 1.0))
+    gamma   =   ops.arctan2(R[:, 1, 0], R[:, 0, 0])
+    return ops.stack([alpha, beta, gamma], axis=1)
+
+
+def euler_to_quat(euler):
+    """ (N, 3) Euler angles -> (N, 4) quaternions (x, y, z, w) """
+    ops     =   _ops(euler)
+    sa, ca  =   ops.sin(euler[:, 0] / 2.0), ops.cos(euler[:, 0] / 2.0)
+    sb, cb  =   ops.sin(euler[:, 1] / 2.0), ops.cos(euler[:, 1] / 2.0)
+    sg, cg  =   ops.sin(euler[:, 2] / 2.0), ops.cos(euler[:, 2] / 2.0)
+    return ops.stack([
+                cg * cb * sa - sg * sb * ca,
+                cg * sb * ca + sg * cb * sa,
+                sg * cb * ca - cg * sb * sa,
+                cg * cb * ca + sg * sb * sa
+            ], axis=1)
+
+
+def quat_to_rotmat(quat):
+    """ (N, 4) unit quaternions (x, y, z, w) -> (N, 3, 3) rotation matrices """
+    ops         =   _ops(quat)
+    x, y, z, w  =   quat[:, 0], quat[:, 1], quat[:, 2], quat[:, 3]
+    R           =   ops.stack([
+                        1.0 - 2.0 * (y * y + z * z), 2.0 * (x * y - w * z), 2.0 * (x * z + w * y),
+                        2.0 * (x * y + w * z), 1.0 - 2.0 * (x * x + z * z), 2.0 * (y * z - w * x),
+                        2.0 * (x * z - w * y), 2.0 * (y * z + w * x), 1.0 - 2.0 * (x * x + y * y)
+                    ], axis=1)
+    return R.reshape(-1, 3, 3)
+
+
+def rotmat_to_quat(R):
+    """
+    (N, 3, 3) rotation matrices -> (N, 4) quaternions (x, y, z, w) with w >= 0.
+    The quaternion is built from the largest of w, x, y, z (Shepperd's method),
+    which keeps it accurate for rotations close to 180 degrees
+    """
+    ops     =   _ops(R)
+    r00, r01, r02   =   R[:, 0, 0], R[:, 0, 1], R[:, 0, 2]
+    r10, r11, r12   =   R[:, 1, 0], R[:, 1, 1], R[:, 1, 2]
+    r20, r21, r22   =   R[:, 2, 0], R[:, 2, 1], R[:, 2, 2]
+    traces  =   ops.stack([1.0 + r00 + r11 + r22, 1.0 + r00 - r11 - r22, 1.0 - r00 + r11 - r22, 1.0 - r00 - r11 + r22], axis=1)
+    """ (N, 4 candidates, 4 components), candidate i is 4 * q_i * q """
+    candidates  =   ops.stack([
+                        ops.stack([r21 - r12, r02 - r20, r10 - r01, traces[:, 0]], axis=1),
+                        ops.stack([traces[:, 1], r01 + r10, r02 + r20, r21 - r12], axis=1),
+                        ops.stack([r01 + r10, traces[:, 2], r12 + r21, r02 - r20], axis=1),
+                        ops.stack([r02 + r20, r12 + r21, traces[:, 3], r10 - r01], axis=1)
+                    ], axis=1)
+    best    =   traces.argmax(1)
+    quat    =   candidates[ops.arange(R.shape[0]), best]
+    quat    =   quat / ops.norm(quat)
+    return quat * _sign(quat[:, 3:4])
+
+
+def _sign(x):
+    """ sign with sign(0) = 1 """
+    return (x >= 0) * 2.0 - 1.0
+
+
+def quat_to_euler(quat):
+    """ (N, 4) quaternions (x, y, z, w) -> (N, 3) Euler angles """
+    return rotmat_to_euler(quat_to_rotmat(quat))
+
+
+def flat_rotmat_to_euler(flat_R):
+    """ (N, 9) row-major rotation matrices (as in the observations) -> (N, 3) Euler angles """
+    return rotmat_to_euler(flat_R.reshape(-1, 3, 3))
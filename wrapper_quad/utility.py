@@ -1,22 +1,16 @@
 import numpy as np
 import math
 # Return the rotation through Euler angles 
-# R = Rx(alpha)*Ry(beta)*Rz(gamma)
+# R = Rz(gamma)*Ry(beta)*Rx(alpha), closed form (batched version in wrapper_quad/rotations.py)
 def GetRotationMatrix(eulerAngles):
     alpha, beta, gamma = eulerAngles
-    rx  =   np.array([[1,   0,  0],
-                      [0, math.cos(alpha), -math.sin(alpha)],
-                      [0, math.sin(alpha),  math.cos(alpha)]
+    sa, ca  =   math.sin(alpha), math.cos(alpha)
+    sb, cb  =   math.sin(beta),  math.cos(beta)
+    sg, cg  =   math.sin(gamma), math.cos(gamma)
+    R   =   np.array([[cg * cb, cg * sb * sa - sg * ca, cg * sb * ca + sg * sa],
+                      [sg * cb, sg * sb * sa + cg * ca, sg * sb * ca - cg * sa],
+                      [-sb,     cb * sa,                cb * ca               ]
                     ])
-    ry  =   np.array([[math.cos(beta), 0, math.sin(beta)],
-                      [0             , 1, 0             ],
-                      [-math.sin(beta),0, math.cos(beta)]
-                    ])
-    rz  =   np.array([[math.cos(gamma), -math.sin(gamma), 0],
-                      [math.sin(gamma),  math.cos(gamma), 0],
-                      [0              , 0,                1]
-                    ])
-    R   =   np.dot(rz, np.dot(ry, rx))
 
     return R   
 
@@ -24,4 +18,16 @@ def GetFlatRotationMatrix(eulerAngles):
     rotmat  =   GetRotationMatrix(eulerAngles)
     
     return np.reshape(rotmat, (9, ))
-    #return np.append(rotmat[0,:], rotmat[1:3,:])
\ No newline at end of file
+    #return np.append(rotmat[0,:], rotmat[1:3,:])
+
+def SetFlatRotationMatrix(eulerAngles, out):
+    """ GetFlatRotationMatrix written into out (9,) without allocating """
+    alpha, beta, gamma = eulerAngles
+    sa, ca  =   math.sin(alpha), math.cos(alpha)
+    sb, cb  =   math.sin(beta),  math.cos(beta)
+    sg, cg  =   math.sin(gamma), math.cos(gamma)
+    out[0], out[1], out[2]  =   cg * cb, cg * sb * sa - sg * ca, cg * sb * ca + sg * sa
+    out[3], out[4], out[5]  =   sg * cb, sg * sb * sa + cg * ca, sg * sb * ca - cg * sa
+    out[6], out[7], out[8]  =   -sb,     cb * sa,                cb * ca
+
+    return out
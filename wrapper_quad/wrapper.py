@@ -5,11 +5,13 @@ import gym
 from gym import spaces
 import numpy as np
 
-from .utility import GetFlatRotationMatrix
+from .utility import GetFlatRotationMatrix, SetFlatRotationMatrix
 # From environment
 import sys
 #sys.path.append('.')
 import wrapper_quad.vrep as vrep
+from wrapper_quad.connection import pool
+from wrapper_quad.replay import TraceRecorder
 from typing import NoReturn
 import time
 from random import gauss
@@ -23,36 +25,81 @@ from collections import OrderedDict
 # Environment to pass the target position just on the initial state
 class WrapperQuad(gym.Env):
 
-    def __init__(self, ip='127.0.0.1', port=19997, envname='Quadricopter', targetpos=np.zeros(3, dtype=np.float32)):
+    def __init__(self, ip='127.0.0.1', port=19997, envname='Quadricopter', targetpos=np.zeros(3, dtype=np.float32), streaming=False, packed_io=False, reset_mode='restart',
+                    target_name='Quadricopter_target', clientID=None, profile='default', time_step_size=0.01, physics_engine=None,
+                    frame_skip=1, record_path=None):
         super(WrapperQuad, self).__init__()
         # Initialize vrep
+        self.port               =   port
         self.envname            =   envname
-        self.target_name        =   'Quadricopter_target'
+        self.target_name        =   target_name
+        """ If streaming, the state is pushed by the server after each trigger and read with simx_opmode_buffer """
+        self.streaming          =   streaming
+        """ Also stream the quaternion (only for observations that use it) """
+        self.stream_quaternion  =   False
+        """ If packed_io, the state is read with one script call (or one streamed string signal) and the
+            propeller speeds are sent in one packed string signal, the child script of the quadrotor
+            must define the functions of wrapper_quad/quadricopter_packed.lua """
+        self.packed_io          =   packed_io
+        """ reset_mode: 'restart' stops and restarts the simulation on each reset, 'teleport' keeps it
+            running and only moves the quadrotor and target, then zeroes its dynamic state
+            (resetDynamics in wrapper_quad/quadricopter_packed.lua) """
+        assert reset_mode in ['restart', 'teleport'], 'reset_mode must be restart or teleport'
+        self.reset_mode         =   reset_mode
+        self.sim_running        =   False
+        """ Seconds spent in the last reset """
+        self.last_reset_time    =   0.0
+        """ Packed state set from outside (VREPMultiQuad), used instead of reading the simulator """
+        self.pushed_state       =   None
+        """ Flat rotation matrix of pushed_state, computed for all the quadrotors at once (rotations.euler_to_rotmat) """
+        self.pushed_rotation_matrix =   None
+        """ If a clientID is given the connection is shared with other quadrotors of the scene and not closed here,
+            otherwise it comes from the process connection pool (wrapper_quad/connection.py) """
+        self.owns_client        =   clientID is None
+        """ profile: 'default' only hides the GUI panels, 'turbo' (data collection) also disables rendering,
+            GUI updates and real-time mode. time_step_size and physics_engine (0=Bullet, 1=ODE, 2=Vortex,
+            None keeps the engine of the scene) are set on every (re)start, so all the ports run the same physics """
+        assert profile in ['default', 'turbo'], 'profile must be default or turbo'
+        self.profile            =   profile
+        self.time_step_size     =   time_step_size
+        self.physics_engine     =   physics_engine
+        """ Physics steps per step(): the action is held for frame_skip steps, step() returns the last
+            observation and the reward accumulated over them. The control period is control_dt """
+        assert frame_skip >= 1, 'frame_skip must be >= 1'
+        self.frame_skip         =   frame_skip
+        """ If record_path, the resets and steps are written to a trace ('{port}' is replaced by the port),
+            in parts of TraceRecorder.chunk_steps steps joined on close(). It can be served by
+            wrapper_quad/replay.py ReplayEnv """
+        self.recorder           =   None if record_path is None else TraceRecorder(record_path.format(port=port))
+        """ Simulated and wall-clock seconds spent in step, see real_time_factor() """
+        self.sim_seconds        =   0.0
+        self.wall_seconds       =   0.0
         #vrep.simxFinish(-1)
-        clientID                =   vrep.simxStart(ip, port, True, True, 5000, 0)
-        if clientID != -1:
-            print('Connection Established Successfully to IP> {} - Port> {} - ID: {}'.format(ip, port, clientID))
-            self.clientID       =   clientID
-            self.targetpos      =   targetpos
-            _, self.dt              =   vrep.simxGetFloatingParameter(self.clientID, vrep.sim_floatparam_simulation_time_step, vrep.simx_opmode_oneshot_wait)
-            #self.prev_pos
-            print('Initialized with tstep>\t{} seconds'.format(self.dt))
-        else:
-            raise ConnectionError("Can't Connect with the envinronment at IP:{}, Port:{}".format(ip, port))
+        if clientID is None:
+            clientID            =   pool.acquire(ip, port)
+        print('Connection Established Successfully to IP> {} - Port> {} - ID: {}'.format(ip, port, clientID))
+        self.clientID       =   clientID
+        self.targetpos      =   targetpos
+        _, self.dt              =   vrep.simxGetFloatingParameter(self.clientID, vrep.sim_floatparam_simulation_time_step, vrep.simx_opmode_oneshot_wait)
+        #self.prev_pos
+        print('Initialized with tstep>\t{} seconds'.format(self.dt))
         
         #pass
 
-        if not self._get_boolparam(vrep.sim_boolparam_headless):
+        if self.profile == 'turbo':
+            self._apply_turbo_profile()
+        elif not self._get_boolparam(vrep.sim_boolparam_headless):
             self._clear_gui()
 
         ## Detach object target_get_random_pos_ang
-        r, self.target_handler      =   vrep.simxGetObjectHandle(clientID, 'Quadricopter_target', vrep.simx_opmode_oneshot_wait)
+        """ Handles are cached by the pool, they stay valid across simulation restarts """
+        self.target_handler         =   pool.get_handle(clientID, self.target_name)
         vrep.simxSetObjectParent(clientID, self.target_handler, -1, True, vrep.simx_opmode_oneshot_wait)
         # Set signal debug:
         vrep.simxSetIntegerSignal(self.clientID, 'signal_debug', 1337, vrep.simx_opmode_oneshot)
-        r, self.quad_handler         =   vrep.simxGetObjectHandle(clientID, self.envname, vrep.simx_opmode_oneshot_wait)
+        self.quad_handler           =   pool.get_handle(clientID, self.envname)
 
-        print(r, self.quad_handler)
+        print(self.envname, self.quad_handler)
         # Define gym variables
         """ These properties must be overloaded """
         self.action_space       =   spaces.Box(low=0.0, high=100.0, shape=(4,), dtype=np.float32)
@@ -65,15 +112,65 @@ class WrapperQuad(gym.Env):
         #self.propsignal =   ['joint' + str(i+1) for i in range(0, 4)]
         self.propsignal =   ['speedprop' + str(i+1) for i in range(0, 4)]
 
+    def _send_speeds(self, action):
+        if self.packed_io:
+            vrep.simxSetStringSignal(self.clientID, 'speedprops', vrep.simxPackFloats(action), vrep.simx_opmode_oneshot)
+        else:
+            for act, name in zip(action, self.propsignal):
+                vrep.simxSetFloatSignal(self.clientID, name, act, vrep.simx_opmode_streaming)
+
     def step(self, action:np.ndarray):
-        for act, name in zip(action, self.propsignal):
-            vrep.simxSetFloatSignal(self.clientID, name, act, vrep.simx_opmode_streaming)
+        t_start =   time.time()
+        self._send_speeds(action)
         
         #vrep.simxSetFloatSignal(self.clientID, self.propsignal1)
         # sincronyze
+        result  =   self._step_frames(self._trigger, action)
+        self.wall_seconds   +=  time.time() - t_start
+
+        return result
+
+    def _trigger(self):
         vrep.simxSynchronousTrigger(self.clientID)
         vrep.simxGetPingTime(self.clientID)
-        
+
+    def _step_frames(self, advance, action):
+        """
+            Hold the action for frame_skip physics steps, advance() runs one of them.
+            Return the last observation, the accumulated reward, done and info,
+            stopping early if an intermediate state is done
+        """
+        reward  =   0.0
+        for _ in range(self.frame_skip):
+            advance()
+            observation, rw, done, info =   self._process_step()
+            reward              +=  rw
+            self.sim_seconds    +=  self.dt
+            if done: break
+        if self.recorder is not None:
+            self.recorder.record(action, observation, reward, done)
+
+        return observation, reward, done, info
+
+    @property
+    def control_dt(self):
+        """ Seconds between two observations returned by step() """
+        return self.dt * self.frame_skip
+
+    def real_time_factor(self):
+        """
+            Simulated seconds per wall-clock second spent in step since the last call
+            (0.0 if it did not step)
+        """
+        rtf                 =   self.sim_seconds / self.wall_seconds if self.wall_seconds > 0.0 else 0.0
+        self.sim_seconds    =   0.0
+        self.wall_seconds   =   0.0
+        return rtf
+
+    def _process_step(self):
+        """
+            Observation, reward and done of the state reached after the trigger
+        """
         #rotmat, position, angvel, linvel =   self._get_observation_state()
         """ _get_observation_state() must be overloaded! """
         rowdata         =   self._get_observation_state()
@@ -93,6 +190,42 @@ class WrapperQuad(gym.Env):
         # Compute The reward function
 
     def reset(self, init_pos=None, init_ang=None):
+        t_start =   time.time()
+        if self.reset_mode == 'teleport' and self.sim_running:
+            observation =   self._teleport_reset(init_pos, init_ang)
+        else:
+            observation =   self._restart_reset(init_pos, init_ang)
+        self.last_reset_time    =   time.time() - t_start
+        if self.recorder is not None:
+            self.recorder.begin_episode(observation)
+
+        return observation
+
+    def _teleport_reset(self, init_pos=None, init_ang=None):
+        """
+            Reset without stopping the simulation: the handles are kept, the
+            quadrotor is moved to the new pose with the propellers stopped and
+            its velocities are zeroed by the scene
+        """
+        self._send_speeds(np.zeros(4, dtype=np.float32))
+        self._teleport(init_pos, init_ang)
+
+        vrep.simxSynchronousTrigger(self.clientID)
+        vrep.simxGetPingTime(self.clientID)
+
+        rowdata = self._get_observation_state()
+        return self._flat_observation(rowdata)
+
+    def _teleport(self, init_pos=None, init_ang=None):
+        """
+            Move the quadrotor and the target and zero the dynamic state of the model
+        """
+        self.set_states(init_pos, init_ang)
+        vrep.simxSetObjectPosition(self.clientID, self.target_handler, -1, self.targetpos, vrep.simx_opmode_oneshot)
+        r, _, _, _, _ = vrep.simxCallScriptFunction(self.clientID, self.envname, vrep.sim_scripttype_childscript, 'resetDynamics', [], [], [self.envname], bytearray(), vrep.simx_opmode_blocking)
+        assert r == vrep.simx_return_ok, 'resetDynamics failed, add quadricopter_packed.lua to the child script of {}'.format(self.envname)
+
+    def _restart_reset(self, init_pos=None, init_ang=None):
         #print('Reset -ing id> ', self.clientID)
         # Put code when reset here
         #r = vrep.simxSetObjectPosition(self.clientID, self.quad_handler, -1, np.array([0.0,0.0,0.5]), vrep.simx_opmode_oneshot_wait)
@@ -110,9 +243,8 @@ class WrapperQuad(gym.Env):
         
         #print('Totally stopped> ID> ', self.clientID)
 
-        # Reset quadrotor
-        r, self.quad_handler        =   vrep.simxGetObjectHandle(self.clientID, self.envname, vrep.simx_opmode_oneshot_wait)
-        r, self.target_handler      =   vrep.simxGetObjectHandle(self.clientID, 'Quadricopter_target', vrep.simx_opmode_oneshot_wait)
+        # Reset quadrotor, the handles of __init__ are still valid
+        if self.streaming: self._start_streaming()
         # start posedistance        =   np.sqrt((reward * reward).sum())
         #init_position, init_ang     =   self._get_random_pos_ang(max_radius=3.1, max_angle=np.pi, respecto=self.targetpos)
         #vrep.simxSetObjectPosition(self.clientID, self.quad_handler, -1, init_position, vrep.simx_opmode_blocking)
@@ -122,6 +254,7 @@ class WrapperQuad(gym.Env):
         vrep.simxSetObjectPosition(self.clientID, self.target_handler, -1, self.targetpos, vrep.simx_opmode_oneshot)
 
         self.startsimulation()
+        self.sim_running    =   True
 
         vrep.simxSynchronousTrigger(self.clientID)
         vrep.simxGetPingTime(self.clientID)
@@ -136,7 +269,10 @@ class WrapperQuad(gym.Env):
 
     def startsimulation(self):
         if self.clientID != -1:
-            self._set_floatparam(vrep.sim_floatparam_simulation_time_step, 0.01)
+            self._set_floatparam(vrep.sim_floatparam_simulation_time_step, self.time_step_size)
+            if self.physics_engine is not None:
+                self._set_intparam(vrep.sim_intparam_dynamic_engine, self.physics_engine)
+            self.dt =   self.time_step_size
             vrep.simxSynchronous(self.clientID, True)
             e = vrep.simxStartSimulation(self.clientID, vrep.simx_opmode_blocking)
 
@@ -153,6 +289,10 @@ class WrapperQuad(gym.Env):
         #print(res)
         assert (res == vrep.simx_return_ok or res == vrep.simx_return_novalue_flag), ('Could not set float parameters!')
 
+    def _set_intparam(self, parameter: int, value: int) ->NoReturn:
+        res =   vrep.simxSetIntegerParameter(self.clientID, parameter, value, vrep.simx_opmode_oneshot)
+        assert (res == vrep.simx_return_ok or res == vrep.simx_return_novalue_flag), ('Could not set integer parameters!')
+
     def _set_boolparam(self, parameter: int, value: bool) -> NoReturn:
         """Sets boolean parameter of V-REP simulation.
         Args:
@@ -172,6 +312,20 @@ class WrapperQuad(gym.Env):
         self._set_boolparam(vrep.sim_boolparam_console_visible, False)
         self._set_boolparam(vrep.sim_boolparam_browser_visible, False)
 
+    def _apply_turbo_profile(self) -> NoReturn:
+        """Data collection profile: no rendering, no GUI updates and no real-time throttling.
+        The time step and physics engine are applied by startsimulation() on every (re)start.
+        """
+        if not self._get_boolparam(vrep.sim_boolparam_headless):
+            self._clear_gui()
+            self._set_boolparam(vrep.sim_boolparam_display_enabled, False)
+            self._set_boolparam(vrep.sim_boolparam_infotext_visible, False)
+            self._set_boolparam(vrep.sim_boolparam_statustext_open, False)
+            self._set_boolparam(vrep.sim_boolparam_scene_and_model_load_messages, False)
+        self._set_boolparam(vrep.sim_boolparam_realtime_simulation, False)
+        _, engine   =   vrep.simxGetIntegerParameter(self.clientID, vrep.sim_intparam_dynamic_engine, vrep.simx_opmode_oneshot_wait)
+        print('Turbo profile on port {}: tstep> {} seconds, engine> {} (scene: {})'.format(self.port, self.time_step_size, self.physics_engine, engine))
+
     def _get_boolparam(self, parameter: int) -> bool:
         res, value = vrep.simxGetBooleanParameter(self.clientID, parameter,
                                                   vrep.simx_opmode_oneshot)
@@ -202,13 +356,29 @@ class WrapperQuad(gym.Env):
         return sampledpos, sampledangle
 
     
+    def _save_trace(self):
+        """ Write the recorded trace, once """
+        if self.recorder is None: return
+        self.recorder.meta  =   dict(env=self.__class__.__name__, mask=getattr(self, 'mask', np.ones(4)).tolist(), dt=float(self.dt),
+                                        frame_skip=self.frame_skip, observation_size=self.layout.size if hasattr(self, 'layout') else None)
+        self.recorder.save()
+        print('Trace saved in {}'.format(self.recorder.path))
+        self.recorder       =   None
+
     def close(self):
+        self._save_trace()
+        if not self.owns_client: return
         print('Exit connection from ID client> {}'.format(self.clientID))
-        vrep.simxClearIntegerSignal(self.clientID, 'signal_debug', vrep.simx_opmode_blocking)
-        vrep.simxStopSimulation(self.clientID, vrep.simx_opmode_blocking)
-        time.sleep(2.5)
+        """ Other environments of the process may still step this simulation, the last one stops it """
+        if pool.users(self.clientID) <= 1:
+            vrep.simxClearIntegerSignal(self.clientID, 'signal_debug', vrep.simx_opmode_blocking)
+            vrep.simxStopSimulation(self.clientID, vrep.simx_opmode_blocking)
+            time.sleep(2.5)
+        self.sim_running    =   False
         #writer.close()
-        vrep.simxFinish(-1)
+        """ Only this client, and the pool may keep it for the next environment on the port """
+        pool.release(self.clientID)
+        self.owns_client    =   False
     
     def set_states(self, pos=None, ang=None):
         """
@@ -231,11 +401,70 @@ class WrapperQuad(gym.Env):
         position    =   np.sqrt((position * position).sum())
         return position > 3.2
 
+    def _start_streaming(self):
+        """
+            Register the state readings as streaming commands, the server sends
+            them after every simulation step so that _read_state only reads the
+            local buffer (no extra round trips per step)
+        """
+        if self.packed_io:
+            vrep.simxGetStringSignal(self.clientID, 'packedstate', vrep.simx_opmode_streaming)
+            return
+        vrep.simxGetObjectPosition(self.clientID,    self.quad_handler, -1, vrep.simx_opmode_streaming)
+        vrep.simxGetObjectOrientation(self.clientID, self.quad_handler, -1, vrep.simx_opmode_streaming)
+        vrep.simxGetObjectVelocity(self.clientID,    self.quad_handler, vrep.simx_opmode_streaming)
+        if self.stream_quaternion:
+            vrep.simxGetObjectQuaternion(self.clientID,  self.quad_handler, -1, vrep.simx_opmode_streaming)
+
+    def _read_state(self, quaternion=False):
+        """
+            Read position, orientation, linear and angular velocity (and quaternion)
+            of the quadrotor as float32 arrays. With streaming the values are taken
+            from the buffer, the blocking call is only used while the first
+            streamed values have not arrived yet
+        """
+        if self.pushed_state is not None: return self._unpack_state(self.pushed_state, quaternion)
+        if self.packed_io: return self._read_packed_state(quaternion)
+        opmode  =   vrep.simx_opmode_buffer if self.streaming else vrep.simx_opmode_oneshot_wait
+        while True:
+            r1, position            =   vrep.simxGetObjectPosition(self.clientID,    self.quad_handler, -1, opmode)
+            r2, orientation         =   vrep.simxGetObjectOrientation(self.clientID, self.quad_handler, -1, opmode)
+            r3, lin_vel, ang_vel    =   vrep.simxGetObjectVelocity(self.clientID,    self.quad_handler, opmode)
+            state   =   [position, orientation, lin_vel, ang_vel]
+            codes   =   [r1, r2, r3]
+            if quaternion:
+                r4, quat            =   vrep.simxGetObjectQuaternion(self.clientID,  self.quad_handler, -1, opmode)
+                state.append(quat)
+                codes.append(r4)
+            if opmode == vrep.simx_opmode_oneshot_wait or all(r == vrep.simx_return_ok for r in codes):
+                break
+            opmode  =   vrep.simx_opmode_oneshot_wait
+
+        return [np.asarray(x, dtype=np.float32) for x in state]
+
+    def _read_packed_state(self, quaternion=False):
+        """
+            Same as _read_state from the 16 floats packed by the scene:
+            position(3), orientation(3), lin_vel(3), ang_vel(3), quaternion(4)
+        """
+        r   =   -1
+        if self.streaming:
+            r, packed   =   vrep.simxGetStringSignal(self.clientID, 'packedstate', vrep.simx_opmode_buffer)
+            if r == vrep.simx_return_ok: state = vrep.simxUnpackFloats(packed)
+        if r != vrep.simx_return_ok:
+            r, _, state, _, _ = vrep.simxCallScriptFunction(self.clientID, self.envname, vrep.sim_scripttype_childscript, 'getPackedState', [], [], [self.envname], bytearray(), vrep.simx_opmode_blocking)
+            assert r == vrep.simx_return_ok, 'getPackedState failed, add quadricopter_packed.lua to the child script of {}'.format(self.envname)
+
+        return self._unpack_state(state, quaternion)
+
+    @staticmethod
+    def _unpack_state(state, quaternion=False):
+        state   =   np.asarray(state, dtype=np.float32)
+        return [state[0:3], state[3:6], state[6:9], state[9:12]] + ([state[12:16]] if quaternion else [])
+
     def _get_observation_state(self):
         
-        _, position         =   vrep.simxGetObjectPosition(self.clientID,    self.quad_handler, -1, vrep.simx_opmode_oneshot_wait)
-        _, orientation      =   vrep.simxGetObjectOrientation(self.clientID, self.quad_handler, -1, vrep.simx_opmode_oneshot_wait)
-        _, lin_vel, ang_vel =   vrep.simxGetObjectVelocity(self.clientID,    self.quad_handler, vrep.simx_opmode_oneshot_wait)
+        position, orientation, lin_vel, ang_vel =   self._read_state()
         # Flat and join states!
         RotMat          =   GetFlatRotationMatrix(orientation)
         
@@ -263,5 +492,96 @@ class WrapperQuad(gym.Env):
         rot_mat     =   obs['rotation_matrix']
         return  np.concatenate((rot_mat, pos, ang_vel, lin_vel))
 
+    def _init_observation_buffer(self):
+        """
+            Preallocated float32 observation of self.layout (wrapper_quad/observation_layout.py),
+            its fields as views and the dict of readings handed to compute_rewards/compute_done
+        """
+        self.obs_buffer     =   self.layout.new_buffer()
+        self.obs_fields     =   self.layout.views(self.obs_buffer)
+        self.obs_rowdata    =   OrderedDict(self.obs_fields)
+        self._obs_reading   =   None
+
+    def _write_observation(self, compute_acelleration=True):
+        """
+            Read the state and write it into self.obs_buffer, only the fields of self.layout are
+            computed. The returned rowdata holds the field views plus the raw orientation (and
+            quaternion if read), it is reused on every step. last_observation is built from it
+            only when it is read
+        """
+        fields      =   self.obs_fields
+        rowdata     =   self.obs_rowdata
+        reading     =   self._read_state(quaternion='quaternion' in fields)
+        position, orientation, lin_vel, ang_vel =   reading[:4]
+
+        np.subtract(position, self.targetpos, out=fields['position'])
+        fields['lin_vel'][:]    =   lin_vel
+        fields['ang_vel'][:]    =   ang_vel
+        rowdata['orientation']  =   orientation
+
+        if 'rotation_matrix' in fields:
+            """ A single quadrotor keeps the scalar closed form, cheaper than a batch of one """
+            if self.pushed_rotation_matrix is not None: fields['rotation_matrix'][:] = self.pushed_rotation_matrix
+            else: SetFlatRotationMatrix(orientation, fields['rotation_matrix'])
+        if 'orientation' in fields:
+            fields['orientation'][:]    =   orientation[:fields['orientation'].shape[0]]
+        if 'quaternion' in fields:
+            fields['quaternion'][:]     =   reading[4]
+            rowdata['quaternion']       =   reading[4]
+        if 'lin_acel' in fields:
+            if compute_acelleration == True: lin_acel, ang_acel  =   self.compute_aceleration(lin_vel, ang_vel)
+            else: lin_acel, ang_acel =   0.0, 0.0
+            fields['lin_acel'][:]   =   lin_acel
+            fields['ang_acel'][:]   =   ang_acel
+
+        """ The readings are new arrays on every read, keeping them costs nothing """
+        self._obs_reading       =   (orientation, compute_acelleration)
+        self._last_observation  =   None
+
+        return rowdata
+
+    @property
+    def last_observation(self):
+        """
+            Every reading of the last observation (position, orientation, lin_vel, ang_vel,
+            rotation_matrix, lin_acel, ang_acel and quaternion if read) as new arrays, so the
+            _flat_observation_st of any class can flatten it and it is not overwritten by the
+            next step. Built on the first access after each step
+        """
+        if self._last_observation is None and getattr(self, '_obs_reading', None) is not None:
+            orientation, compute_acelleration   =   self._obs_reading
+            fields      =   self.obs_fields
+            observation =   OrderedDict(
+                                position=fields['position'].copy(),
+                                orientation=np.array(orientation, dtype=np.float32),
+                                lin_vel=fields['lin_vel'].copy(),
+                                ang_vel=fields['ang_vel'].copy(),
+                                rotation_matrix=fields['rotation_matrix'].copy() if 'rotation_matrix' in fields else GetFlatRotationMatrix(orientation).astype(np.float32)
+                            )
+            if 'lin_acel' in fields:
+                observation['lin_acel'], observation['ang_acel']    =   fields['lin_acel'].copy(), fields['ang_acel'].copy()
+            elif compute_acelleration == True:
+                observation['lin_acel'], observation['ang_acel']    =   self.compute_aceleration(observation['lin_vel'], observation['ang_vel'])
+            else:
+                observation['lin_acel'], observation['ang_acel']    =   np.zeros(3, dtype=np.float32), np.zeros(3, dtype=np.float32)
+            if 'quaternion' in fields:
+                observation['quaternion']   =   fields['quaternion'].copy()
+            self._last_observation  =   observation
+        return self._last_observation
+
+    @last_observation.setter
+    def last_observation(self, observation):
+        self._last_observation  =   observation
+        self._obs_reading       =   None
+
+    def _flat_observation_buffer(self, rowdata):
+        """
+            Flat observation of self.layout, a copy of self.obs_buffer (the caller keeps it,
+            the buffer is overwritten on the next step)
+        """
+        if rowdata is self.obs_rowdata:
+            return self.obs_buffer.copy()
+        return self.layout.flatten(rowdata)
+
     def _get_last_observation(self):
         return self.last_observation
\ No newline at end of file
@@ -0,0 +1,161 @@
+# N non-interacting quadrotors (Quadricopter#0..N-1) stepped in one VREP instance
+# The child script of the quadrotors must include wrapper_quad/quadricopter_packed.lua
+import wrapper_quad.vrep as vrep
+from wrapper_quad.connection import pool
+from wrapper_quad.rotations import euler_to_rotmat
+import numpy as np
+import time
+
+
+class VREPMultiQuad(object):
+    """
+    Drive n_quads copies of the quadrotor of one scene with the batched interface of
+    ParallelVrepEnv (n_parallel, reset, step, reset_remote, get_reset_nrollouts), so
+    Runner can use either. Per step: one packed signal with the (N, 4) speeds, one
+    trigger and one script call returning the (N, 16) packed states
+    """
+    def __init__(self, max_path_length:int, n_quads:int, envClass, reward_type, cripple_rotor, ip='127.0.0.1', port=19997, names=None, env_kwargs=None, frame_skip=1):
+        """
+        envClass:   Environment class of a single quadrotor (e.g. QuadrotorEnvAugment), it
+                    defines the observation, reward and done of each copy
+        names:      Names of the quadrotors in the scene, Quadricopter#i by default. Their
+                    targets are expected as Quadricopter_target#i
+        frame_skip: Triggers per step(), the speeds are held and the rewards accumulated
+        """
+        self.n_parallel         =   n_quads
+        self._num_envs          =   n_quads
+        self.max_path_length    =   max_path_length
+        self.names              =   ['Quadricopter#{}'.format(i) for i in range(n_quads)] if names is None else names
+        assert len(self.names) == n_quads, 'One name per quadrotor'
+        self.num_rollouts       =   [0] * n_quads
+        self.ts                 =   [0] * n_quads
+        """ Same counters as ParallelVrepEnv, a single process has nothing to respawn """
+        self.stats              =   dict(restarts=0, timeouts=0, crashes=0)
+        """ Simulated and wall-clock seconds spent in step, see real_time_factors() """
+        self.sim_seconds        =   0.0
+        self.wall_seconds       =   0.0
+        self.frame_skip         =   frame_skip
+        env_kwargs              =   dict() if env_kwargs is None else env_kwargs
+
+        clientID                =   pool.acquire(ip, port)
+        self.clientID           =   clientID
+
+        self.envs   =   []
+        for name in self.names:
+            target_name =   name.replace('Quadricopter', 'Quadricopter_target', 1)
+            env =   envClass(port=port, reward_type=reward_type, fault_rotor=cripple_rotor, envname=name, target_name=target_name,
+                                clientID=clientID, frame_skip=frame_skip, **env_kwargs)
+            """ Pushed states, the copies do not read the simulator by themselves """
+            env.pushed_state    =   np.zeros(16, dtype=np.float32)
+            self.envs.append(env)
+        self.env_   =   self.envs[0]
+        """ Fault masks of the copies (QuadrotorEnv* apply them in their step) """
+        self.masks  =   np.stack([getattr(env, 'mask', np.ones(4, dtype=np.float32)) for env in self.envs], axis=0)
+
+    def _trigger(self):
+        vrep.simxSynchronousTrigger(self.clientID)
+        vrep.simxGetPingTime(self.clientID)
+
+    def _read_states(self):
+        r, _, states, _, _ = vrep.simxCallScriptFunction(self.clientID, self.names[0], vrep.sim_scripttype_childscript, 'getPackedStates', [], [], self.names, bytearray(), vrep.simx_opmode_blocking)
+        assert r == vrep.simx_return_ok, 'getPackedStates failed, add quadricopter_packed.lua to the child script of {}'.format(self.names[0])
+        states  =   np.asarray(states, dtype=np.float32).reshape(self.n_parallel, -1)
+        rotmats =   euler_to_rotmat(states[:, 3:6].astype(np.float64)).reshape(self.n_parallel, 9)
+        for env, state, rotmat in zip(self.envs, states, rotmats):
+            env.pushed_state            =   state
+            env.pushed_rotation_matrix  =   rotmat
+
+    def _send_speeds(self, actions):
+        vrep.simxSetStringSignal(self.clientID, 'speedprops_multi', vrep.simxPackFloats(actions.flatten()), vrep.simx_opmode_oneshot)
+
+    def step(self, actions):
+        """
+        actions:    (N, 4) propeller speeds
+        Return the batched next observations, rewards, dones and env_infos
+        """
+        t_start =   time.time()
+        actions =   np.asarray(actions, dtype=np.float32) * self.masks
+        self._send_speeds(actions)
+
+        obs     =   [None] * self.n_parallel
+        infos   =   [None] * self.n_parallel
+        rws     =   np.zeros(self.n_parallel, dtype=np.float32)
+        dones   =   np.zeros(self.n_parallel, dtype=bool)
+        """ Hold the speeds for frame_skip triggers, a quadrotor that is done keeps its last observation """
+        for _ in range(self.frame_skip):
+            self._trigger()
+            self._read_states()
+            for idx, env in enumerate(self.envs):
+                if dones[idx]: continue
+                obs[idx], rw, dones[idx], infos[idx] = env._process_step()
+                rws[idx]    +=  rw
+            self.sim_seconds    +=  self.env_.dt
+
+        for idx in range(self.n_parallel):
+            self.ts[idx]    +=  1
+            if dones[idx] or self.ts[idx] >= self.max_path_length:
+                dones[idx]      =   True
+                self.ts[idx]    =   0
+        self.wall_seconds   +=  time.time() - t_start
+
+        return np.stack(obs), rws, dones, infos
+
+    def real_time_factors(self):
+        """ Real-time factor of the scene since the last call, one worker steps all the copies """
+        rtf                 =   self.sim_seconds / self.wall_seconds if self.wall_seconds > 0.0 else 0.0
+        self.sim_seconds    =   0.0
+        self.wall_seconds   =   0.0
+        return [rtf]
+
+    def reset(self):
+        """
+        Reset all the quadrotors, the simulation is only restarted the first time
+        """
+        if not self.env_.sim_running:
+            self.env_._restart_reset()
+            for env in self.envs: env.sim_running = True
+        self._send_speeds(np.zeros((self.n_parallel, 4), dtype=np.float32))
+        for env in self.envs:
+            env._teleport()
+        self._trigger()
+        self._read_states()
+        self.ts =   [0] * self.n_parallel
+
+        return [env._flat_observation(env._get_observation_state()) for env in self.envs]
+
+    def reset_remote(self, index):
+        """
+        Teleport one quadrotor without stepping the others, its velocities are
+        zeroed by the scene and applied on the next trigger
+        """
+        t_start =   time.time()
+        env     =   self.envs[index]
+        env._teleport()
+        self._read_states()
+        self.ts[index]              =   0
+        self.num_rollouts[index]    +=  1
+        env.last_reset_time         =   time.time() - t_start
+
+        return env._flat_observation(env._get_observation_state())
+
+    def get_reset_nrollouts(self):
+        """ Rollouts of each environment since the last call (the counters restart at zero) """
+        nrollouts           =   self.num_rollouts
+        self.num_rollouts   =   [0] * len(nrollouts)
+        return nrollouts
+
+    def close(self):
+        for env in self.envs:
+            env.pushed_state            =   None
+            env.pushed_rotation_matrix  =   None
+        if pool.users(self.clientID) <= 1:
+            vrep.simxStopSimulation(self.clientID, vrep.simx_opmode_blocking)
+        pool.release(self.clientID)
+
+    @property
+    def getenv(self):
+        return self.env_
+
+    @property
+    def num_envs(self):
+        return self._num_envs
@@ -1,55 +1,31 @@
 
 from wrapper_quad.wrapper import WrapperQuad
 import wrapper_quad.vrep as vrep
-from wrapper_quad.utility import GetFlatRotationMatrix
-from collections import OrderedDict
+from wrapper_quad.observation_layout import ACCEL_ROT, ROTMAT, ROTMAT_AUGMENT, QUATERNION_AUGMENT
 from gym import spaces
 import numpy as np
 
 class VREPQuadAccelRot(WrapperQuad):
-    def __init__(self, ip='127.0.0.1', port=19997):
-        super(VREPQuadAccelRot, self).__init__(ip=ip, port=port)
+    layout  =   ACCEL_ROT
+
+    def __init__(self, ip='127.0.0.1', port=19997, **kwargs):
+        super(VREPQuadAccelRot, self).__init__(ip=ip, port=port, **kwargs)
 
         self.action_space       =   spaces.Box(low=0.0,high=100.0,shape=(4,), dtype=np.float32)
         self.observation_space  =   spaces.Box(low=-np.inf, high=np.inf, shape=(24,), dtype=np.float32)
         #_, self.dt              =   vrep.simxGetFloatingParameter(self.clientID, vrep.sim_floatparam_simulation_time_step, vrep.simx_opmode_oneshot_wait)
         self.prev_linvel        =   np.zeros(3, dtype=np.float32)
         self.prev_angvel        =   np.zeros(3, dtype=np.float32)
+        self._init_observation_buffer()
 
     def _get_observation_state(self, compute_acelleration = True):
-        _, position             =   vrep.simxGetObjectPosition(self.clientID,    self.quad_handler, -1, vrep.simx_opmode_oneshot_wait)
-        _, orientation          =   vrep.simxGetObjectOrientation(self.clientID, self.quad_handler, -1, vrep.simx_opmode_oneshot_wait)
-        _, lin_vel, ang_vel     =   vrep.simxGetObjectVelocity(self.clientID,    self.quad_handler, vrep.simx_opmode_oneshot_wait)
-
-        position                =   np.asarray(position, dtype=np.float32)
-        orientation             =   np.asarray(orientation, dtype=np.float32)
-        lin_vel, ang_vel        =   np.asarray(lin_vel, dtype=np.float32), np.asarray(ang_vel, dtype=np.float32)
-
-        if compute_acelleration == True: lin_acel, ang_acel  =   self.compute_aceleration(lin_vel, ang_vel)
-        else: lin_acel, ang_acel =   np.zeros(3, dtype=np.float32), np.zeros(3, dtype=np.float32) 
-
-        position                =   position - self.targetpos
-        rotation_matrix         =   GetFlatRotationMatrix(orientation)
-
-        observation             =   OrderedDict(
-                                        position=position,
-                                        orientation=orientation,
-                                        lin_vel=lin_vel,
-                                        ang_vel=ang_vel,
-                                        rotation_matrix=rotation_matrix,
-                                        lin_acel=lin_acel,
-                                        ang_acel=ang_acel
-                                    )
-
-        self.last_observation   =   observation
-
-        return observation
+        return self._write_observation(compute_acelleration)
 
     def compute_aceleration(self, linv, angv):
         assert linv is not None and angv is not None, "linv or angv must not be a none datatype"
 
-        lina = (linv-self.prev_linvel)/self.dt
-        anga = (angv-self.prev_angvel)/self.dt
+        lina = (linv-self.prev_linvel)/self.control_dt
+        anga = (angv-self.prev_angvel)/self.control_dt
 
         return lina, anga
     
@@ -69,17 +45,10 @@ class VREPQuadAccelRot(WrapperQuad):
     
     @staticmethod
     def _flat_observation_st(rowdata):
-        position        =   rowdata['position']
-        lin_vel         =   rowdata['lin_vel']
-        ang_vel         =   rowdata['ang_vel']
-        rotation_matrix =   rowdata['rotation_matrix']
-        lin_acel        =   rowdata['lin_acel']
-        ang_acel        =   rowdata['ang_acel']
-
-        return np.concatenate((position, lin_vel, ang_vel, rotation_matrix, lin_acel, ang_acel))
+        return ACCEL_ROT.flatten(rowdata)
 
     def _flat_observation(self, rowdata):
-        return VREPQuadAccelRot._flat_observation_st(rowdata)
+        return self._flat_observation_buffer(rowdata)
     
     @staticmethod
     def _get_action_space():
@@ -94,58 +63,27 @@ class VREPQuadAccelRot(WrapperQuad):
 
 
 class VREPQuadRotmat(WrapperQuad):
-    def __init__(self, ip='127.0.0.1', port=19997):
-        super(VREPQuadRotmat, self).__init__(ip=ip, port=port)
+    layout  =   ROTMAT
+
+    def __init__(self, ip='127.0.0.1', port=19997, **kwargs):
+        super(VREPQuadRotmat, self).__init__(ip=ip, port=port, **kwargs)
 
         self.action_space       =   spaces.Box(low=0.0,high=100.0,shape=(4,), dtype=np.float32)
         self.observation_space  =   spaces.Box(low=-np.inf, high=np.inf, shape=(18,), dtype=np.float32)
         #_, self.dt              =   vrep.simxGetFloatingParameter(self.clientID, vrep.sim_floatparam_simulation_time_step, vrep.simx_opmode_oneshot_wait)
         self.prev_linvel        =   np.zeros(3, dtype=np.float32)
         self.prev_angvel        =   np.zeros(3, dtype=np.float32)
+        self._init_observation_buffer()
 
     def _get_observation_state(self, compute_acelleration = True):
-        _, position             =   vrep.simxGetObjectPosition(self.clientID,    self.quad_handler, -1, vrep.simx_opmode_oneshot_wait)
-        _, orientation          =   vrep.simxGetObjectOrientation(self.clientID, self.quad_handler, -1, vrep.simx_opmode_oneshot_wait)
-        _, lin_vel, ang_vel     =   vrep.simxGetObjectVelocity(self.clientID,    self.quad_handler, vrep.simx_opmode_oneshot_wait)
-
-        position                =   np.asarray(position, dtype=np.float32)
-        orientation             =   np.asarray(orientation, dtype=np.float32)
-        lin_vel, ang_vel        =   np.asarray(lin_vel, dtype=np.float32), np.asarray(ang_vel, dtype=np.float32)
-
-        if compute_acelleration == True: lin_acel, ang_acel  =   self.compute_aceleration(lin_vel, ang_vel)
-        else: lin_acel, ang_acel =   np.zeros(3, dtype=np.float32), np.zeros(3, dtype=np.float32) 
-
-        position                =   position - self.targetpos
-        rotation_matrix         =   GetFlatRotationMatrix(orientation)
-
-        observation             =   OrderedDict(
-                                        position=position,
-                                        orientation=orientation,
-                                        lin_vel=lin_vel,
-                                        ang_vel=ang_vel,
-                                        rotation_matrix=rotation_matrix,
-                                        lin_acel=lin_acel,
-                                        ang_acel=ang_acel
-                                    )
-
-        self.last_observation   =   observation
-
-        return observation
+        return self._write_observation(compute_acelleration)
     
     @staticmethod
     def _flat_observation_st(rowdata):
-        position        =   rowdata['position']
-        lin_vel         =   rowdata['lin_vel']
-        ang_vel         =   rowdata['ang_vel']
-        rotation_matrix =   rowdata['rotation_matrix']
-        #lin_acel        =   rowdata['lin_acel']
-        #ang_acel        =   rowdata['ang_acel']
-
-        return np.concatenate((rotation_matrix, position, lin_vel, ang_vel))
-        #return np.concatenate((position, lin_vel, ang_vel, rotation_matrix, lin_acel, ang_acel))
+        return ROTMAT.flatten(rowdata)
 
     def _flat_observation(self, rowdata):
-        return VREPQuadRotmat._flat_observation_st(rowdata)
+        return self._flat_observation_buffer(rowdata)
 
     def compute_rewards(self, rowdata):
         #print('computed from child')
@@ -168,8 +106,8 @@ class VREPQuadRotmat(WrapperQuad):
     def compute_aceleration(self, linv, angv):
         assert linv is not None and angv is not None, "linv or angv must not be a none datatype"
 
-        lina = (linv-self.prev_linvel)/self.dt
-        anga = (angv-self.prev_angvel)/self.dt
+        lina = (linv-self.prev_linvel)/self.control_dt
+        anga = (angv-self.prev_angvel)/self.control_dt
 
         return lina, anga
     
@@ -185,59 +123,27 @@ class VREPQuadRotmat(WrapperQuad):
 
 
 class VREPQuadRotmatAugment(WrapperQuad):
-    def __init__(self, ip='127.0.0.1', port=19997):
-        super(VREPQuadRotmatAugment, self).__init__(ip=ip, port=port)
+    layout  =   ROTMAT_AUGMENT
+
+    def __init__(self, ip='127.0.0.1', port=19997, **kwargs):
+        super(VREPQuadRotmatAugment, self).__init__(ip=ip, port=port, **kwargs)
 
         self.action_space       =   spaces.Box(low=0.0,high=100.0,shape=(4,), dtype=np.float32)
         self.observation_space  =   spaces.Box(low=-np.inf, high=np.inf, shape=(21,), dtype=np.float32)
         #_, self.dt              =   vrep.simxGetFloatingParameter(self.clientID, vrep.sim_floatparam_simulation_time_step, vrep.simx_opmode_oneshot_wait)
         self.prev_linvel        =   np.zeros(3, dtype=np.float32)
         self.prev_angvel        =   np.zeros(3, dtype=np.float32)
+        self._init_observation_buffer()
 
     def _get_observation_state(self, compute_acelleration = True):
-        _, position             =   vrep.simxGetObjectPosition(self.clientID,    self.quad_handler, -1, vrep.simx_opmode_oneshot_wait)
-        _, orientation          =   vrep.simxGetObjectOrientation(self.clientID, self.quad_handler, -1, vrep.simx_opmode_oneshot_wait)
-        _, lin_vel, ang_vel     =   vrep.simxGetObjectVelocity(self.clientID,    self.quad_handler, vrep.simx_opmode_oneshot_wait)
-
-        position                =   np.asarray(position, dtype=np.float32)
-        orientation             =   np.asarray(orientation, dtype=np.float32)
-        lin_vel, ang_vel        =   np.asarray(lin_vel, dtype=np.float32), np.asarray(ang_vel, dtype=np.float32)
-
-        if compute_acelleration == True: lin_acel, ang_acel  =   self.compute_aceleration(lin_vel, ang_vel)
-        else: lin_acel, ang_acel =   np.zeros(3, dtype=np.float32), np.zeros(3, dtype=np.float32) 
-
-        position                =   position - self.targetpos
-        rotation_matrix         =   GetFlatRotationMatrix(orientation)
-
-        observation             =   OrderedDict(
-                                        position=position,
-                                        orientation=orientation,
-                                        lin_vel=lin_vel,
-                                        ang_vel=ang_vel,
-                                        rotation_matrix=rotation_matrix,
-                                        lin_acel=lin_acel,
-                                        ang_acel=ang_acel
-                                    )
-
-        self.last_observation   =   observation
-
-        return observation
+        return self._write_observation(compute_acelleration)
     
     @staticmethod
     def _flat_observation_st(rowdata):
-        position        =   rowdata['position']
-        lin_vel         =   rowdata['lin_vel']
-        ang_vel         =   rowdata['ang_vel']
-        rotation_matrix =   rowdata['rotation_matrix']
-        orientation     =   rowdata['orientation']
-        #lin_acel        =   rowdata['lin_acel']
-        #ang_acel        =   rowdata['ang_acel']
-
-        return np.concatenate((rotation_matrix, position, lin_vel, ang_vel, orientation))
-        #return np.concatenate((position, lin_vel, ang_vel, rotation_matrix, lin_acel, ang_acel))
+        return ROTMAT_AUGMENT.flatten(rowdata)
 
     def _flat_observation(self, rowdata):
-        return VREPQuadRotmatAugment._flat_observation_st(rowdata)
+        return self._flat_observation_buffer(rowdata)
 
     def compute_rewards_distance(self, rowdata):
         #print('computed from child')
@@ -280,8 +186,8 @@ class VREPQuadRotmatAugment(WrapperQuad):
     def compute_aceleration(self, linv, angv):
         assert linv is not None and angv is not None, "linv or angv must not be a none datatype"
 
-        lina = (linv-self.prev_linvel)/self.dt
-        anga = (angv-self.prev_angvel)/self.dt
+        lina = (linv-self.prev_linvel)/self.control_dt
+        anga = (angv-self.prev_angvel)/self.control_dt
 
         return lina, anga
     
@@ -298,62 +204,28 @@ class VREPQuadRotmatAugment(WrapperQuad):
 
 
 class VREPQuadQuaternionAugment(WrapperQuad):
-    def __init__(self, ip='127.0.0.1', port=19997):
-        super(VREPQuadQuaternionAugment, self).__init__(ip=ip, port=port)
+    layout  =   QUATERNION_AUGMENT
+
+    def __init__(self, ip='127.0.0.1', port=19997, **kwargs):
+        super(VREPQuadQuaternionAugment, self).__init__(ip=ip, port=port, **kwargs)
+        self.stream_quaternion  =   True
 
         self.action_space       =   spaces.Box(low=0.0,high=100.0,shape=(4,), dtype=np.float32)
         self.observation_space  =   spaces.Box(low=-np.inf, high=np.inf, shape=(15,), dtype=np.float32)
         #_, self.dt              =   vrep.simxGetFloatingParameter(self.clientID, vrep.sim_floatparam_simulation_time_step, vrep.simx_opmode_oneshot_wait)
         self.prev_linvel        =   np.zeros(3, dtype=np.float32)
         self.prev_angvel        =   np.zeros(3, dtype=np.float32)
+        self._init_observation_buffer()
 
     def _get_observation_state(self, compute_acelleration = True):
-        _, position             =   vrep.simxGetObjectPosition(self.clientID,    self.quad_handler, -1, vrep.simx_opmode_oneshot_wait)
-        _, orientation          =   vrep.simxGetObjectOrientation(self.clientID, self.quad_handler, -1, vrep.simx_opmode_oneshot_wait)
-        _, lin_vel, ang_vel     =   vrep.simxGetObjectVelocity(self.clientID,    self.quad_handler, vrep.simx_opmode_oneshot_wait)
-        _, quaternion           =   vrep.simxGetObjectQuaternion(self.clientID,  self.quad_handler, -1, vrep.simx_opmode_oneshot_wait)
-        position                =   np.asarray(position, dtype=np.float32)
-        orientation             =   np.asarray(orientation, dtype=np.float32)
-        lin_vel, ang_vel        =   np.asarray(lin_vel, dtype=np.float32), np.asarray(ang_vel, dtype=np.float32)
-        quaternion              =   np.asarray(quaternion, dtype=np.float32)
-        
-        if compute_acelleration == True: lin_acel, ang_acel  =   self.compute_aceleration(lin_vel, ang_vel)
-        else: lin_acel, ang_acel =   np.zeros(3, dtype=np.float32), np.zeros(3, dtype=np.float32) 
-
-        position                =   position - self.targetpos
-        rotation_matrix         =   GetFlatRotationMatrix(orientation)
-
-        observation             =   OrderedDict(
-                                        position=position,
-                                        orientation=orientation,
-                                        lin_vel=lin_vel,
-                                        ang_vel=ang_vel,
-                                        rotation_matrix=rotation_matrix,
-                                        lin_acel=lin_acel,
-                                        ang_acel=ang_acel,
-                                        quaternion=quaternion
-                                    )
-
-        self.last_observation   =   observation
-
-        return observation
+        return self._write_observation(compute_acelleration)
     
     @staticmethod
     def _flat_observation_st(rowdata):
-        position        =   rowdata['position']
-        lin_vel         =   rowdata['lin_vel']
-        ang_vel         =   rowdata['ang_vel']
-        #rotation_matrix =   rowdata['rotation_matrix']
-        quaternion      =   rowdata['quaternion']
-        orientation     =   rowdata['orientation'][:2]
-        #lin_acel        =   rowdata['lin_acel']
-        #ang_acel        =   rowdata['ang_acel']
-
-        return np.concatenate((position, lin_vel, ang_vel, quaternion, orientation))
-        #return np.concatenate((position, lin_vel, ang_vel, rotation_matrix, lin_acel, ang_acel))
+        return QUATERNION_AUGMENT.flatten(rowdata)
 
     def _flat_observation(self, rowdata):
-        return VREPQuadQuaternionAugment._flat_observation_st(rowdata)
+        return self._flat_observation_buffer(rowdata)
 
     def compute_rewards_distance(self, rowdata):
         #print('computed from child')
@@ -396,8 +268,8 @@ class VREPQuadQuaternionAugment(WrapperQuad):
     def compute_aceleration(self, linv, angv):
         assert linv is not None and angv is not None, "linv or angv must not be a none datatype"
 
-        lina = (linv-self.prev_linvel)/self.dt
-        anga = (angv-self.prev_angvel)/self.dt
+        lina = (linv-self.prev_linvel)/self.control_dt
+        anga = (angv-self.prev_angvel)/self.control_dt
 
         return lina, anga
     
@@ -10,6 +10,7 @@ from .utility import GetFlatRotationMatrix
 import sys
 #sys.path.append('.')
 import wrapper_quad.vrep as vrep
+from wrapper_quad.connection import pool
 from typing import NoReturn
 import time
 from random import gauss
@@ -27,7 +28,10 @@ class VREPQuad(gym.Env):
         # Initialize vrep
         self.envname            =   envname
         #vrep.simxFinish(-1)
-        clientID                =   vrep.simxStart(ip, port, True, True, 5000, 0)
+        try:
+            clientID            =   pool.acquire(ip, port)
+        except ConnectionError:
+            clientID            =   -1
         if clientID != -1:
             print('Connection Established Successfully to IP> {} - Port> {} - ID: {}'.format(ip, port, clientID))
             self.clientID       =   clientID
@@ -50,13 +54,13 @@ class VREPQuad(gym.Env):
             self._clear_gui()
 
         ## Detach object target_get_random_pos_ang
-        r, self.target_handler      =   vrep.simxGetObjectHandle(clientID, 'Quadricopter_target', vrep.simx_opmode_oneshot_wait)
+        self.target_handler         =   pool.get_handle(clientID, 'Quadricopter_target')
         vrep.simxSetObjectParent(clientID, self.target_handler, -1, True, vrep.simx_opmode_oneshot_wait)
         # Set signal debug:
         vrep.simxSetIntegerSignal(self.clientID, 'signal_debug', 1337, vrep.simx_opmode_oneshot)
-        r, self.quad_handler         =   vrep.simxGetObjectHandle(clientID, self.envname, vrep.simx_opmode_oneshot_wait)
+        self.quad_handler           =   pool.get_handle(clientID, self.envname)
 
-        print(r, self.quad_handler)
+        print(self.envname, self.quad_handler)
         # Define gym variables
 
         self.action_space       =   spaces.Box(low=0.0, high=100.0, shape=(4,), dtype=np.float32)
@@ -183,8 +187,8 @@ class VREPQuad(gym.Env):
         #print('Totally stopped> ID> ', self.clientID)
 
         # Reset quadrotor
-        r, self.quad_handler        =   vrep.simxGetObjectHandle(self.clientID, self.envname, vrep.simx_opmode_oneshot_wait)
-        r, self.target_handler      =   vrep.simxGetObjectHandle(self.clientID, 'Quadricopter_target', vrep.simx_opmode_oneshot_wait)
+        self.quad_handler           =   pool.get_handle(self.clientID, self.envname)
+        self.target_handler         =   pool.get_handle(self.clientID, 'Quadricopter_target')
         # start pose
         init_position, init_ang     =   self._get_random_pos_ang(max_radius=3.1, max_angle=np.pi, respecto=self.targetpos)
         vrep.simxSetObjectPosition(self.clientID, self.quad_handler, -1, init_position, vrep.simx_opmode_blocking)
@@ -315,11 +319,13 @@ class VREPQuad(gym.Env):
     
     def close(self):
         print('Exit connection from ID client> {}'.format(self.clientID))
-        vrep.simxClearIntegerSignal(self.clientID, 'signal_debug', vrep.simx_opmode_blocking)
-        vrep.simxStopSimulation(self.clientID, vrep.simx_opmode_blocking)
-        time.sleep(2.5)
+        """ Other environments of the process may still step this simulation, the last one stops it """
+        if pool.users(self.clientID) <= 1:
+            vrep.simxClearIntegerSignal(self.clientID, 'signal_debug', vrep.simx_opmode_blocking)
+            vrep.simxStopSimulation(self.clientID, vrep.simx_opmode_blocking)
+            time.sleep(2.5)
         #writer.close()
-        vrep.simxFinish(-1)
+        pool.release(self.clientID)
     
     @property
     def states(self):